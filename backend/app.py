@@ -0,0 +1,94 @@
+"""
+StockMaster Backend API
+
+    python app.py                   # development server
+    gunicorn app:app                # production
+
+create_app() only wires up routes; MongoDB and Firebase clients are created on
+first use in each worker process.
+"""
+
+import os
+from datetime import datetime
+from flask import Flask, jsonify
+from flask_cors import CORS
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+CORS_ORIGINS = ["http://localhost:3000", "http://localhost:5173", "http://localhost:8080", "http://localhost:8081", "*"]
+
+def create_app(config=None):
+    """Create the Flask application
+
+    DATA_BACKEND selects the route set: 'mongo' (default) registers the blueprints
+    in routes/, 'firebase' registers the Firestore routes from app_firebase.py.
+    """
+    app = Flask(__name__)
+    app.config.update(
+        DATA_BACKEND=os.getenv('DATA_BACKEND', 'mongo'),
+        MONGO_URI=os.getenv('MONGO_URI'),
+        MONGO_DB_NAME=os.getenv('MONGO_DB_NAME', 'stockmaster'),
+        SECRET_KEY=os.getenv('SECRET_KEY')
+    )
+    app.config.update(config or {})
+
+    CORS(app, origins=CORS_ORIGINS)
+
+    from utils.concurrency import init_deadline
+    from utils.metrics import init_metrics
+    from utils.encoding import init_encoding
+    from utils.admission import init_admission
+    # First, so time spent in every later hook counts against the request deadline
+    init_deadline(app)
+    init_metrics(app)
+    # Registered after metrics so the recorded response size is the compressed one
+    init_encoding(app)
+    # After metrics too, so shed requests still show up in the request metrics
+    init_admission(app)
+
+    if app.config['DATA_BACKEND'] == 'firebase':
+        # Firebase SDKs are only imported when this backend is selected
+        import app_firebase
+        from routes import batch
+        app.register_blueprint(app_firebase.bp)
+        app.register_blueprint(batch.bp)
+        return app
+
+    from utils import db
+    from utils.query_profiler import query_profiler
+    from routes import admin, auth_routes, batch, dashboard, jobs, operations, products, reports, stream, users
+
+    db.configure(app.config['MONGO_URI'], app.config['MONGO_DB_NAME'])
+    db.add_event_listener(query_profiler)
+
+    for blueprint_module in (auth_routes, products, operations, users, dashboard, reports, stream, jobs, batch, admin):
+        app.register_blueprint(blueprint_module.bp)
+
+    @app.route('/health')
+    def health():
+        return jsonify({
+            'status': 'healthy',
+            'timestamp': datetime.now().isoformat(),
+            'version': '1.0.0',
+            'message': 'StockMaster Backend API is running - MONGODB MODE',
+            'environment': os.getenv('FLASK_ENV', 'production'),
+            'database_client_initialized': db.is_initialized()
+        })
+
+    return app
+
+app = create_app()
+
+if __name__ == '__main__':
+    port = int(os.getenv('PORT', 5000))
+    print("🚀 StockMaster Backend API starting...")
+    print(f"🗄️  Data backend: {app.config['DATA_BACKEND'].upper()}")
+    print(f"🌐 Starting server on http://localhost:{port}")
+    if app.config['DATA_BACKEND'] == 'mongo' and os.getenv('FLASK_ENV') != 'development':
+        from utils.jobs import JOB_RUNNER, job_runner
+        if JOB_RUNNER == 'embedded':
+            # Picks up jobs left unfinished by the previous run
+            job_runner.start()
+    app.run(host='0.0.0.0', port=port, debug=os.getenv('FLASK_ENV') == 'development')
@@ -1,7 +1,5 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-import firebase_admin
-from firebase_admin import credentials, firestore, auth as firebase_auth, storage
+from flask import Blueprint, request, jsonify
+from firebase_admin import firestore
 from datetime import datetime, timedelta
 import uuid
 import os
@@ -10,48 +8,32 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app, origins=["http://localhost:3000", "http://localhost:5173", "http://localhost:8080", "http://localhost:8081", "*"])
+from utils.auth import require_auth, token_verifier, verify_request
+from utils.sequences import FirestoreSequenceAllocator
+from utils.concurrency import run_parallel
+from utils.firebase import get_firebase_app, get_firestore, get_bucket
+from utils.firestore_batch import bulk_create, print_progress
+from utils.catalog_replica import CATALOG_REPLICA, firestore_catalog_replica
 
-print("🚀 StockMaster Backend API starting...")
-print("🔥 Database Status: FIREBASE - Data will persist in Firebase Firestore")
-print("🔧 Environment: Development Mode with Firebase Backend")
+# Firebase-backed routes; registered by create_app() when DATA_BACKEND=firebase.
+# Firebase Admin, Firestore and Storage are initialized on first use.
+bp = Blueprint('firebase', __name__)
 
-# Initialize Firebase Admin SDK
-try:
-    # Check if Firebase is already initialized
-    if not firebase_admin._apps:
-        # For development, we'll use the default project
-        # In production, use service account key
-        firebase_admin.initialize_app()
-    
-    # Get Firestore client
-    db = firestore.client()
-    
-    # Get Storage bucket
-    bucket = storage.bucket()
-    
-    print("✅ Successfully connected to Firebase:")
-    print("   🔥 Firestore Database")
-    print("   🔐 Firebase Authentication")
-    print("   💾 Firebase Storage")
-    
-except Exception as e:
-    print(f"❌ Failed to initialize Firebase: {str(e)}")
-    print("📝 Make sure Firebase project is configured and credentials are available")
-    db = None
-    bucket = None
+BULK_CREATE_MAX_ITEMS = int(os.getenv('BULK_CREATE_MAX_ITEMS', 10000))
+OPERATIONS_MAX_LIMIT = 1000
 
 # Helper functions
 def generate_id():
     return str(uuid.uuid4())
 
+# SKU numbers are leased in blocks from per-prefix counter documents
+sku_sequences = FirestoreSequenceAllocator(get_firestore, daily=False)
+
 def generate_sku(name):
-    """Generate SKU from product name"""
-    clean_name = ''.join(c.upper() for c in name if c.isalpha())[:3]
-    timestamp = str(int(datetime.now().timestamp()))[-4:]
-    return f"{clean_name}-{timestamp}"
+    """Generate SKU from product name, e.g. STE-00042"""
+    clean_name = ''.join(c.upper() for c in name if c.isalpha())[:3] or 'PRD'
+    # Five digits keep new SKUs clear of the older timestamp-based XXX-1234 ones
+    return f"{clean_name}-{sku_sequences.next_value(f'SKU-{clean_name}'):05d}"
 
 def firestore_to_dict(doc):
     """Convert Firestore document to dictionary"""
@@ -66,9 +48,118 @@ def collection_to_list(collection_ref):
     docs = collection_ref.stream()
     return [firestore_to_dict(doc) for doc in docs if doc.exists]
 
+# Opt-in (CATALOG_REPLICA=1) in-memory copy of products, kept current by an on_snapshot listener
+product_catalog = firestore_catalog_replica(get_firestore, firestore_to_dict)
+
+def validate_product(data):
+    """Return an error message for an invalid product payload, or None"""
+    if not data.get('name'):
+        return 'Product name is required'
+    if not data.get('category'):
+        return 'Category is required'
+    return None
+
+def build_product(data, uid):
+    """Build a new product document with a generated SKU and stock status"""
+    # Determine status based on stock and reorder level
+    stock = data.get('stock', 0)
+    reorder_level = data.get('reorder_level', 10)
+    
+    if stock == 0:
+        status = 'Out of Stock'
+    elif stock <= reorder_level:
+        status = 'Low Stock'
+    else:
+        status = 'In Stock'
+    
+    return {
+        'name': data['name'],
+        'sku': generate_sku(data['name']),
+        'category': data['category'],
+        'stock': stock,
+        'unit': data.get('unit', 'pieces'),
+        'status': status,
+        'location': data.get('location', 'Main Warehouse'),
+        'reorder_level': reorder_level,
+        'supplier': data.get('supplier', ''),
+        'cost_price': float(data.get('cost_price', 0)),
+        'selling_price': float(data.get('selling_price', 0)),
+        'description': data.get('description', ''),
+        'created_by': uid,
+        'created_at': firestore.SERVER_TIMESTAMP,
+        'updated_at': firestore.SERVER_TIMESTAMP
+    }
+
+def validate_operation(data):
+    """Return an error message for an invalid operation payload, or None"""
+    if not data.get('type'):
+        return 'Operation type is required'
+    if not data.get('description'):
+        return 'Description is required'
+    return None
+
+def build_operation(data, uid):
+    """Build a new operation document with its type-specific fields"""
+    new_operation = {
+        'type': data['type'],
+        'description': data['description'],
+        'status': data.get('status', 'pending'),
+        'date': firestore.SERVER_TIMESTAMP,
+        'created_by': uid,
+        'updated_at': firestore.SERVER_TIMESTAMP
+    }
+    
+    # Add type-specific fields
+    if data['type'] == 'receipt':
+        new_operation.update({
+            'supplier': data.get('supplier', ''),
+            'items_count': data.get('items_count', 0),
+            'total_value': float(data.get('total_value', 0))
+        })
+    elif data['type'] == 'delivery':
+        new_operation.update({
+            'customer': data.get('customer', ''),
+            'delivery_address': data.get('delivery_address', ''),
+            'items_count': data.get('items_count', 0)
+        })
+    elif data['type'] == 'transfer':
+        new_operation.update({
+            'from_location': data.get('from_location', ''),
+            'to_location': data.get('to_location', ''),
+            'product_id': data.get('product_id', ''),
+            'quantity': data.get('quantity', 0)
+        })
+    return new_operation
+
+def bulk_create_response(collection_name, items, validate, build, uid):
+    """Validate and batch-write a list of payloads, returning a Flask response"""
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'message': f'A non-empty "{collection_name}" list is required'}), 400
+    if len(items) > BULK_CREATE_MAX_ITEMS:
+        return jsonify({'success': False, 'message': f'At most {BULK_CREATE_MAX_ITEMS} {collection_name} per request'}), 400
+    
+    # Reject the whole request before writing anything
+    errors = [{'index': index, 'message': error}
+              for index, error in ((index, validate(item or {})) for index, item in enumerate(items)) if error]
+    if errors:
+        return jsonify({'success': False, 'message': f'{len(errors)} invalid {collection_name}', 'errors': errors}), 400
+    
+    ids, stats = bulk_create(get_firestore(), collection_name, [build(item, uid) for item in items],
+                             progress=print_progress(collection_name))
+    print(f"✅ Bulk created {len(ids)} {collection_name} in Firebase ({stats['batches']} batches, {stats['elapsed_ms']}ms)")
+    
+    return jsonify({
+        'success': True,
+        'message': f'Created {len(ids)} {collection_name} in Firebase Firestore',
+        'ids': ids,
+        'stats': stats
+    }), 201
+
 # Health check
-@app.route('/health')
+@bp.route('/health')
 def health():
+    db = get_firestore()
+    bucket = get_bucket()
     firebase_status = "connected" if db else "disconnected"
     return jsonify({
         'status': 'healthy',
@@ -78,38 +169,28 @@ def health():
         'database_status': firebase_status,
         'services': {
             'firestore': db is not None,
-            'auth': firebase_admin._apps != {},
+            'auth': get_firebase_app() is not None,
             'storage': bucket is not None
         }
     })
 
 # Authentication middleware
 def verify_token(request):
-    """Verify Firebase ID token"""
-    try:
-        # Get the token from Authorization header
-        auth_header = request.headers.get('Authorization')
-        if not auth_header:
-            return None, 'No authorization header'
-        
-        # Extract token from "Bearer <token>"
-        if not auth_header.startswith('Bearer '):
-            return None, 'Invalid authorization header format'
-        
-        token = auth_header.split(' ')[1]
-        
-        # Verify the token with Firebase
-        decoded_token = firebase_auth.verify_id_token(token)
-        return decoded_token, None
-        
-    except Exception as e:
-        return None, f'Token verification failed: {str(e)}'
+    """Verify Firebase ID token (decoded tokens are cached until they expire)"""
+    return verify_request(request)
+
+@bp.route('/api/admin/token-stats', methods=['GET'])
+@require_auth
+def get_token_stats():
+    """Return token cache hit-rate and verification latency"""
+    return jsonify({'success': True, 'stats': token_verifier.stats()})
 
 # Dashboard endpoints
-@app.route('/api/dashboard/stats', methods=['GET'])
+@bp.route('/api/dashboard/stats', methods=['GET'])
 def get_dashboard_stats():
     """Return dashboard statistics"""
     try:
+        db = get_firestore()
         if not db:
             return jsonify({'success': False, 'message': 'Firebase not connected'}), 500
         
@@ -118,15 +199,22 @@ def get_dashboard_stats():
         users_ref = db.collection('users')
         operations_ref = db.collection('operations')
         
+        # The three collections are independent, so read them concurrently
+        results = run_parallel(
+            products=lambda: collection_to_list(products_ref),
+            operations=lambda: collection_to_list(operations_ref),
+            users=lambda: collection_to_list(users_ref)
+        )
+        
         # Get product statistics
-        products = collection_to_list(products_ref)
+        products = results['products']
         total_products = len(products)
         in_stock = len([p for p in products if p.get('stock', 0) > 0])
         low_stock = len([p for p in products if 0 < p.get('stock', 0) <= p.get('reorder_level', 10)])
         out_of_stock = len([p for p in products if p.get('stock', 0) == 0])
         
         # Get operation statistics
-        operations = collection_to_list(operations_ref)
+        operations = results['operations']
         pending_receipts = len([o for o in operations if o.get('type') == 'receipt' and o.get('status') == 'pending'])
         pending_deliveries = len([o for o in operations if o.get('type') == 'delivery' and o.get('status') == 'pending'])
         internal_transfers = len([o for o in operations if o.get('type') == 'transfer'])
@@ -134,7 +222,7 @@ def get_dashboard_stats():
         # Get recent activity (last 5 operations)
         recent_operations = sorted(operations, key=lambda x: x.get('date', ''), reverse=True)[:5]
         
-        users = collection_to_list(users_ref)
+        users = results['users']
         
         stats = {
             'products': {
@@ -173,15 +261,21 @@ def get_dashboard_stats():
         return jsonify({'success': False, 'message': f'Error getting dashboard stats: {str(e)}'}), 500
 
 # Products endpoints
-@app.route('/api/products', methods=['GET', 'POST'])
+@bp.route('/api/products', methods=['GET', 'POST'])
 def handle_products():
     if request.method == 'GET':
         try:
+            db = get_firestore()
             if not db:
                 return jsonify({'success': False, 'message': 'Firebase not connected'}), 500
             
-            products_ref = db.collection('products')
-            products = collection_to_list(products_ref)
+            if CATALOG_REPLICA:
+                product_catalog.start()
+            if CATALOG_REPLICA and product_catalog.is_ready():
+                products = product_catalog.find()
+            else:
+                products_ref = db.collection('products')
+                products = collection_to_list(products_ref)
             
             return jsonify({
                 'success': True,
@@ -196,6 +290,7 @@ def handle_products():
     
     elif request.method == 'POST':
         try:
+            db = get_firestore()
             if not db:
                 return jsonify({'success': False, 'message': 'Firebase not connected'}), 500
             
@@ -207,49 +302,12 @@ def handle_products():
             data = request.get_json()
             
             # Validate required fields
-            if not data.get('name'):
-                return jsonify({'success': False, 'message': 'Product name is required'}), 400
-            
-            if not data.get('category'):
-                return jsonify({'success': False, 'message': 'Category is required'}), 400
+            error = validate_product(data)
+            if error:
+                return jsonify({'success': False, 'message': error}), 400
             
-            # Generate unique SKU
-            sku = generate_sku(data['name'])
             products_ref = db.collection('products')
-            
-            # Check if SKU already exists
-            while products_ref.where('sku', '==', sku).limit(1).get():
-                sku = generate_sku(data['name'])
-            
-            # Determine status based on stock and reorder level
-            stock = data.get('stock', 0)
-            reorder_level = data.get('reorder_level', 10)
-            
-            if stock == 0:
-                status = 'Out of Stock'
-            elif stock <= reorder_level:
-                status = 'Low Stock'
-            else:
-                status = 'In Stock'
-            
-            # Create new product document
-            new_product = {
-                'name': data['name'],
-                'sku': sku,
-                'category': data['category'],
-                'stock': stock,
-                'unit': data.get('unit', 'pieces'),
-                'status': status,
-                'location': data.get('location', 'Main Warehouse'),
-                'reorder_level': reorder_level,
-                'supplier': data.get('supplier', ''),
-                'cost_price': float(data.get('cost_price', 0)),
-                'selling_price': float(data.get('selling_price', 0)),
-                'description': data.get('description', ''),
-                'created_by': decoded_token['uid'],
-                'created_at': firestore.SERVER_TIMESTAMP,
-                'updated_at': firestore.SERVER_TIMESTAMP
-            }
+            new_product = build_product(data, decoded_token['uid'])
             
             # Add to Firestore
             doc_ref = products_ref.add(new_product)
@@ -270,11 +328,35 @@ def handle_products():
                 'message': f'Error creating product: {str(e)}'
             }), 500
 
+@bp.route('/api/products/bulk', methods=['POST'])
+def bulk_create_products():
+    """Create many products in batched writes"""
+    try:
+        db = get_firestore()
+        if not db:
+            return jsonify({'success': False, 'message': 'Firebase not connected'}), 500
+        
+        # Verify authentication
+        decoded_token, error = verify_token(request)
+        if error:
+            return jsonify({'success': False, 'message': f'Authentication required: {error}'}), 401
+        
+        data = request.get_json() or {}
+        return bulk_create_response('products', data.get('products'), validate_product, build_product, decoded_token['uid'])
+        
+    except Exception as e:
+        print(f"❌ Error bulk creating products: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'Error bulk creating products: {str(e)}'
+        }), 500
+
 # Users endpoints
-@app.route('/api/users', methods=['GET', 'POST'])
+@bp.route('/api/users', methods=['GET', 'POST'])
 def handle_users():
     if request.method == 'GET':
         try:
+            db = get_firestore()
             if not db:
                 return jsonify({'success': False, 'message': 'Firebase not connected'}), 500
             
@@ -294,6 +376,7 @@ def handle_users():
     
     elif request.method == 'POST':
         try:
+            db = get_firestore()
             if not db:
                 return jsonify({'success': False, 'message': 'Firebase not connected'}), 500
             
@@ -359,18 +442,28 @@ def handle_users():
             }), 500
 
 # Operations endpoints
-@app.route('/api/operations', methods=['GET', 'POST'])
+@bp.route('/api/operations', methods=['GET', 'POST'])
 def handle_operations():
     if request.method == 'GET':
         try:
+            db = get_firestore()
             if not db:
                 return jsonify({'success': False, 'message': 'Firebase not connected'}), 500
             
-            operations_ref = db.collection('operations')
-            operations = collection_to_list(operations_ref)
-            
-            # Sort by date (most recent first)
-            operations.sort(key=lambda x: x.get('date', ''), reverse=True)
+            # Filtering, ordering and the limit run in Firestore, backed by the
+            # composite indexes in get_firestore_indexes()
+            query = db.collection('operations')
+            for field in ('type', 'status'):
+                if request.args.get(field):
+                    query = query.where(field, '==', request.args[field])
+            
+            try:
+                limit = int(request.args.get('limit', 100))
+            except ValueError:
+                return jsonify({'success': False, 'message': 'limit must be an integer'}), 400
+            limit = max(1, min(limit, OPERATIONS_MAX_LIMIT))
+            query = query.order_by('date', direction=firestore.Query.DESCENDING).limit(limit)
+            operations = collection_to_list(query)
             
             return jsonify({
                 'success': True,
@@ -385,6 +478,7 @@ def handle_operations():
     
     elif request.method == 'POST':
         try:
+            db = get_firestore()
             if not db:
                 return jsonify({'success': False, 'message': 'Firebase not connected'}), 500
             
@@ -396,42 +490,11 @@ def handle_operations():
             data = request.get_json()
             
             # Validate required fields
-            if not data.get('type'):
-                return jsonify({'success': False, 'message': 'Operation type is required'}), 400
-            
-            if not data.get('description'):
-                return jsonify({'success': False, 'message': 'Description is required'}), 400
-            
-            # Create new operation document
-            new_operation = {
-                'type': data['type'],
-                'description': data['description'],
-                'status': data.get('status', 'pending'),
-                'date': firestore.SERVER_TIMESTAMP,
-                'created_by': decoded_token['uid'],
-                'updated_at': firestore.SERVER_TIMESTAMP
-            }
+            error = validate_operation(data)
+            if error:
+                return jsonify({'success': False, 'message': error}), 400
             
-            # Add type-specific fields
-            if data['type'] == 'receipt':
-                new_operation.update({
-                    'supplier': data.get('supplier', ''),
-                    'items_count': data.get('items_count', 0),
-                    'total_value': float(data.get('total_value', 0))
-                })
-            elif data['type'] == 'delivery':
-                new_operation.update({
-                    'customer': data.get('customer', ''),
-                    'delivery_address': data.get('delivery_address', ''),
-                    'items_count': data.get('items_count', 0)
-                })
-            elif data['type'] == 'transfer':
-                new_operation.update({
-                    'from_location': data.get('from_location', ''),
-                    'to_location': data.get('to_location', ''),
-                    'product_id': data.get('product_id', ''),
-                    'quantity': data.get('quantity', 0)
-                })
+            new_operation = build_operation(data, decoded_token['uid'])
             
             # Add to Firestore
             operations_ref = db.collection('operations')
@@ -453,11 +516,35 @@ def handle_operations():
                 'message': f'Error creating operation: {str(e)}'
             }), 500
 
+@bp.route('/api/operations/bulk', methods=['POST'])
+def bulk_create_operations():
+    """Create many operations in batched writes"""
+    try:
+        db = get_firestore()
+        if not db:
+            return jsonify({'success': False, 'message': 'Firebase not connected'}), 500
+        
+        # Verify authentication
+        decoded_token, error = verify_token(request)
+        if error:
+            return jsonify({'success': False, 'message': f'Authentication required: {error}'}), 401
+        
+        data = request.get_json() or {}
+        return bulk_create_response('operations', data.get('operations'), validate_operation, build_operation, decoded_token['uid'])
+        
+    except Exception as e:
+        print(f"❌ Error bulk creating operations: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'Error bulk creating operations: {str(e)}'
+        }), 500
+
 # Image upload endpoint
-@app.route('/api/upload-image', methods=['POST'])
+@bp.route('/api/upload-image', methods=['POST'])
 def upload_image():
     """Upload image to Firebase Storage"""
     try:
+        bucket = get_bucket()
         if not bucket:
             return jsonify({'success': False, 'message': 'Firebase Storage not connected'}), 500
         
@@ -504,10 +591,11 @@ def upload_image():
         }), 500
 
 # Add sample data endpoint
-@app.route('/api/admin/add-sample-data', methods=['POST'])
+@bp.route('/api/admin/add-sample-data', methods=['POST'])
 def add_sample_data():
     """Add sample data to Firebase Firestore"""
     try:
+        db = get_firestore()
         if not db:
             return jsonify({'success': False, 'message': 'Firebase not connected'}), 500
         
@@ -518,7 +606,7 @@ def add_sample_data():
         
         # Check if data already exists
         products_ref = db.collection('products')
-        if len(collection_to_list(products_ref)) > 0:
+        if len(collection_to_list(products_ref.limit(1))) > 0:
             return jsonify({'success': False, 'message': 'Sample data already exists'}), 400
         
         # Sample products
@@ -577,10 +665,7 @@ def add_sample_data():
         ]
         
         # Add products to Firestore
-        products_added = 0
-        for product in sample_products:
-            products_ref.add(product)
-            products_added += 1
+        products_added = len(bulk_create(db, 'products', sample_products)[0])
         
         # Sample users
         sample_users = [
@@ -613,11 +698,7 @@ def add_sample_data():
         ]
         
         # Add users to Firestore
-        users_ref = db.collection('users')
-        users_added = 0
-        for user in sample_users:
-            users_ref.add(user)
-            users_added += 1
+        users_added = len(bulk_create(db, 'users', sample_users)[0])
         
         # Sample operations
         sample_operations = [
@@ -657,11 +738,7 @@ def add_sample_data():
         ]
         
         # Add operations to Firestore
-        operations_ref = db.collection('operations')
-        operations_added = 0
-        for operation in sample_operations:
-            operations_ref.add(operation)
-            operations_added += 1
+        operations_added = len(bulk_create(db, 'operations', sample_operations)[0])
         
         print(f"✅ Sample data added to Firebase: {products_added} products, {users_added} users, {operations_added} operations")
         
@@ -683,12 +760,17 @@ def add_sample_data():
         }), 500
 
 if __name__ == '__main__':
+    from app import create_app
+
+    app = create_app({'DATA_BACKEND': 'firebase'})
+    print("🚀 StockMaster Backend API starting...")
+    print("🔥 Database Status: FIREBASE - Data will persist in Firebase Firestore")
     print("🌐 Starting server on http://localhost:5000")
-    if db:
+    if get_firestore():
         print("🎯 Backend ready - Firebase connected and ready to store data!")
         print("   🔥 Firestore for data storage")
         print("   🔐 Firebase Auth for authentication")
         print("   💾 Firebase Storage for images")
     else:
         print("⚠️  Warning: Firebase not connected - check configuration")
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,231 @@
+"""
+In-process data backends and synthetic data for benchmarks
+
+A local `mongod` binary is used when one is on PATH (started on a throwaway
+data directory); otherwise everything runs against mongomock.
+start_replica_set() starts several mongods as one replica set, for checks
+that need secondaries.
+"""
+
+import os
+import random
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from utils.movements import create_movements_collection, to_document
+
+CATEGORIES = ['Raw Materials', 'Furniture', 'Electronics', 'Supplies', 'Tools', 'Equipment']
+LOCATIONS = ['Warehouse A', 'Warehouse B', 'Main Store', 'Storage Room', 'Production Floor']
+STATUSES = ['draft', 'waiting', 'ready', 'done', 'canceled']
+
+class Backend:
+    """A MongoClient plus whatever is needed to shut it down"""
+
+    def __init__(self, client, name, uri=None, process=None, data_dir=None):
+        self.client = client
+        self.name = name
+        self.uri = uri
+        self._processes = process if isinstance(process, list) else [process] if process else []
+        self._data_dir = data_dir
+
+    def stop(self):
+        self.client.close()
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.wait(timeout=30)
+        if self._data_dir:
+            shutil.rmtree(self._data_dir, ignore_errors=True)
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_backend(prefer_mongod=True, mongod_args=()):
+    """Start a local mongod if available, falling back to mongomock"""
+    mongod = shutil.which('mongod') if prefer_mongod else None
+    if not mongod:
+        import mongomock
+        return Backend(mongomock.MongoClient(), 'mongomock')
+
+    from pymongo import MongoClient
+    data_dir = tempfile.mkdtemp(prefix='stockmaster-bench-')
+    port = _free_port()
+    process = subprocess.Popen(
+        [mongod, '--dbpath', data_dir, '--port', str(port), '--bind_ip', '127.0.0.1', *mongod_args],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    uri = f'mongodb://127.0.0.1:{port}'
+    client = MongoClient(uri, serverSelectionTimeoutMS=1000)
+    for _ in range(100):
+        try:
+            client.admin.command('ping')
+            break
+        except Exception:
+            time.sleep(0.2)
+    else:
+        process.terminate()
+        raise RuntimeError('mongod did not start')
+    return Backend(client, f'mongod {port}', uri, process, data_dir)
+
+def start_replica_set(members=3, mongod_args=()):
+    """Start a local replica set whose first member is always primary; None without mongod"""
+    mongod = shutil.which('mongod')
+    if not mongod:
+        return None
+
+    from pymongo import MongoClient
+    data_dir = tempfile.mkdtemp(prefix='stockmaster-rs-')
+    ports = [_free_port() for _ in range(members)]
+    processes = []
+    for index, port in enumerate(ports):
+        member_dir = os.path.join(data_dir, str(index))
+        os.makedirs(member_dir)
+        processes.append(subprocess.Popen(
+            [mongod, '--replSet', 'rs0', '--dbpath', member_dir, '--port', str(port), '--bind_ip', '127.0.0.1',
+             # Test commands allow pausing replication with a fail point
+             '--setParameter', 'enableTestCommands=1', *mongod_args],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ))
+    hosts = [f'127.0.0.1:{port}' for port in ports]
+    uri = f"mongodb://{','.join(hosts)}/?replicaSet=rs0"
+    backend = Backend(MongoClient(hosts[0], directConnection=True, serverSelectionTimeoutMS=1000),
+                      f'replica set of {members}', uri, processes, data_dir)
+
+    for _ in range(100):
+        try:
+            backend.client.admin.command('ping')
+            break
+        except Exception:
+            time.sleep(0.2)
+    else:
+        backend.stop()
+        raise RuntimeError('mongod did not start')
+    backend.client.admin.command('replSetInitiate', {'_id': 'rs0', 'members': [
+        {'_id': index, 'host': host, 'priority': 1 if index == 0 else 0} for index, host in enumerate(hosts)
+    ]})
+    backend.client.close()
+
+    backend.client = MongoClient(uri, serverSelectionTimeoutMS=30000)
+    deadline = time.monotonic() + 60
+    while backend.client.primary is None or len(backend.client.secondaries) < members - 1:
+        if time.monotonic() > deadline:
+            backend.stop()
+            raise RuntimeError('replica set did not elect a primary with secondaries')
+        backend.client.admin.command('ping')
+        time.sleep(0.5)
+    return backend
+
+def _batched_insert(collection, docs, batch_size=10000):
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+
+def seed(db, products, seed_value=42):
+    """Fill a database with `products` products, a tenth as many of each operation,
+    one ledger row per product and a few users. Returns sample ids for path params."""
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+
+    product_ids = [ObjectId() for _ in range(products)]
+
+    def product_docs():
+        for i, product_id in enumerate(product_ids):
+            stock = rng.randint(0, 500)
+            reorder_level = rng.randint(10, 60)
+            status = 'Out of Stock' if stock == 0 else 'Low Stock' if stock <= reorder_level else 'In Stock'
+            yield {
+                '_id': product_id,
+                'name': f'Product {i}',
+                'sku': f'BEN-{i:07d}',
+                'category': rng.choice(CATEGORIES),
+                'stock': stock,
+                'unit': 'units',
+                'status': status,
+                'location': rng.choice(LOCATIONS),
+                'reorder_level': reorder_level,
+                'supplier': f'Supplier {i % 50}',
+                'cost_price': round(rng.uniform(1, 100), 2),
+                'selling_price': round(rng.uniform(100, 200), 2),
+                'created_at': now - timedelta(minutes=i),
+                'updated_at': now - timedelta(minutes=i),
+                'created_by': 'bench'
+            }
+
+    def item(i):
+        index = rng.randrange(products)
+        return {'product_id': str(product_ids[index]), 'product_name': f'Product {index}',
+                'sku': f'BEN-{index:07d}', 'quantity': rng.randint(1, 50), 'unit_price': 10.0}
+
+    def operation_docs(kind, prefix, extra):
+        for i in range(max(products // 10, 1)):
+            items = [item(i) for _ in range(rng.randint(1, 4))]
+            yield {
+                f'{kind}_id': f'{prefix}-{now:%Y%m%d}-{i + 1:03d}',
+                'items': items,
+                'total_items': len(items),
+                'status': rng.choice(STATUSES),
+                'notes': '',
+                'created_by': 'bench',
+                'created_at': now - timedelta(minutes=i),
+                'updated_at': now - timedelta(minutes=i),
+                **extra()
+            }
+
+    def movement_docs():
+        for i in range(products):
+            index = rng.randrange(products)
+            yield to_document({
+                'movement_id': f'MOV-{now:%Y%m%d}-{i + 1:03d}',
+                'type': rng.choice(['receipt', 'delivery', 'transfer', 'adjustment']),
+                'product_id': product_ids[index],
+                'product_name': f'Product {index}',
+                'sku': f'BEN-{index:07d}',
+                'quantity': rng.randint(1, 50),
+                'from_location': rng.choice(LOCATIONS),
+                'to_location': rng.choice(LOCATIONS),
+                'reference_id': f'RCP-{now:%Y%m%d}-{i + 1:03d}',
+                'created_by': 'bench',
+                'timestamp': now - timedelta(seconds=i)
+            })
+
+    _batched_insert(db.products, product_docs())
+    _batched_insert(db.receipts, operation_docs('receipt', 'RCP', lambda: {'supplier': f'Supplier {rng.randrange(50)}'}))
+    _batched_insert(db.deliveries, operation_docs('delivery', 'DEL', lambda: {'customer': f'Customer {rng.randrange(50)}'}))
+    _batched_insert(db.transfers, operation_docs('transfer', 'TRF', lambda: {
+        'from_location': rng.choice(LOCATIONS), 'to_location': rng.choice(LOCATIONS)}))
+    _batched_insert(db.adjustments, operation_docs('adjustment', 'ADJ', lambda: {
+        'product_id': str(product_ids[0]), 'product_name': 'Product 0', 'sku': 'BEN-0000000',
+        'quantity': -1, 'reason': 'Damaged goods', 'location': LOCATIONS[0]}))
+    create_movements_collection(db)
+    _batched_insert(db.stock_movements, movement_docs())
+    _batched_insert(db.users, ({
+        'name': f'User {i}', 'email': f'user{i}@stockmaster.com', 'role': rng.choice(['admin', 'manager', 'staff']),
+        'department': 'Warehouse', 'location': rng.choice(LOCATIONS), 'status': 'active',
+        'created_at': now, 'updated_at': now
+    } for i in range(50)))
+
+    return {
+        'product_id': str(product_ids[0]),
+        'user_id': str(db.users.find_one()['_id']),
+        'operation_type': 'receipts',
+        'operation_id': str(db.receipts.find_one()['_id'])
+    }
+
+def use_backend(client, db_name='stockmaster_bench'):
+    """Point the app's shared database layer at a benchmark client"""
+    from utils import db as db_module
+    db_module.configure(db_name=db_name)
+    db_module._client = client
+    db_module._client_pid = os.getpid()
+    return client[db_name]
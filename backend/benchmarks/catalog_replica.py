@@ -0,0 +1,145 @@
+"""
+Catalog replica: consistency under changes and read latency
+
+Seeds products, starts a CatalogReplica fed by an injected change source
+(the database writes are mirrored into a queue, as a change stream would
+deliver them), applies a stream of random inserts, updates and deletes and
+checks that every list/filter/get/SKU read then matches the database. Finally
+compares read latency for the product routes' queries against the database.
+
+    python -m benchmarks.catalog_replica --products 20000 --changes 5000
+"""
+
+import argparse
+import os
+import queue
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.backend import LOCATIONS, start_backend, seed
+from utils.catalog_replica import CatalogReplica
+
+class QueueSource:
+    """Change source fed by the benchmark's own writes"""
+
+    def __init__(self, events):
+        self.resume_token = None
+        self._events = events
+
+    def try_next(self):
+        try:
+            return self._events.get(timeout=0.05)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        pass
+
+def apply_random_changes(db, events, count, rng):
+    ids = [doc['_id'] for doc in db.products.find({}, {'_id': 1})]
+    for i in range(count):
+        action = rng.random()
+        if action < 0.2:
+            doc = {'name': f'New Product {i}', 'sku': f'NEW-{i:07d}', 'category': 'Tools',
+                   'status': 'In Stock', 'location': rng.choice(LOCATIONS), 'stock': 100}
+            db.products.insert_one(doc)
+            ids.append(doc['_id'])
+            events.put({'operationType': 'insert', 'documentKey': {'_id': doc['_id']}, 'fullDocument': doc})
+        elif action < 0.9:
+            product_id = rng.choice(ids)
+            stock = rng.randint(0, 100)
+            db.products.update_one({'_id': product_id}, {'$set': {
+                'stock': stock, 'status': 'Out of Stock' if stock == 0 else 'Low Stock' if stock < 20 else 'In Stock',
+                'location': rng.choice(LOCATIONS)}})
+            events.put({'operationType': 'update', 'documentKey': {'_id': product_id},
+                        'fullDocument': db.products.find_one({'_id': product_id})})
+        else:
+            product_id = ids.pop(rng.randrange(len(ids)))
+            db.products.delete_one({'_id': product_id})
+            events.put({'operationType': 'delete', 'documentKey': {'_id': product_id}})
+
+def check_consistency(db, replica):
+    failures = []
+
+    def compare(label, expected, actual):
+        if sorted(map(str, expected)) != sorted(map(str, actual)):
+            failures.append(label)
+
+    compare('list', [d['_id'] for d in db.products.find()], [d['_id'] for d in replica.find()])
+    for location in LOCATIONS:
+        compare(f'location={location}', [d['_id'] for d in db.products.find({'location': location})],
+                [d['_id'] for d in replica.find(location=location)])
+    for status in ('In Stock', 'Low Stock', 'Out of Stock'):
+        compare(f'status={status}', [d['_id'] for d in db.products.find({'status': status})],
+                [d['_id'] for d in replica.find(status=status)])
+    compare('categories', db.products.distinct('category'), replica.distinct('category'))
+    for doc in db.products.find().limit(200):
+        if replica.get(doc['_id']) != doc or replica.get_by_sku(doc['sku']) != doc:
+            failures.append(f"get {doc['_id']}")
+    return failures
+
+def time_reads(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--changes', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    backend = start_backend(prefer_mongod=True)
+    try:
+        db = backend.client['stockmaster_bench']
+        seed(db, args.products)
+        rng = random.Random(7)
+        events = queue.Queue()
+
+        replica = CatalogReplica(lambda: db.products.find(), lambda token: QueueSource(events))
+        replica.start()
+        if not replica.wait_ready(timeout=60):
+            print("❌ Replica did not finish loading")
+            sys.exit(1)
+        print(f"✅ Replica loaded {replica.stats()['products']:,} products from {backend.name}")
+
+        apply_random_changes(db, events, args.changes, rng)
+        while not events.empty():
+            time.sleep(0.05)
+        time.sleep(0.2)
+
+        failures = check_consistency(db, replica)
+        if failures:
+            print(f"❌ Replica differs from the database: {', '.join(failures[:10])}")
+            sys.exit(1)
+        print(f"✅ Replica matches the database after {args.changes:,} changes ({replica.stats()})")
+
+        product_id = db.products.find_one({'_id': {'$exists': True}})['_id']
+        sku = db.products.find_one({'_id': product_id})['sku']
+        reads = {
+            'list': (lambda: list(db.products.find()), lambda: replica.find()),
+            'filter': (lambda: list(db.products.find({'location': 'Warehouse A', 'status': 'In Stock'})),
+                       lambda: replica.find(location='Warehouse A', status='In Stock')),
+            'get': (lambda: db.products.find_one({'_id': product_id}), lambda: replica.get(product_id)),
+            'sku': (lambda: db.products.find_one({'sku': sku}), lambda: replica.get_by_sku(sku)),
+            'categories': (lambda: db.products.distinct('category'), lambda: replica.distinct('category'))
+        }
+        print(f"\n{'read':<12}{'database ms':>14}{'replica ms':>14}{'speedup':>10}")
+        for name, (from_db, from_replica) in reads.items():
+            db_ms = time_reads(from_db, args.rounds)
+            replica_ms = time_reads(from_replica, args.rounds)
+            print(f"{name:<12}{db_ms:>14.3f}{replica_ms:>14.3f}{db_ms / max(replica_ms, 1e-6):>9.1f}x")
+        replica.stop()
+    finally:
+        backend.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Bytes on the wire and encode/decode time per response encoding
+
+Seeds a catalog, then requests large pages of /api/products/,
+/api/operations/receipts and /api/operations/movements in every negotiated
+media type and content coding, reporting body size, server time and client
+decode time.
+
+    python -m benchmarks.encodings --products 20000 --rounds 5
+"""
+
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['FLASK_ENV'] = 'production'
+
+import brotli
+import msgpack
+from benchmarks.backend import start_backend, seed, use_backend
+from utils.encoding import JSON, MSGPACK, COLUMNAR_JSON, COLUMNAR_MSGPACK
+
+ROUTES = ['/api/products/', '/api/operations/receipts', '/api/operations/movements?limit={products}']
+CODINGS = ['identity', 'gzip', 'br']
+
+def decode(body, media_type, coding):
+    if coding == 'gzip':
+        body = gzip.decompress(body)
+    elif coding == 'br':
+        body = brotli.decompress(body)
+    if media_type in (MSGPACK, COLUMNAR_MSGPACK):
+        return msgpack.unpackb(body)
+    return json.loads(body)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    backend = start_backend(prefer_mongod=True)
+    try:
+        from app import create_app
+        app = create_app({'DATA_BACKEND': 'mongo', 'MONGO_DB_NAME': 'stockmaster_bench'})
+        db = use_backend(backend.client)
+        seed(db, args.products)
+        client = app.test_client()
+
+        for route in ROUTES:
+            path = route.format(products=args.products)
+            print(f"\n{path} ({backend.name})")
+            print(f"{'encoding':<46}{'bytes':>12}{'ratio':>8}{'server ms':>12}{'decode ms':>12}")
+            baseline = None
+            for media_type in (JSON, MSGPACK, COLUMNAR_JSON, COLUMNAR_MSGPACK):
+                for coding in CODINGS:
+                    server_ms, decode_ms = [], []
+                    for _ in range(args.rounds):
+                        started = time.perf_counter()
+                        response = client.get(path, headers={'Accept': media_type, 'Accept-Encoding': coding})
+                        server_ms.append((time.perf_counter() - started) * 1000)
+                        started = time.perf_counter()
+                        decode(response.data, media_type, response.headers.get('Content-Encoding'))
+                        decode_ms.append((time.perf_counter() - started) * 1000)
+
+                    size = len(response.data)
+                    baseline = baseline or size
+                    label = f"{media_type.split('/')[-1]} + {coding}"
+                    print(f"{label:<46}{size:>12,}{baseline / size:>7.1f}x"
+                          f"{statistics.median(server_ms):>12.1f}{statistics.median(decode_ms):>12.2f}")
+    finally:
+        backend.stop()
+
+if __name__ == '__main__':
+    main()
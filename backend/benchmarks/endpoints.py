@@ -0,0 +1,186 @@
+"""
+Endpoint benchmark suite
+
+Seeds a local stand-in database (local mongod if present, else mongomock) at
+several scales, drives every blueprint endpoint through the Flask test client
+and records p50/p95/p99 latency, throughput and peak RSS. Results are written
+as JSON; pass --compare with an earlier result file to flag regressions.
+
+    python -m benchmarks.endpoints --scales 1000,10000 --requests 30
+    python -m benchmarks.endpoints --compare benchmarks/results/previous.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The blueprints serve mock data in development mode
+os.environ['FLASK_ENV'] = 'production'
+
+from benchmarks.backend import start_backend, seed, use_backend
+
+# Server-Sent Events never finish, so they cannot be timed request by request
+STREAMING_PREFIXES = ('/api/stream',)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Request bodies for write endpoints, keyed by "METHOD rule"
+BODIES = {
+    'POST /api/products/': lambda n: {'name': f'Bench {n}', 'sku': f'NEW-{n:07d}', 'category': 'Tools',
+                                      'unit': 'units', 'location': 'Warehouse A', 'stock': 10},
+    'PUT /api/products/<product_id>': lambda n: {'stock': n % 100},
+    'POST /api/operations/receipts': lambda n: {'supplier': 'Bench Supplier', 'items': [
+        {'product_id': '1', 'product_name': 'Bench', 'sku': 'BEN-0000001', 'quantity': 1, 'unit_price': 2.0}]},
+    'POST /api/operations/deliveries': lambda n: {'customer': 'Bench Customer', 'items': [
+        {'product_id': '1', 'product_name': 'Bench', 'sku': 'BEN-0000001', 'quantity': 1, 'unit_price': 2.0}]},
+    'POST /api/operations/transfers': lambda n: {'from_location': 'Warehouse A', 'to_location': 'Warehouse B',
+                                                 'items': [{'product_id': '1', 'quantity': 1}]},
+    'POST /api/operations/adjustments': lambda n: {'product_id': '1', 'product_name': 'Bench', 'sku': 'BEN-0000001',
+                                                   'quantity': -1, 'reason': 'Damaged', 'location': 'Warehouse A'},
+    'PUT /api/operations/<operation_type>/<operation_id>/status': lambda n: {'status': 'ready'},
+    'POST /api/users/': lambda n: {'name': f'Bench {n}', 'email': f'bench{n}@stockmaster.com', 'role': 'staff'},
+    'PUT /api/users/<user_id>': lambda n: {'department': 'Bench'},
+    'POST /api/auth/register': lambda n: {'name': f'Bench {n}', 'email': f'register{n}@stockmaster.com'},
+    'PUT /api/auth/update-profile': lambda n: {'name': 'Bench'}
+}
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)]
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if platform.system() == 'Darwin' else 1024), 1)
+
+def endpoints(app):
+    """List (method, rule) for every blueprint endpoint, destructive ones last"""
+    found = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == 'static' or rule.rule.startswith(STREAMING_PREFIXES):
+            continue
+        for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}):
+            found.append((method, rule.rule))
+    return sorted(found, key=lambda e: (e[0] == 'DELETE', e[0] != 'GET', e[1]))
+
+def bench_endpoint(client, method, rule, params, requests):
+    path = re.sub(r'<(?:[^:>]+:)?([^>]+)>', lambda m: params.get(m.group(1), 'unknown'), rule)
+    body = BODIES.get(f'{method} {rule}')
+    headers = {'Authorization': 'Bearer bench-token'}
+
+    samples, statuses, size = [], {}, 0
+    started = time.perf_counter()
+    for n in range(requests):
+        request_started = time.perf_counter()
+        response = client.open(path, method=method, json=body(n) if body else None, headers=headers)
+        samples.append((time.perf_counter() - request_started) * 1000)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        size = len(response.data)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'method': method,
+        'rule': rule,
+        'requests': requests,
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'throughput_rps': round(requests / elapsed, 1),
+        'response_bytes': size,
+        'statuses': {str(code): count for code, count in statuses.items()},
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def run_scale(scale, requests, prefer_mongod):
+    from app import create_app
+    from utils import auth
+
+    backend = start_backend(prefer_mongod)
+    try:
+        app = create_app({'DATA_BACKEND': 'mongo', 'MONGO_DB_NAME': 'stockmaster_bench'})
+        db = use_backend(backend.client)
+        db.client.drop_database('stockmaster_bench')
+
+        seed_started = time.perf_counter()
+        params = seed(db, scale)
+        seed_seconds = time.perf_counter() - seed_started
+
+        # Token verification is not what is being measured here
+        auth.token_verifier.verify = lambda token: {'uid': 'bench', 'exp': time.time() + 3600}
+
+        client = app.test_client()
+        results = []
+        for method, rule in endpoints(app):
+            result = bench_endpoint(client, method, rule, params, requests)
+            results.append(result)
+            print(f"   {method:6s} {rule:55s} p50 {result['p50_ms']:9.2f}ms  p99 {result['p99_ms']:9.2f}ms  "
+                  f"{result['throughput_rps']:8.1f} req/s")
+
+        return {'scale': scale, 'backend': backend.name, 'seed_seconds': round(seed_seconds, 2),
+                'peak_rss_mb': peak_rss_mb(), 'endpoints': results}
+    finally:
+        backend.stop()
+
+def compare(current, previous_path, threshold):
+    """Print endpoints whose p95 got worse than `threshold` (e.g. 0.2 = 20%)"""
+    with open(previous_path) as f:
+        previous = json.load(f)
+
+    baseline = {(run['scale'], e['method'], e['rule']): e
+                for run in previous['runs'] for e in run['endpoints']}
+    regressions = 0
+    for run in current['runs']:
+        for endpoint in run['endpoints']:
+            before = baseline.get((run['scale'], endpoint['method'], endpoint['rule']))
+            if not before or not before['p95_ms']:
+                continue
+            change = endpoint['p95_ms'] / before['p95_ms'] - 1
+            if change > threshold:
+                regressions += 1
+                print(f"⚠️  {run['scale']:>9} {endpoint['method']} {endpoint['rule']}: p95 "
+                      f"{before['p95_ms']:.2f}ms -> {endpoint['p95_ms']:.2f}ms (+{change:.0%})")
+    print(f"{'❌' if regressions else '✅'} {regressions} regressions over {threshold:.0%} compared to {previous_path}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', default='1000,10000', help='comma-separated product counts, e.g. 10000,100000,1000000')
+    parser.add_argument('--requests', type=int, default=30, help='requests per endpoint')
+    parser.add_argument('--mongomock', action='store_true', help='use mongomock even if mongod is installed')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/endpoints-<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier result file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='p95 regression threshold for --compare')
+    args = parser.parse_args()
+
+    runs = []
+    for scale in [int(s) for s in args.scales.split(',')]:
+        print(f"📊 Scale {scale:,} products")
+        runs.append(run_scale(scale, args.requests, not args.mongomock))
+
+    result = {
+        'benchmark': 'endpoints',
+        'created_at': datetime.utcnow().isoformat() + 'Z',
+        'python': platform.python_version(),
+        'requests_per_endpoint': args.requests,
+        'runs': runs
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"endpoints-{datetime.utcnow():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"💾 Results written to {output}")
+
+    if args.compare and compare(result, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Sequential vs fanned-out latency for the dashboard stats queries
+
+Runs the six independent count queries behind /api/dashboard/stats one after
+another and then through run_parallel. Against mongomock each call gets an
+injected round-trip latency; pass --uri to measure a real (local) mongod.
+
+    python -m benchmarks.fan_out_latency --latency-ms 5 --rounds 50
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.concurrency import run_parallel
+
+class LatentCollection:
+    """Wrap a mongomock collection so every call pays a simulated round trip"""
+
+    def __init__(self, collection, latency):
+        self._collection = collection
+        self._latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            time.sleep(self._latency)
+            return attr(*args, **kwargs)
+        return call
+
+class LatentDatabase:
+    def __init__(self, db, latency):
+        self._db = db
+        self._latency = latency
+
+    def __getattr__(self, name):
+        return LatentCollection(self._db[name], self._latency)
+
+def seed(db, products):
+    statuses = ['In Stock', 'Low Stock', 'Out of Stock']
+    db.products.insert_many([{'sku': f'BEN-{i:05d}', 'status': statuses[i % 3]} for i in range(products)])
+    for name in ('receipts', 'deliveries', 'transfers'):
+        db[name].insert_many([{'status': ['draft', 'waiting', 'done'][i % 3]} for i in range(products // 10 or 1)])
+
+def stats_queries(db):
+    pending = {'status': {'$in': ['draft', 'waiting']}}
+    return {
+        'total_products': lambda: db.products.count_documents({}),
+        'low_stock_products': lambda: db.products.count_documents({'status': 'Low Stock'}),
+        'out_of_stock_products': lambda: db.products.count_documents({'status': 'Out of Stock'}),
+        'pending_receipts': lambda: db.receipts.count_documents(pending),
+        'pending_deliveries': lambda: db.deliveries.count_documents(pending),
+        'internal_transfers': lambda: db.transfers.count_documents(pending)
+    }
+
+def measure(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), max(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--uri', help='MongoDB URI of a local mongod (default: mongomock)')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='injected latency per mongomock call')
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.uri:
+        from pymongo import MongoClient
+        client = MongoClient(args.uri)
+        client.drop_database('stockmaster_bench')
+        raw_db = db = client['stockmaster_bench']
+        target = args.uri.split('@')[-1]
+    else:
+        import mongomock
+        raw_db = mongomock.MongoClient()['stockmaster_bench']
+        db = LatentDatabase(raw_db, args.latency_ms / 1000)
+        target = f'mongomock with {args.latency_ms}ms injected latency'
+
+    seed(raw_db, args.products)
+    queries = stats_queries(db)
+
+    sequential = measure(lambda: {name: fn() for name, fn in queries.items()}, args.rounds)
+    parallel = measure(lambda: run_parallel(deadline=time.monotonic() + 30, **queries), args.rounds)
+
+    print(f"📊 Dashboard stats ({len(queries)} queries, {target}, {args.rounds} rounds)")
+    print(f"   Sequential:  p50 {sequential[0]:8.2f}ms  max {sequential[1]:8.2f}ms")
+    print(f"   Fanned out:  p50 {parallel[0]:8.2f}ms  max {parallel[1]:8.2f}ms")
+    print(f"   Speedup:     {sequential[0] / parallel[0]:.1f}x")
+
+    if args.uri:
+        client.drop_database('stockmaster_bench')
+
+if __name__ == '__main__':
+    main()
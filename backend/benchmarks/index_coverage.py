@@ -0,0 +1,140 @@
+"""
+Check that the queries each route runs are served by an index
+
+Starts a local mongod (required: mongomock cannot explain queries), seeds it,
+syncs the declared indexes, drives the read routes with their filters and
+explains every filtered or sorted query they issued. Exits non-zero when one
+of them falls back to a collection scan. The index specs and sync_indexes
+themselves are checked without a server by benchmarks/index_sync.py.
+
+    python -m benchmarks.index_coverage --products 5000
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['FLASK_ENV'] = 'production'
+
+from pymongo import MongoClient, monitoring
+from benchmarks.backend import start_backend, seed, use_backend
+from init_db import sync_indexes
+
+# Route requests to check; {name} placeholders are filled from the seeded ids
+CASES = [
+    '/api/products/?category=Tools',
+    '/api/products/?status=Low Stock',
+    '/api/products/?location=Warehouse A',
+    '/api/products/{product_id}',
+    '/api/products/categories',
+    '/api/products/locations',
+    '/api/dashboard/stats',
+    '/api/dashboard/low-stock',
+    '/api/dashboard/recent-operations',
+    '/api/operations/movements',
+    '/api/operations/movements?product_id={product_id}',
+    '/api/operations/movements?type=receipt',
+    '/api/users/?role=admin&status=active',
+    '/api/users/?department=Warehouse',
+    '/api/users/{user_id}',
+    '/api/users/departments'
+]
+
+# Unanchored case-insensitive regex search cannot use a B-tree index
+KNOWN_SCANS = {'/api/products/?search=steel'}
+
+class CommandCapture(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name in ('find', 'aggregate', 'count', 'distinct'):
+            self.commands.append((event.database_name, event.command_name, dict(event.command)))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def needs_index(command_name, command):
+    """Unfiltered, unsorted reads are expected to scan"""
+    if command_name == 'find':
+        return bool(command.get('filter')) or bool(command.get('sort'))
+    if command_name == 'aggregate':
+        first = command.get('pipeline', [{}])[0]
+        return bool(first.get('$match')) or '$sort' in first
+    if command_name == 'distinct':
+        return True  # served by DISTINCT_SCAN over the field's index
+    return bool(command.get('query'))
+
+def plan_stages(plan):
+    stages = set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            if 'stage' in node:
+                stages.add(node['stage'])
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(plan)
+    return stages
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=5000)
+    args = parser.parse_args()
+
+    backend = start_backend(prefer_mongod=True)
+    if not backend.uri:
+        backend.stop()
+        print("❌ index_coverage needs a local mongod binary on PATH (mongomock cannot explain queries)")
+        sys.exit(2)
+
+    capture = CommandCapture()
+    client = MongoClient(backend.uri, event_listeners=[capture])
+    try:
+        from app import create_app
+        app = create_app({'DATA_BACKEND': 'mongo', 'MONGO_DB_NAME': 'stockmaster_bench'})
+        db = use_backend(client)
+        params = seed(db, args.products)
+        sync_indexes(db)
+
+        test_client = app.test_client()
+        failures = 0
+        for case in CASES + sorted(KNOWN_SCANS):
+            path = case.format(**params)
+            capture.commands = []
+            test_client.get(path)
+
+            for database_name, command_name, command in capture.commands:
+                if not needs_index(command_name, command):
+                    continue
+                explained = {k: v for k, v in command.items() if not k.startswith('$') and k != 'lsid'}
+                plan = client[database_name].command('explain', explained, verbosity='queryPlanner')
+                stages = plan_stages(plan.get('queryPlanner', plan))
+                scans = 'COLLSCAN' in stages
+
+                if scans and case not in KNOWN_SCANS:
+                    failures += 1
+                    print(f"❌ {path}: {command_name} {command.get(command_name)} scans the collection")
+                else:
+                    status = 'known scan' if scans else ', '.join(sorted(stages))
+                    print(f"✅ {path}: {command_name} {command.get(command_name)} ({status})")
+
+        if failures:
+            print(f"❌ {failures} route queries are not served by an index")
+            sys.exit(1)
+        print("✅ Every filtered or sorted route query uses an index")
+    finally:
+        client.close()
+        backend.stop()
+
+if __name__ == '__main__':
+    main()
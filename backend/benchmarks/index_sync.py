@@ -0,0 +1,153 @@
+"""
+Check the declared index specs and init_db.sync_indexes against mongomock
+
+Needs no server, so it runs anywhere (index_coverage.py, which explains real
+query plans, needs a local mongod). Checks that:
+- every spec in get_collection_indexes() has valid keys, known options and a
+  name unique within its collection
+- a first sync creates every declared index and a second one changes nothing
+- --dry-run creates nothing
+- undeclared indexes are reported as stale, and only dropped with drop_stale
+- a changed index is rebuilt, while a unique rebuild over duplicate data, or a
+  rebuild whose new definition fails to build, keeps the existing index
+
+Exits non-zero on any failure.
+
+    python -m benchmarks.index_sync
+"""
+
+import contextlib
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mongomock
+from init_db import index_name, rebuild_index, sync_indexes
+from models.schemas import get_collection_indexes
+
+KNOWN_OPTIONS = {'keys', 'name', 'unique', 'partialFilterExpression', 'sparse', 'expireAfterSeconds',
+                 'default_language', 'weights'}
+DIRECTIONS = {1, -1, 'text', '2dsphere', 'hashed'}
+
+def fresh_db():
+    return mongomock.MongoClient()['stockmaster_check']
+
+def quiet_sync(db, **kwargs):
+    # sync_indexes prints one line per index; only the report matters here
+    with contextlib.redirect_stdout(io.StringIO()):
+        return sync_indexes(db, **kwargs)
+
+def check(failures, ok, message):
+    print(f"{'✅' if ok else '❌'} {message}")
+    if not ok:
+        failures.append(message)
+
+def check_specs(failures):
+    declared = get_collection_indexes()
+    problems = []
+    for collection_name, specs in declared.items():
+        names = set()
+        for spec in specs:
+            keys = spec.get('keys')
+            if not keys or any(len(key) != 2 or key[1] not in DIRECTIONS for key in keys):
+                problems.append(f'{collection_name}: bad keys {keys}')
+                continue
+            unknown = set(spec) - KNOWN_OPTIONS
+            if unknown:
+                problems.append(f'{collection_name}.{index_name(keys)}: unknown options {sorted(unknown)}')
+            name = spec.get('name') or index_name(keys)
+            if name in names:
+                problems.append(f'{collection_name}.{name}: declared twice')
+            names.add(name)
+    for problem in problems:
+        print(f"   {problem}")
+    check(failures, not problems, f'{sum(len(specs) for specs in declared.values())} index specs are well formed')
+    return declared
+
+def check_sync(failures, declared):
+    total = sum(len(specs) for specs in declared.values())
+
+    db = fresh_db()
+    report = quiet_sync(db, dry_run=True)
+    created = sum(len(db[name].index_information()) for name in db.list_collection_names())
+    check(failures, len(report['created']) == total and created == 0,
+          f'dry run reports {len(report["created"])}/{total} indexes and creates none')
+
+    report = quiet_sync(db)
+    check(failures, len(report['created']) == total and not report['failed'],
+          f'first sync creates {len(report["created"])}/{total} indexes, {len(report["failed"])} failed')
+    report = quiet_sync(db)
+    changed = report['created'] + report['rebuilt'] + report['stale'] + report['failed']
+    check(failures, not changed, f'second sync changes nothing ({len(changed)} changes)')
+
+    db.products.create_index([('legacy_field', 1)])
+    report = quiet_sync(db)
+    check(failures, report['stale'] == ['products.legacy_field_1'] and 'legacy_field_1' in db.products.index_information(),
+          'an undeclared index is reported as stale and kept')
+    report = quiet_sync(db, drop_stale=True, dry_run=True)
+    check(failures, not report['dropped'] and 'legacy_field_1' in db.products.index_information(),
+          'drop_stale with dry_run keeps the stale index')
+    report = quiet_sync(db, drop_stale=True)
+    check(failures, report['dropped'] == ['products.legacy_field_1'] and
+          'legacy_field_1' not in db.products.index_information(), 'drop_stale drops it')
+
+    # The declared SKU index is unique; a plain one with the same name must be rebuilt
+    sku_spec = next(spec for spec in declared['products'] if spec.get('unique'))
+    sku_name = sku_spec.get('name') or index_name(sku_spec['keys'])
+    db = fresh_db()
+    db.products.create_index(sku_spec['keys'], name=sku_name)
+    report = quiet_sync(db)
+    check(failures, f'products.{sku_name}' in report['rebuilt'] and
+          db.products.index_information()[sku_name].get('unique'), f'a changed products.{sku_name} is rebuilt as unique')
+
+def check_rebuild(failures):
+    db = fresh_db()
+    collection = db.products
+    collection.insert_many([{'sku': 'A'}, {'sku': 'A'}, {'sku': 'B'}])
+    collection.create_index([('sku', 1)], name='sku_1')
+    try:
+        rebuild_index(collection, 'sku_1', {'keys': [('sku', 1)], 'unique': True},
+                      collection.index_information()['sku_1'])
+        refused = False
+    except RuntimeError:
+        refused = True
+    live = collection.index_information().get('sku_1')
+    check(failures, refused and live is not None and not live.get('unique'),
+          'a unique rebuild over duplicate data is refused and keeps the old index')
+
+    collection.create_index([('name', 1)], name='name_1', sparse=True)
+    original_create = collection.create_index
+    attempts = []
+
+    def failing_create(keys, **kwargs):
+        attempts.append(kwargs)
+        if len(attempts) == 1:
+            raise RuntimeError('simulated build failure')
+        return original_create(keys, **kwargs)
+
+    collection.create_index = failing_create
+    try:
+        rebuild_index(collection, 'name_1', {'keys': [('name', 1)]}, collection.index_information()['name_1'])
+        raised = False
+    except RuntimeError:
+        raised = True
+    finally:
+        del collection.create_index
+    live = collection.index_information().get('name_1')
+    check(failures, raised and live is not None and live.get('sparse'),
+          'a rebuild that fails to build restores the previous definition')
+
+def main():
+    failures = []
+    declared = check_specs(failures)
+    check_sync(failures, declared)
+    check_rebuild(failures)
+    if failures:
+        print(f"\n❌ {len(failures)} index checks failed")
+        sys.exit(1)
+    print("\n✅ Index specs and sync_indexes behave as expected")
+
+if __name__ == '__main__':
+    main()
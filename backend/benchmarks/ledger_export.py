@@ -0,0 +1,70 @@
+"""
+Ledger export size and load time: JSON vs Parquet vs Arrow IPC
+
+Seeds the ledger (one movement per product), then fetches it through
+/api/operations/movements (JSON, one page of every row) and the columnar
+export endpoints, reporting body size, response time and time to load the
+body into rows/columns on the client.
+
+    python -m benchmarks.ledger_export --movements 100000
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['FLASK_ENV'] = 'production'
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from benchmarks.backend import start_backend, seed, use_backend
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--movements', type=int, default=100000)
+    args = parser.parse_args()
+
+    backend = start_backend(prefer_mongod=True)
+    try:
+        from app import create_app
+        app = create_app({'DATA_BACKEND': 'mongo', 'MONGO_DB_NAME': 'stockmaster_bench'})
+        db = use_backend(backend.client)
+        seed(db, args.movements)
+        client = app.test_client()
+
+        formats = {
+            'json': (f'/api/operations/movements?limit={args.movements}',
+                     lambda body: len(json.loads(body)['movements'])),
+            'parquet': ('/api/operations/movements/export.parquet',
+                        lambda body: pq.read_table(io.BytesIO(body)).num_rows),
+            'arrow': ('/api/operations/movements/export.arrow',
+                      lambda body: pa.ipc.open_stream(body).read_all().num_rows)
+        }
+
+        print(f"{args.movements:,} movements on {backend.name}")
+        print(f"{'format':<10}{'bytes':>14}{'smaller':>10}{'response ms':>14}{'load ms':>10}")
+        json_size = None
+        for name, (path, load) in formats.items():
+            started = time.perf_counter()
+            body = client.get(path).data
+            response_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            rows = load(body)
+            load_ms = (time.perf_counter() - started) * 1000
+
+            if rows != args.movements:
+                print(f"❌ {name} returned {rows} rows")
+                sys.exit(1)
+            json_size = json_size or len(body)
+            print(f"{name:<10}{len(body):>14,}{json_size / len(body):>9.1f}x{response_ms:>14.1f}{load_ms:>10.1f}")
+    finally:
+        backend.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+stock_movements as a time-series collection vs the old plain collection
+
+Loads the same --rows synthetic movements (spread over --days days, in time
+order) into a plain collection with the old single-field indexes and into a
+time-series collection with the indexes from get_collection_indexes(), then
+compares insert time, storage and index size, and the latency of the ledger's
+range queries (one product over 30 days, one type over a day, everything in
+an hour). Both collections must return the same rows for every query.
+
+Needs a local mongod 5.0+ (mongomock has no time-series collections).
+
+    python -m benchmarks.movements_timeseries --rows 10000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from benchmarks.backend import LOCATIONS, start_backend
+from models.schemas import get_collection_indexes
+from utils.movements import META_FIELD, TIME_SERIES_OPTIONS, to_document
+
+TYPES = ['receipt', 'delivery', 'transfer', 'adjustment']
+PLAIN_INDEXES = [
+    [('product_id', 1), ('timestamp', -1)],
+    [('type', 1), ('timestamp', -1)],
+    [('timestamp', -1)],
+    [('reference_id', 1)]
+]
+
+def movements(rows, product_ids, start, days, seed_value=42):
+    """Flat movements in time order; a few popular products get most of them"""
+    rng = random.Random(seed_value)
+    step = days * 86400 / rows
+    for i in range(rows):
+        index = min(int(rng.paretovariate(1.2)) - 1, len(product_ids) - 1)
+        movement_type = rng.choice(TYPES)
+        from_location, to_location = rng.sample(LOCATIONS, 2)
+        yield {
+            'movement_id': f'MOV-{i:09d}',
+            'type': movement_type,
+            'product_id': product_ids[index],
+            'product_name': f'Product {index}',
+            'sku': f'BEN-{index:07d}',
+            'quantity': rng.randint(1, 50),
+            'from_location': from_location,
+            'to_location': to_location,
+            'reference_id': f'RCP-{i // 3:09d}',
+            'created_by': 'bench',
+            'timestamp': start + timedelta(seconds=i * step)
+        }
+
+def load(collection, docs, batch_size):
+    started = time.perf_counter()
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+    return time.perf_counter() - started
+
+def storage(db, name):
+    stats = db.command('collStats', name)
+    return stats['storageSize'], stats['totalIndexSize']
+
+def query_cases(rng, product_ids, start, days, samples):
+    """(label, flat filter) pairs; time-series filters put product_id and type under meta"""
+    cases = []
+    for _ in range(samples):
+        since = start + timedelta(days=rng.uniform(0, max(days - 30, 0)))
+        # Products are picked with the same skew as their movements
+        product_id = product_ids[min(int(rng.paretovariate(1.2)) - 1, len(product_ids) - 1)]
+        cases.append(('product, 30 days', {'product_id': product_id,
+                                           'timestamp': {'$gte': since, '$lt': since + timedelta(days=30)}}))
+        since = start + timedelta(days=rng.uniform(0, days - 1))
+        cases.append(('type, 1 day', {'type': rng.choice(TYPES),
+                                      'timestamp': {'$gte': since, '$lt': since + timedelta(days=1)}}))
+        since = start + timedelta(hours=rng.uniform(0, days * 24 - 1))
+        cases.append(('all, 1 hour', {'timestamp': {'$gte': since, '$lt': since + timedelta(hours=1)}}))
+    return cases
+
+def meta_filter(query):
+    return {f'{META_FIELD}.{key}' if key in ('product_id', 'type') else key: value for key, value in query.items()}
+
+def timed(collection, query):
+    started = time.perf_counter()
+    rows = len(list(collection.find(query, {'quantity': 1, 'timestamp': 1}).sort('timestamp', -1)))
+    return (time.perf_counter() - started) * 1000, rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000000)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--batch-size', type=int, default=50000)
+    parser.add_argument('--samples', type=int, default=100, help='queries of each kind')
+    args = parser.parse_args()
+
+    backend = start_backend(prefer_mongod=True)
+    if not backend.uri:
+        backend.stop()
+        print("❌ movements_timeseries needs a local mongod 5.0+ on PATH (mongomock has no time-series collections)")
+        sys.exit(2)
+
+    try:
+        db = backend.client['stockmaster_bench']
+        plain = db.movements_plain
+        series_name = 'stock_movements'
+        db.create_collection(series_name, timeseries=TIME_SERIES_OPTIONS)
+        series = db[series_name]
+        for keys in PLAIN_INDEXES:
+            plain.create_index(keys)
+        for spec in get_collection_indexes()[series_name]:
+            series.create_index(spec['keys'])
+
+        print(f"Loading {args.rows:,} movements over {args.days} days for {args.products:,} products on {backend.name}")
+        product_ids = [ObjectId() for _ in range(args.products)]
+        start = datetime.utcnow().replace(microsecond=0) - timedelta(days=args.days)
+        plain_seconds = load(plain, movements(args.rows, product_ids, start, args.days), args.batch_size)
+        series_seconds = load(series, (to_document(m) for m in movements(args.rows, product_ids, start, args.days)),
+                              args.batch_size)
+        # Let both collections reach disk before measuring them
+        db.command('fsync')
+
+        print(f"\n{'collection':<14}{'insert s':>10}{'rows/s':>12}{'storage MiB':>14}{'index MiB':>12}")
+        for label, name, seconds in (('plain', plain.name, plain_seconds), ('time-series', series_name, series_seconds)):
+            storage_size, index_size = storage(db, name)
+            print(f"{label:<14}{seconds:>10.1f}{args.rows / seconds:>12,.0f}"
+                  f"{storage_size / 2 ** 20:>14,.1f}{index_size / 2 ** 20:>12,.1f}")
+
+        rng = random.Random(7)
+        latencies = {}
+        mismatches = 0
+        for label, query in query_cases(rng, product_ids, start, args.days, args.samples):
+            plain_ms, plain_rows = timed(plain, query)
+            series_ms, series_rows = timed(series, meta_filter(query))
+            mismatches += plain_rows != series_rows
+            entry = latencies.setdefault(label, {'plain': [], 'time-series': [], 'rows': []})
+            entry['plain'].append(plain_ms)
+            entry['time-series'].append(series_ms)
+            entry['rows'].append(plain_rows)
+
+        print(f"\n{'query':<18}{'rows':>8}{'plain p50':>11}{'p95':>9}{'ts p50':>9}{'p95':>9}{'speedup':>9}")
+        for label, entry in latencies.items():
+            plain_p = statistics.quantiles(entry['plain'], n=20)
+            series_p = statistics.quantiles(entry['time-series'], n=20)
+            print(f"{label:<18}{statistics.median(entry['rows']):>8,.0f}"
+                  f"{statistics.median(entry['plain']):>11.1f}{plain_p[18]:>9.1f}"
+                  f"{statistics.median(entry['time-series']):>9.1f}{series_p[18]:>9.1f}"
+                  f"{statistics.median(entry['plain']) / statistics.median(entry['time-series']):>8.1f}x")
+
+        if mismatches:
+            print(f"❌ {mismatches} queries returned different rows from the two collections")
+            sys.exit(1)
+        print("✅ Both collections returned the same rows for every query")
+    finally:
+        backend.stop()
+
+if __name__ == '__main__':
+    main()
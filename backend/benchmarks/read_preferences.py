@@ -0,0 +1,196 @@
+"""
+Check read preference routing against a local three-member replica set
+
+Starts a replica set with start_replica_set(), seeds it and drives the API,
+recording which member served each database command:
+- GETs of the analytics routes (utils.db.SECONDARY_READ_PREFIXES) must read
+  from a secondary
+- writes and read-your-writes GETs must only touch the primary
+- with replication paused, a read-only job queued right after a write must
+  still see that write: its secondary reads wait for the job's claim in a
+  causally consistent session until replication resumes
+
+Exits non-zero on any violation. Needs a mongod binary on PATH.
+
+    python -m benchmarks.read_preferences
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['FLASK_ENV'] = 'production'
+# Inline reports and jobs run in this process where the commands can be seen
+os.environ['REPORT_INLINE_MAX_ROWS'] = str(10 ** 9)
+os.environ['JOB_RUNNER'] = 'off'
+
+from pymongo import MongoClient, WriteConcern, monitoring
+from benchmarks.backend import seed, start_replica_set
+
+SECONDARY_CASES = [
+    '/api/dashboard/stats',
+    '/api/dashboard/chart-data',
+    '/api/dashboard/low-stock',
+    '/api/dashboard/performance',
+    '/api/reports/stock.csv',
+    '/api/reports/ledger.pdf',
+    '/api/operations/movements/export.parquet'
+]
+
+PRIMARY_CASES = [
+    ('GET', '/api/products/'),
+    ('GET', '/api/products/{product_id}'),
+    ('GET', '/api/operations/receipts'),
+    ('GET', '/api/operations/movements'),
+    ('GET', '/api/dashboard/recent-operations'),
+    ('POST', '/api/operations/receipts'),
+    ('PUT', '/api/operations/receipts/{operation_id}/status')
+]
+
+DATA_COMMANDS = {'find', 'getMore', 'aggregate', 'count', 'distinct', 'insert', 'update', 'delete', 'findAndModify'}
+
+class ServerCapture(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name in DATA_COMMANDS:
+            self.commands.append((event.command_name, event.command.get(event.command_name), event.connection_id))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def set_replication(secondaries, paused):
+    """Pause or resume applying the oplog on the given secondaries"""
+    for host, port in secondaries:
+        client = MongoClient(host, port, directConnection=True)
+        try:
+            client.admin.command('configureFailPoint', 'rsSyncApplyStop', mode='alwaysOn' if paused else 'off')
+        finally:
+            client.close()
+
+def check_routes(test_client, capture, primary, params):
+    failures = 0
+    headers = {'Authorization': 'Bearer bench'}
+    receipt = {'supplier': 'Replica Check', 'items': [{'product_id': params['product_id'], 'product_name': 'Product 0',
+                                                       'sku': 'BEN-0000000', 'quantity': 1, 'unit_price': 1.0}]}
+
+    for path in SECONDARY_CASES:
+        capture.commands = []
+        response = test_client.get(path, headers=headers)
+        servers = {address for _, _, address in capture.commands}
+        if response.status_code != 200 or not servers or primary in servers:
+            failures += 1
+            print(f"❌ GET {path}: {response.status_code}, served by {sorted(servers)} (primary {primary})")
+        else:
+            print(f"✅ GET {path}: {len(capture.commands)} commands on secondaries {sorted(servers)}")
+
+    for method, path in PRIMARY_CASES:
+        path = path.format(**params)
+        capture.commands = []
+        body = {'status': 'done'} if method == 'PUT' else receipt if method == 'POST' else None
+        response = test_client.open(path, method=method, headers=headers, json=body)
+        servers = {address for _, _, address in capture.commands}
+        if response.status_code >= 400 or servers - {primary}:
+            failures += 1
+            print(f"❌ {method} {path}: {response.status_code}, served by {sorted(servers)} (primary {primary})")
+        else:
+            print(f"✅ {method} {path}: {len(capture.commands)} commands on the primary")
+    return failures
+
+def check_causal_job(capture, primary, secondaries):
+    """A read-only job sees a write made just before it was queued, even while secondaries lag"""
+    from utils import db as mongo
+    from utils.jobs import claim_next, run_job, submit_job
+
+    db = mongo.get_db()
+    category = f'Replica check {uuid.uuid4().hex[:8]}'
+    resume_after = 2.0
+    set_replication(secondaries, paused=True)
+    try:
+        db.products.insert_one({'sku': f'RS-{uuid.uuid4().hex[:8]}', 'name': 'Replica check', 'category': category,
+                                'stock': 3, 'cost_price': 2.0, 'location': 'Warehouse A'})
+        stale = mongo.get_db(mongo.analytics_read_preference()).products.count_documents({'category': category})
+
+        job = submit_job(db, 'stock_valuation', {'category': category}, 'bench')
+        owner = 'read-preference-check'
+        with mongo.causal_session(db.client) as session:
+            claimed = claim_next(db, owner, session)
+            read_after = session.operation_time
+        if claimed is None or claimed['_id'] != job['_id']:
+            print("❌ Could not claim the check's job")
+            return 1
+
+        threading.Timer(resume_after, set_replication, (secondaries, False)).start()
+        capture.commands = []
+        started = time.perf_counter()
+        status = run_job(job['_id'], owner, read_after)
+        elapsed = time.perf_counter() - started
+    finally:
+        set_replication(secondaries, paused=False)
+
+    job = db.jobs.find_one({'_id': job['_id']})
+    reads = {address for name, collection, address in capture.commands if collection == 'products'}
+    print(f"   secondary read without a session while paused: {stale} rows (expected 0)")
+    print(f"   job {status} in {elapsed:.1f}s, products read on {sorted(reads)}, result {job.get('result')}")
+    if status != 'done' or (job.get('result') or {}).get('products') != 1:
+        print("❌ The job did not see the product written before it was queued")
+        return 1
+    if not reads or primary in reads:
+        print(f"❌ The job's reads were not served by a secondary (primary {primary})")
+        return 1
+    if elapsed < resume_after * 0.9:
+        print("❌ The job did not wait for its secondary to catch up")
+        return 1
+    print("✅ The read-only job read from a secondary and saw the write made before it was queued")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=2000)
+    args = parser.parse_args()
+
+    backend = start_replica_set(members=3)
+    if backend is None:
+        print("❌ read_preferences needs a mongod binary on PATH to start a replica set")
+        sys.exit(2)
+
+    try:
+        from app import create_app
+        from utils import auth
+        from utils import db as mongo
+        app = create_app({'DATA_BACKEND': 'mongo', 'MONGO_URI': backend.uri, 'MONGO_DB_NAME': 'stockmaster_bench'})
+        capture = ServerCapture()
+        mongo.add_event_listener(capture)
+        auth.token_verifier.verify = lambda token: {'uid': 'bench', 'exp': time.time() + 3600}
+
+        db = mongo.get_db()
+        params = seed(db, args.products)
+        # Wait until every member has the seed data
+        db.get_collection('replica_check', write_concern=WriteConcern(w=3)).insert_one({})
+
+        client = mongo.get_client()
+        primary = client.primary
+        secondaries = sorted(client.secondaries)
+        print(f"{backend.name}: primary {primary}, secondaries {secondaries}\n")
+
+        failures = check_routes(app.test_client(), capture, primary, params)
+        print()
+        failures += check_causal_job(capture, primary, secondaries)
+        if failures:
+            print(f"\n❌ {failures} read preference checks failed")
+            sys.exit(1)
+        print("\n✅ Analytics reads go to secondaries, writes and read-your-writes reads to the primary")
+    finally:
+        backend.stop()
+
+if __name__ == '__main__':
+    main()
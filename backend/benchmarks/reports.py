@@ -0,0 +1,122 @@
+"""
+Streamed report generation: time, size and memory for large CSV/PDF reports
+
+First feeds --rows synthetic rows straight into the CSV and PDF writers and
+measures peak Python memory at a tenth of the rows and at all of them, which
+should be about the same. Then seeds --rows products and ledger rows and
+downloads the stock list and ledger reports through /api/reports, checking
+the row count of each CSV and the page tree and cross-reference table of each
+PDF.
+
+    python -m benchmarks.reports --rows 100000
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['FLASK_ENV'] = 'production'
+# Generate inline even for large reports instead of queueing a job
+os.environ['REPORT_INLINE_MAX_ROWS'] = str(10 ** 9)
+
+from benchmarks.backend import start_backend, seed, use_backend
+from utils.reports import stream_report
+
+def synthetic_rows(count):
+    for i in range(count):
+        yield [f'BEN-{i:07d}', f'Product {i} with a fairly long descriptive name', 'Electronics',
+               'Warehouse A', str(i % 500), 'units', '25', 'In Stock', '12.50']
+
+def writer_run(format, rows):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = sum(len(chunk) for chunk in stream_report('stock', format, synthetic_rows(rows), {}))
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+def check_pdf(path, rows_per_page, rows):
+    """Page count and every cross-reference offset of a PDF written by utils/pdf_stream.py"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    pages = int(re.search(rb'/Type /Pages /Kids \[[^\]]*\] /Count (\d+)', data).group(1))
+    expected_pages = max(-(-rows // rows_per_page), 1)
+    if pages != expected_pages:
+        return f'{pages} pages, expected {expected_pages}'
+    xref = int(data[data.rindex(b'startxref') + 10:].split()[0])
+    entries = data[xref:].split(b'\n')[3:]
+    for number, entry in enumerate(entries, start=1):
+        if not entry.endswith(b' n '):
+            break
+        offset = int(entry.split()[0])
+        if not data.startswith(f'{number} 0 obj'.encode(), offset):
+            return f'object {number} is not at offset {offset}'
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    print("Writers only, synthetic rows")
+    print(f"{'format':<8}{'rows':>10}{'bytes':>14}{'seconds':>10}{'rows/s':>10}{'peak KiB':>10}")
+    for format in ('csv', 'pdf'):
+        for rows in (args.rows // 10, args.rows):
+            size, elapsed, peak = writer_run(format, rows)
+            print(f"{format:<8}{rows:>10,}{size:>14,}{elapsed:>10.2f}{rows / elapsed:>10,.0f}{peak / 1024:>10,.0f}")
+
+    backend = start_backend(prefer_mongod=True)
+    try:
+        from app import create_app
+        from utils import auth
+        from utils.pdf_stream import PDFTableWriter
+        app = create_app({'DATA_BACKEND': 'mongo', 'MONGO_DB_NAME': 'stockmaster_bench'})
+        db = use_backend(backend.client)
+        auth.token_verifier.verify = lambda token: {'uid': 'bench', 'exp': time.time() + 3600}
+        seed(db, args.rows)
+        client = app.test_client()
+        rows_per_page = PDFTableWriter('', []).rows_per_page
+
+        print(f"\n/api/reports with {args.rows:,} products and movements on {backend.name}")
+        print(f"{'report':<16}{'bytes':>14}{'seconds':>10}{'first byte ms':>15}  check")
+        failed = False
+        for name in ('stock', 'ledger'):
+            for format in ('csv', 'pdf'):
+                with tempfile.NamedTemporaryFile(suffix=f'.{format}', delete=False) as out:
+                    started = time.perf_counter()
+                    response = client.get(f'/api/reports/{name}.{format}',
+                                          headers={'Authorization': 'Bearer bench'}, buffered=False)
+                    first_byte = None
+                    size = 0
+                    for chunk in response.response:
+                        if first_byte is None:
+                            first_byte = (time.perf_counter() - started) * 1000
+                        out.write(chunk)
+                        size += len(chunk)
+                    response.close()
+                    elapsed = time.perf_counter() - started
+
+                if format == 'csv':
+                    with open(out.name, newline='') as f:
+                        lines = sum(1 for _ in f) - 1
+                    problem = None if lines == args.rows else f'{lines} rows, expected {args.rows}'
+                else:
+                    problem = check_pdf(out.name, rows_per_page, args.rows)
+                os.unlink(out.name)
+                failed = failed or problem is not None
+                label = f'{name}.{format}'
+                print(f"{label:<16}{size:>14,}{elapsed:>10.2f}{first_byte:>15.1f}  {'❌ ' + problem if problem else '✅'}")
+        if failed:
+            sys.exit(1)
+    finally:
+        backend.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Uniqueness and throughput check for the document number allocator
+
+With --uri, runs several worker processes against the `counters` collection
+of the stockmaster_bench database on that server (dropped before and after),
+each allocating document numbers as fast as it can, then verifies that no
+number was handed out twice. Without --uri it uses threads sharing one
+mongomock collection. MONGO_URI and .env are deliberately ignored so the check
+never touches a real deployment by accident.
+
+    python -m benchmarks.sequence_uniqueness --workers 8 --count 5000
+    python -m benchmarks.sequence_uniqueness --uri mongodb://localhost:27017
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.sequences import SequenceAllocator, DOCUMENT_PREFIXES
+
+def allocate(args):
+    """Allocate `count` numbers spread over every prefix in a fresh process"""
+    uri, database, count, block_size = args
+    from pymongo import MongoClient
+    client = MongoClient(uri)
+    allocator = SequenceAllocator(lambda: client[database].counters, block_size=block_size)
+    try:
+        return [allocator.next_id(DOCUMENT_PREFIXES[i % len(DOCUMENT_PREFIXES)]) for i in range(count)]
+    finally:
+        client.close()
+
+def run_processes(uri, workers, count, block_size):
+    database = 'stockmaster_bench'
+    from pymongo import MongoClient
+    MongoClient(uri)[database].counters.drop()
+
+    with Pool(workers) as pool:
+        started = time.perf_counter()
+        results = pool.map(allocate, [(uri, database, count, block_size)] * workers)
+        elapsed = time.perf_counter() - started
+
+    MongoClient(uri)[database].counters.drop()
+    return [doc_id for ids in results for doc_id in ids], elapsed
+
+def run_threads(workers, count, block_size):
+    import mongomock
+    collection = mongomock.MongoClient()['stockmaster_bench'].counters
+    server_lock = threading.Lock()
+    results = []
+
+    class AtomicCounters:
+        # mongomock updates are not atomic across threads the way mongod's are
+        def find_one_and_update(self, *args, **kwargs):
+            with server_lock:
+                return collection.find_one_and_update(*args, **kwargs)
+
+    def worker():
+        allocator = SequenceAllocator(AtomicCounters, block_size=block_size)
+        ids = [allocator.next_id(DOCUMENT_PREFIXES[i % len(DOCUMENT_PREFIXES)]) for i in range(count)]
+        results.append(ids)
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [doc_id for ids in results for doc_id in ids], time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--count', type=int, default=5000, help='allocations per worker')
+    parser.add_argument('--block-size', type=int, default=50)
+    parser.add_argument('--uri', help='MongoDB server to test against (default: mongomock)')
+    args = parser.parse_args()
+
+    uri = args.uri
+    if uri:
+        ids, elapsed = run_processes(uri, args.workers, args.count, args.block_size)
+        mode = f'{args.workers} processes against {uri.split("@")[-1]}'
+    else:
+        ids, elapsed = run_threads(args.workers, args.count, args.block_size)
+        mode = f'{args.workers} threads against mongomock'
+
+    duplicates = len(ids) - len(set(ids))
+    print(f"📊 {len(ids)} allocations by {mode} in {elapsed:.2f}s "
+          f"({len(ids) / elapsed:,.0f}/s), {duplicates} duplicates")
+
+    if duplicates:
+        print("❌ Duplicate document numbers were allocated")
+        sys.exit(1)
+    print("✅ All document numbers are unique")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Cold-start benchmark: import + create_app() + first request
+
+Each run starts a fresh interpreter so module import costs are included.
+Use --max-ms to fail when the median cold start regresses past a budget.
+
+    python -m benchmarks.startup_time --runs 10 --max-ms 1500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the fresh interpreter and prints its timings as JSON
+PROBE = '''
+import json, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app({'DATA_BACKEND': %(backend)r})
+created = time.perf_counter()
+response = app.test_client().get(%(path)r)
+first_request = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (first_request - created) * 1000,
+    'total_ms': (first_request - started) * 1000,
+    'status': response.status_code
+}))
+'''
+
+def run_once(backend, path):
+    env = dict(os.environ, FLASK_ENV='development')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE % {'backend': backend, 'path': path}],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--backend', default='mongo', choices=['mongo', 'firebase'])
+    parser.add_argument('--path', default='/api/products/', help='path of the first request')
+    parser.add_argument('--max-ms', type=float, help='fail if the median total exceeds this budget')
+    args = parser.parse_args()
+
+    runs = [run_once(args.backend, args.path) for _ in range(args.runs)]
+
+    print(f"📊 Cold start ({args.backend} backend, first request GET {args.path}, {args.runs} runs)")
+    for key in ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms'):
+        values = [run[key] for run in runs]
+        print(f"   {key:18s} median {statistics.median(values):8.1f}ms  max {max(values):8.1f}ms")
+
+    median_total = statistics.median(run['total_ms'] for run in runs)
+    if args.max_ms and median_total > args.max_ms:
+        print(f"❌ Cold start {median_total:.1f}ms exceeds the {args.max_ms:.0f}ms budget")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Gunicorn configuration
+
+    gunicorn -c gunicorn.conf.py app:app
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 4))
+# Threaded workers: each open /api/stream connection holds one thread, not a whole worker
+threads = int(os.getenv('GUNICORN_THREADS', 32))
+
+# Workers write Prometheus samples here so /metrics can aggregate all of them.
+# It has to be set before the app (and prometheus_client) is imported.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'stockmaster-metrics'))
+
+# Background jobs run in one separate runner process (run_jobs.py) with its own
+# JOB_WORKERS pool, rather than in every web worker
+os.environ.setdefault('JOB_RUNNER', 'external')
+job_runner_process = None
+
+def on_starting(server):
+    # Samples from a previous run would otherwise be aggregated too
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+def when_ready(server):
+    global job_runner_process
+    if os.environ['JOB_RUNNER'] == 'external' and os.getenv('DATA_BACKEND', 'mongo') == 'mongo':
+        job_runner_process = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(__file__), 'run_jobs.py')])
+
+def on_exit(server):
+    if job_runner_process is not None:
+        job_runner_process.terminate()
+        job_runner_process.wait(timeout=30)
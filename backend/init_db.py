@@ -7,42 +7,139 @@ import os
 import sys
 from pymongo import MongoClient
 from dotenv import load_dotenv
-from models.schemas import SAMPLE_USERS, SAMPLE_PRODUCTS, get_collection_indexes
+from utils.db import get_db_name
+from models.schemas import SAMPLE_USERS, SAMPLE_PRODUCTS, get_collection_indexes, get_firestore_indexes
+from utils.movements import AUTOMATIC_INDEX, MOVEMENTS_COLLECTION, create_movements_collection, is_time_series
 
 # Load environment variables
 load_dotenv()
 
+def index_name(keys):
+    """Default MongoDB index name for a key list, e.g. status_1_created_at_-1"""
+    return '_'.join(f"{field}_{direction}" for field, direction in keys)
+
+def index_options(spec):
+    return {k: v for k, v in spec.items() if k not in ('keys', 'name')}
+
+def live_index_matches(live, spec):
+    """Check whether an existing index has the declared keys and options"""
+    if any(direction == 'text' for _, direction in spec['keys']):
+        # Text indexes are stored as _fts/_ftsx with the fields in weights
+        declared_fields = {field for field, _ in spec['keys']}
+        live_fields = set(live.get('weights') or {field for field, _ in live['key']})
+        return live_fields == declared_fields
+    if [(field, direction) for field, direction in live['key']] != list(spec['keys']):
+        return False
+    for option in ('unique', 'partialFilterExpression', 'sparse', 'expireAfterSeconds'):
+        if live.get(option) != spec.get(option):
+            return False
+    return True
+
+def duplicate_keys(collection, spec):
+    """One key value held by several documents, which would break a unique index, or None"""
+    fields = [field for field, _ in spec['keys']]
+    match = dict(spec.get('partialFilterExpression') or {})
+    if spec.get('sparse'):
+        match['$or'] = [{field: {'$exists': True}} for field in fields]
+    pipeline = [
+        {'$match': match},
+        {'$group': {'_id': {field.replace('.', '_'): f'${field}' for field in fields}, 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}},
+        {'$limit': 1}
+    ]
+    for group in collection.aggregate(pipeline, allowDiskUse=True):
+        return group['_id']
+    return None
+
+def rebuild_index(collection, name, spec, live):
+    """Replace an index whose definition changed, keeping the old one if the new one cannot be built"""
+    if spec.get('unique'):
+        duplicate = duplicate_keys(collection, spec)
+        if duplicate is not None:
+            raise RuntimeError(f'duplicate values {duplicate} would violate the unique index; kept the existing index')
+    
+    collection.drop_index(name)
+    try:
+        collection.create_index(spec['keys'], name=name, **index_options(spec))
+    except Exception:
+        # Put the previous definition back so the collection is never left unindexed
+        options = {k: v for k, v in live.items() if k not in ('key', 'v', 'ns')}
+        collection.create_index(list(live['key']), name=name, **options)
+        raise
+
+def sync_indexes(db, drop_stale=False, dry_run=False):
+    """Create missing indexes, rebuild changed ones and report stale or unused ones"""
+    declared = get_collection_indexes()
+    report = {'created': [], 'rebuilt': [], 'stale': [], 'dropped': [], 'unused': [], 'failed': []}
+    
+    for collection_name, specs in declared.items():
+        collection = db[collection_name]
+        live = collection.index_information() if collection_name in db.list_collection_names() else {}
+        declared_names = set()
+        
+        for spec in specs:
+            name = spec.get('name') or index_name(spec['keys'])
+            declared_names.add(name)
+            label = f"{collection_name}.{name}"
+            
+            if name in live and live_index_matches(live[name], spec):
+                continue
+            
+            try:
+                if name in live:
+                    if not dry_run:
+                        rebuild_index(collection, name, spec, live[name])
+                    report['rebuilt'].append(label)
+                else:
+                    if not dry_run:
+                        collection.create_index(spec['keys'], name=name, **index_options(spec))
+                    report['created'].append(label)
+                print(f"✅ {'Would create' if dry_run else 'Created'} index {label}")
+            except Exception as e:
+                report['failed'].append(label)
+                print(f"❌ Could not build index {label}: {e}")
+        
+        for name in live:
+            if name == '_id_' or name in declared_names:
+                continue
+            if collection_name == MOVEMENTS_COLLECTION and name == AUTOMATIC_INDEX:
+                continue
+            label = f"{collection_name}.{name}"
+            report['stale'].append(label)
+            if drop_stale and not dry_run:
+                collection.drop_index(name)
+                report['dropped'].append(label)
+                print(f"🗑️  Dropped stale index {label}")
+            else:
+                print(f"⚠️  Stale index {label} is not declared in get_collection_indexes")
+        
+        # Indexes that have not served a single operation since the server started
+        try:
+            for stats in collection.aggregate([{'$indexStats': {}}]):
+                if stats['name'] != '_id_' and stats['accesses']['ops'] == 0:
+                    label = f"{collection_name}.{stats['name']}"
+                    report['unused'].append(label)
+                    print(f"ℹ️  Unused index {label} (no accesses since {stats['accesses']['since']})")
+        except Exception:
+            # $indexStats is not available on every deployment (or in mongomock)
+            pass
+    
+    return report
+
 def init_database():
     """Initialize the MongoDB database with collections and sample data"""
     try:
         # Connect to MongoDB
         client = MongoClient(os.getenv('MONGO_URI'))
-        db = client['stockmaster']
+        db = client[get_db_name()]
         
         print("🔧 Initializing StockMaster Database...")
         
         # Create collections and indexes
-        collections_to_create = [
-            'users', 'products', 'receipts', 'deliveries', 
-            'transfers', 'adjustments', 'stock_movements'
-        ]
-        
-        indexes = get_collection_indexes()
-        
-        for collection_name in collections_to_create:
-            collection = db[collection_name]
-            
-            # Create indexes if they don't exist
-            if collection_name in indexes:
-                for index in indexes[collection_name]:
-                    try:
-                        if isinstance(index, dict):
-                            collection.create_index(list(index.items()))
-                        else:
-                            collection.create_index(index)
-                        print(f"✅ Created index for {collection_name}: {index}")
-                    except Exception as e:
-                        print(f"⚠️  Index might already exist for {collection_name}: {e}")
+        if MOVEMENTS_COLLECTION in db.list_collection_names() and not is_time_series(db):
+            print("⚠️  stock_movements is a plain collection; run: python init_db.py migrate-movements")
+        create_movements_collection(db)
+        sync_indexes(db)
         
         # Insert sample data if collections are empty
         if db.users.count_documents({}) == 0:
@@ -105,7 +202,7 @@ def reset_database():
     """Reset the database by dropping all collections"""
     try:
         client = MongoClient(os.getenv('MONGO_URI'))
-        db = client['stockmaster']
+        db = client[get_db_name()]
         
         print("⚠️  RESETTING DATABASE - This will delete all data!")
         confirm = input("Are you sure? Type 'yes' to continue: ")
@@ -129,8 +226,187 @@ def reset_database():
         if 'client' in locals():
             client.close()
 
+def sync_indexes_command(args):
+    """Sync indexes against the live database"""
+    try:
+        client = MongoClient(os.getenv('MONGO_URI'))
+        db = client[get_db_name()]
+        
+        dry_run = '--dry-run' in args
+        print(f"🔧 Syncing indexes{' (dry run)' if dry_run else ''}...")
+        report = sync_indexes(db, drop_stale='--drop-stale' in args, dry_run=dry_run)
+        
+        print("\n📊 Index sync summary:")
+        for key, labels in report.items():
+            print(f"   {key.title()}: {len(labels)}")
+        return not report['failed']
+        
+    except Exception as e:
+        print(f"❌ Error syncing indexes: {e}")
+        return False
+    finally:
+        if 'client' in locals():
+            client.close()
+
+def generate_command(args):
+    """Generate a large synthetic dataset for load and capacity testing"""
+    import argparse
+    import time
+    from models.synthetic import generate_dataset
+    
+    parser = argparse.ArgumentParser(prog='init_db.py generate')
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--operations-per-day', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--db', default=get_db_name())
+    parser.add_argument('--drop', action='store_true', help='drop existing collections first')
+    options = parser.parse_args(args)
+    
+    try:
+        client = MongoClient(os.getenv('MONGO_URI'))
+        db = client[options.db]
+        
+        if options.drop:
+            for collection_name in get_collection_indexes():
+                db[collection_name].drop()
+            db.counters.drop()
+        elif db.products.estimated_document_count():
+            print(f"❌ {options.db}.products is not empty; use --drop to replace existing data")
+            return False
+        
+        create_movements_collection(db)
+        print(f"🏭 Generating {options.products:,} products over {options.days} days "
+              f"({options.operations_per_day} operations/day, {options.workers} workers, seed {options.seed})...")
+        started = time.perf_counter()
+        totals = generate_dataset(
+            os.getenv('MONGO_URI'), options.db, products=options.products, days=options.days,
+            operations_per_day=options.operations_per_day, workers=options.workers,
+            seed=options.seed, batch_size=options.batch_size
+        )
+        
+        # Building indexes once after the bulk load is cheaper than maintaining them during it
+        sync_indexes(db)
+        
+        print(f"\n📊 Generated in {time.perf_counter() - started:.1f}s:")
+        for collection_name, count in sorted(totals.items()):
+            print(f"   {collection_name}: {count:,}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error generating data: {e}")
+        return False
+    finally:
+        if 'client' in locals():
+            client.close()
+
+def archive_command(args):
+    """Move old done/canceled operations to their archive collections"""
+    import argparse
+    from utils.archive import ARCHIVE_BATCH_SIZE, ARCHIVE_RETENTION_DAYS, archive_operations, count_archivable
+    
+    parser = argparse.ArgumentParser(prog='init_db.py archive')
+    parser.add_argument('--retention-days', type=int, default=ARCHIVE_RETENTION_DAYS)
+    parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument('--db', default=get_db_name())
+    parser.add_argument('--dry-run', action='store_true', help='only count what would be moved')
+    options = parser.parse_args(args)
+    
+    try:
+        client = MongoClient(os.getenv('MONGO_URI'))
+        db = client[options.db]
+        
+        if options.dry_run:
+            print(f"🔍 Operations done/canceled more than {options.retention_days} days ago:")
+            counts = count_archivable(db, options.retention_days)
+        else:
+            print(f"🗄️  Archiving operations done/canceled more than {options.retention_days} days ago...")
+            counts = archive_operations(db, options.retention_days, options.batch_size)
+        for collection_name, count in counts.items():
+            print(f"   {collection_name}: {count:,}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error archiving operations: {e}")
+        return False
+    finally:
+        if 'client' in locals():
+            client.close()
+
+def migrate_movements_command(args):
+    """Convert a plain stock_movements collection into a time-series collection"""
+    import argparse
+    import time
+    from utils.movements import migrate_movements
+    
+    parser = argparse.ArgumentParser(prog='init_db.py migrate-movements')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--db', default=get_db_name())
+    parser.add_argument('--drop-legacy', action='store_true', help='drop the old collection after a verified copy instead of keeping it as stock_movements_migrated')
+    options = parser.parse_args(args)
+    
+    try:
+        client = MongoClient(os.getenv('MONGO_URI'))
+        db = client[options.db]
+        
+        print("🔧 Migrating stock_movements to a time-series collection (pause stock postings while this runs)...")
+        started = time.perf_counter()
+        copied = migrate_movements(db, options.batch_size, keep_legacy=not options.drop_legacy)
+        if copied is None:
+            print("ℹ️  stock_movements is already a time-series collection")
+            return True
+        
+        sync_indexes(db)
+        print(f"✅ Copied {copied:,} movements in {time.perf_counter() - started:.1f}s")
+        if not options.drop_legacy:
+            print("ℹ️  The old collection was kept as stock_movements_migrated; drop it once you have checked the ledger")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error migrating stock movements: {e}")
+        return False
+    finally:
+        if 'client' in locals():
+            client.close()
+
+def firestore_indexes_json():
+    """Render get_firestore_indexes() in the Firebase CLI index file format"""
+    indexes = []
+    for collection_group, specs in get_firestore_indexes().items():
+        for spec in specs:
+            indexes.append({
+                'collectionGroup': collection_group,
+                'queryScope': 'COLLECTION',
+                'fields': [{'fieldPath': field, 'order': 'ASCENDING' if direction == 1 else 'DESCENDING'}
+                           for field, direction in spec['keys']]
+            })
+    return {'indexes': indexes, 'fieldOverrides': []}
+
+def firestore_indexes_command(args):
+    """Write firestore.indexes.json (default: next to this script)"""
+    import json
+    
+    path = args[0] if args else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'firestore.indexes.json')
+    with open(path, 'w') as f:
+        json.dump(firestore_indexes_json(), f, indent=2)
+        f.write('\n')
+    print(f"✅ Wrote {len(firestore_indexes_json()['indexes'])} Firestore composite indexes to {path}")
+    return True
+
 if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "reset":
         reset_database()
+    elif len(sys.argv) > 1 and sys.argv[1] == "sync-indexes":
+        sys.exit(0 if sync_indexes_command(sys.argv[2:]) else 1)
+    elif len(sys.argv) > 1 and sys.argv[1] == "firestore-indexes":
+        sys.exit(0 if firestore_indexes_command(sys.argv[2:]) else 1)
+    elif len(sys.argv) > 1 and sys.argv[1] == "generate":
+        sys.exit(0 if generate_command(sys.argv[2:]) else 1)
+    elif len(sys.argv) > 1 and sys.argv[1] == "migrate-movements":
+        sys.exit(0 if migrate_movements_command(sys.argv[2:]) else 1)
+    elif len(sys.argv) > 1 and sys.argv[1] == "archive":
+        sys.exit(0 if archive_command(sys.argv[2:]) else 1)
     else:
         init_database()
\ No newline at end of file
@@ -37,8 +37,19 @@ PRODUCT_SCHEMA = {
     "created_at": datetime,
     "updated_at": datetime,
     "created_by": str,  # User ID
+    "sync_seq": int,  # Position in the product change sequence (see /api/products/changes)
 }
 
+# Deleted products, kept so delta sync clients learn about deletes
+PRODUCT_TOMBSTONE_SCHEMA = {
+    "product_id": ObjectId,
+    "sku": str,
+    "sync_seq": int,
+    "deleted_at": datetime,  # Removed by a TTL index after PRODUCT_TOMBSTONE_TTL_SECONDS
+}
+
+PRODUCT_TOMBSTONE_TTL_SECONDS = 30 * 24 * 3600
+
 # Receipt Schema
 RECEIPT_SCHEMA = {
     "receipt_id": str,  # Generated ID like RCP-YYYYMMDD-001
@@ -121,11 +132,14 @@ ADJUSTMENT_SCHEMA = {
     "updated_at": datetime,
 }
 
-# Stock Movement (Ledger) Schema
+# Stock Movement (Ledger) Schema, stored in a time-series collection (see utils/movements.py)
 STOCK_MOVEMENT_SCHEMA = {
     "movement_id": str,  # Generated ID like MOV-YYYYMMDD-001
-    "type": str,  # receipt, delivery, transfer, adjustment
-    "product_id": str,
+    "meta": {  # Time-series metaField: movements are bucketed by these
+        "product_id": str,
+        "location": str,  # Where the stock lands (where it leaves, for deliveries)
+        "type": str,  # receipt, delivery, transfer, adjustment
+    },
     "product_name": str,
     "sku": str,
     "quantity": int,
@@ -133,9 +147,42 @@ STOCK_MOVEMENT_SCHEMA = {
     "to_location": str,
     "reference_id": str,  # ID of the source operation
     "created_by": str,
-    "timestamp": datetime,
+    "timestamp": datetime,  # Time-series timeField
+}
+
+# Background Job Schema (see utils/jobs.py)
+JOB_SCHEMA = {
+    "type": str,  # ledger_export, report, stock_valuation, stock_reconciliation
+    "params": dict,
+    "status": str,  # queued, running, done, failed
+    "progress": dict,  # {done, total, message}
+    "result": dict,
+    "artifact": dict,  # {file_id, filename, media_type, length} in the job_artifacts GridFS bucket
+    "error": str,
+    "attempts": int,
+    "owner": str,  # host:pid of the runner holding the job
+    "heartbeat_at": datetime,  # Jobs whose runner stops heartbeating are re-queued
+    "created_by": str,
+    "created_at": datetime,
+    "started_at": datetime,
+    "finished_at": datetime,
 }
 
+# Idempotency-Key claims and stored responses (see utils/idempotency.py)
+IDEMPOTENCY_SCHEMA = {
+    "_id": str,  # user:endpoint:key
+    "fingerprint": str,  # SHA-256 of the request body
+    "status": str,  # in_progress, completed
+    "response": dict,  # {status, body, mimetype, location}
+    "locked_at": datetime,
+    "created_at": datetime,  # Removed by a TTL index after IDEMPOTENCY_TTL_SECONDS
+}
+
+IDEMPOTENCY_TTL_SECONDS = 24 * 3600
+
+# Finished operations moved to <collection>_archive (see utils/archive.py) keep
+# their schema plus "archived_at": datetime
+
 # Sample data for development/testing
 SAMPLE_USERS = [
     {
@@ -202,49 +249,110 @@ SAMPLE_PRODUCTS = [
 ]
 
 def get_collection_indexes():
-    """Define database indexes for better performance"""
+    """Define database indexes for better performance
+
+    Each entry is {'keys': [(field, direction), ...]} plus any create_index
+    options (unique, partialFilterExpression, name). Every index should serve a
+    query one of the blueprints actually runs; `python init_db.py sync-indexes`
+    creates missing ones and reports stale or unused ones.
+    """
     return {
         'users': [
-            {'email': 1},  # Unique index on email
-            {'firebase_uid': 1},  # Index on Firebase UID
-            {'role': 1, 'status': 1}
+            {'keys': [('email', 1)], 'unique': True},
+            # Users created by admins have no Firebase UID yet
+            {'keys': [('firebase_uid', 1)], 'unique': True,
+             'partialFilterExpression': {'firebase_uid': {'$type': 'string'}}},
+            {'keys': [('role', 1), ('status', 1)]},
+            {'keys': [('department', 1)]}
         ],
         'products': [
-            {'sku': 1},  # Unique index on SKU
-            {'category': 1},
-            {'location': 1},
-            {'status': 1},
-            {'name': 'text', 'description': 'text'}  # Text search index
+            {'keys': [('sku', 1)], 'unique': True},
+            {'keys': [('category', 1)]},
+            {'keys': [('location', 1)]},
+            {'keys': [('status', 1)]},
+            # Small index over just the products the low-stock views list
+            {'keys': [('stock', 1)], 'name': 'low_stock_stock',
+             'partialFilterExpression': {'status': 'Low Stock'}},
+            {'keys': [('name', 'text'), ('description', 'text')]},  # Text search index
+            # /changes pages through writes in sequence order; seeded products have no sync_seq
+            {'keys': [('sync_seq', 1)], 'sparse': True}
+        ],
+        'product_tombstones': [
+            {'keys': [('sync_seq', 1)]},
+            {'keys': [('deleted_at', 1)], 'expireAfterSeconds': PRODUCT_TOMBSTONE_TTL_SECONDS}
         ],
         'receipts': [
-            {'receipt_id': 1},
-            {'supplier': 1},
-            {'status': 1},
-            {'created_at': -1}
+            {'keys': [('receipt_id', 1)], 'unique': True},
+            # Pending counts filter by status; archival by status and age
+            {'keys': [('status', 1), ('updated_at', 1)]},
+            {'keys': [('created_at', -1)]}
+        ],
+        'receipts_archive': [
+            {'keys': [('receipt_id', 1)], 'unique': True},
+            {'keys': [('created_at', -1)]}
         ],
         'deliveries': [
-            {'delivery_id': 1},
-            {'customer': 1},
-            {'status': 1},
-            {'created_at': -1}
+            {'keys': [('delivery_id', 1)], 'unique': True},
+            {'keys': [('status', 1), ('updated_at', 1)]},
+            {'keys': [('created_at', -1)]}
+        ],
+        'deliveries_archive': [
+            {'keys': [('delivery_id', 1)], 'unique': True},
+            {'keys': [('created_at', -1)]}
         ],
         'transfers': [
-            {'transfer_id': 1},
-            {'from_location': 1},
-            {'to_location': 1},
-            {'status': 1},
-            {'created_at': -1}
+            {'keys': [('transfer_id', 1)], 'unique': True},
+            {'keys': [('status', 1), ('updated_at', 1)]},
+            {'keys': [('created_at', -1)]}
+        ],
+        'transfers_archive': [
+            {'keys': [('transfer_id', 1)], 'unique': True},
+            {'keys': [('created_at', -1)]}
         ],
         'adjustments': [
-            {'adjustment_id': 1},
-            {'product_id': 1},
-            {'status': 1},
-            {'created_at': -1}
+            {'keys': [('adjustment_id', 1)], 'unique': True},
+            {'keys': [('product_id', 1)]},
+            {'keys': [('status', 1), ('updated_at', 1)]},
+            {'keys': [('created_at', -1)]}
+        ],
+        'adjustments_archive': [
+            {'keys': [('adjustment_id', 1)], 'unique': True},
+            {'keys': [('created_at', -1)]}
         ],
         'stock_movements': [
-            {'product_id': 1},
-            {'type': 1},
-            {'timestamp': -1},
-            {'reference_id': 1}
+            # Time-series collection (utils/movements.py); get_movements filters
+            # by product and/or type, newest first
+            {'keys': [('meta.product_id', 1), ('timestamp', -1)]},
+            {'keys': [('meta.type', 1), ('timestamp', -1)]},
+            {'keys': [('timestamp', -1)]},
+            {'keys': [('reference_id', 1)]}
+        ],
+        'jobs': [
+            # Runners claim the oldest queued job and re-queue running ones with a stale heartbeat
+            {'keys': [('status', 1), ('created_at', 1)]},
+            {'keys': [('status', 1), ('heartbeat_at', 1)]},
+            {'keys': [('created_by', 1), ('created_at', -1)]},
+            # Runners look for a recent archive_operations job before queueing one
+            {'keys': [('type', 1), ('created_at', -1)]}
+        ],
+        'idempotency': [
+            {'keys': [('created_at', 1)], 'expireAfterSeconds': IDEMPOTENCY_TTL_SECONDS}
         ]
-    }
\ No newline at end of file
+    }
+
+def get_firestore_indexes():
+    """Composite indexes for the Firestore backend (app_firebase.py)
+
+    Same {'keys': [(field, direction)]} form as get_collection_indexes(), keyed
+    by collection group. Single-field indexes are automatic in Firestore and not
+    listed. `python init_db.py firestore-indexes` writes firestore.indexes.json
+    for `firebase deploy --only firestore:indexes`.
+    """
+    return {
+        'operations': [
+            # handle_operations filters by type and/or status, newest first
+            {'keys': [('type', 1), ('date', -1)]},
+            {'keys': [('status', 1), ('date', -1)]},
+            {'keys': [('type', 1), ('status', 1), ('date', -1)]}
+        ]
+    }
@@ -0,0 +1,283 @@
+"""
+Synthetic dataset generator for load and capacity testing
+
+Generates a product catalog plus receipts, deliveries, transfers and
+adjustments over a number of days, with a `stock_movements` ledger that is
+consistent with them: every completed operation posts one movement per item
+and each product's stock equals the sum of its movements. Product popularity
+is Zipfian, and everything comes from a seeded random generator, so the same
+arguments always produce the same data.
+
+Days are split across a process pool; each worker writes its operations and
+ledger rows with batched insert_many calls on its own connection.
+"""
+
+import bisect
+import itertools
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import MongoClient, UpdateOne
+from utils.movements import to_document
+
+CATEGORIES = {
+    'Raw Materials': ('RAW', ['Steel Rods', 'Aluminum Sheets', 'Copper Wire', 'Plastic Pellets', 'Timber Planks']),
+    'Furniture': ('FUR', ['Office Chair', 'Desk', 'Filing Cabinet', 'Shelf Unit', 'Workbench']),
+    'Electronics': ('ELE', ['Laptop Battery', 'Barcode Scanner', 'Label Printer', 'Power Supply', 'Cable Set']),
+    'Supplies': ('SUP', ['Printer Paper', 'Cleaning Supplies', 'Paint Can', 'Packing Tape', 'Gloves']),
+    'Tools': ('TOL', ['Drill', 'Hammer', 'Wrench Set', 'Screwdriver Set', 'Tape Measure']),
+    'Equipment': ('EQP', ['Pallet Jack', 'Safety Helmet', 'Ladder', 'Hand Truck', 'Storage Bin'])
+}
+UNITS = {'Raw Materials': 'kg', 'Supplies': 'units', 'Electronics': 'units',
+         'Furniture': 'units', 'Tools': 'units', 'Equipment': 'units'}
+LOCATIONS = ['Warehouse A', 'Warehouse B', 'Main Store', 'Storage Room', 'Production Floor']
+ADJUSTMENT_REASONS = ['Damaged goods', 'Stock count correction', 'Expired', 'Found during audit']
+OPERATION_MIX = [('receipt', 0.35), ('delivery', 0.45), ('transfer', 0.12), ('adjustment', 0.08)]
+PREFIXES = {'receipt': 'RCP', 'delivery': 'DEL', 'transfer': 'TRF', 'adjustment': 'ADJ'}
+COLLECTIONS = {'receipt': 'receipts', 'delivery': 'deliveries', 'transfer': 'transfers', 'adjustment': 'adjustments'}
+CREATORS = ['admin-123', 'manager-456', 'staff-001', 'staff-002', 'staff-003']
+
+# Set once per worker process by _init_worker so products are pickled only once
+_worker = {}
+
+def zipf_cum_weights(count, exponent=1.1):
+    """Cumulative Zipf weights for ranks 1..count"""
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+def generate_products(count, rng, created_at):
+    products = []
+    categories = list(CATEGORIES)
+    for i in range(count):
+        category = categories[i % len(categories)]
+        prefix, names = CATEGORIES[category]
+        cost_price = round(rng.lognormvariate(2.5, 0.9), 2)
+        products.append({
+            '_id': ObjectId(),
+            'name': f"{rng.choice(names)} {i + 1}",
+            'sku': f"{prefix}-{i + 1:07d}",
+            'category': category,
+            'stock': 0,
+            'unit': UNITS[category],
+            'status': 'Out of Stock',
+            'location': rng.choice(LOCATIONS),
+            'reorder_level': rng.choice([10, 20, 25, 50, 100]),
+            'supplier': f"Supplier {rng.randint(1, 200)}",
+            'cost_price': cost_price,
+            'selling_price': round(cost_price * rng.uniform(1.2, 1.8), 2),
+            'description': '',
+            'created_at': created_at,
+            'updated_at': created_at,
+            'created_by': 'admin-123'
+        })
+    return products
+
+def _init_worker(uri, db_name, catalog, cum_weights, batch_size):
+    _worker.update(uri=uri, db_name=db_name, catalog=catalog, cum_weights=cum_weights, batch_size=batch_size)
+
+def _pick_product(rng):
+    catalog, cum_weights = _worker['catalog'], _worker['cum_weights']
+    return catalog[bisect.bisect_left(cum_weights, rng.random() * cum_weights[-1])]
+
+def _generate_days(task):
+    """Generate and insert every operation and movement for a range of days"""
+    seed, start_date, day_offsets, operations_per_day, today = task
+    rng = random.Random(seed)
+    client = MongoClient(_worker['uri'])
+    db = client[_worker['db_name']]
+    batch_size = _worker['batch_size']
+
+    buffers = {name: [] for name in list(COLLECTIONS.values()) + ['stock_movements']}
+    stock_deltas = {}
+    counters = {}
+    totals = {name: 0 for name in buffers}
+
+    def flush(name, force=False):
+        if buffers[name] and (force or len(buffers[name]) >= batch_size):
+            db[name].insert_many(buffers[name], ordered=False)
+            totals[name] += len(buffers[name])
+            buffers[name] = []
+
+    operation_types = [kind for kind, _ in OPERATION_MIX]
+    operation_weights = [weight for _, weight in OPERATION_MIX]
+
+    for offset in day_offsets:
+        day = start_date + timedelta(days=offset)
+        day_key = day.strftime('%Y%m%d')
+        movement_number = 0
+        age_days = (today - day).days
+        # Weekends are quieter
+        day_operations = max(int(rng.gauss(operations_per_day, operations_per_day * 0.1)
+                                 * (0.4 if day.weekday() >= 5 else 1.0)), 0)
+
+        for number in range(1, day_operations + 1):
+            kind = rng.choices(operation_types, operation_weights)[0]
+            operation_id = f"{PREFIXES[kind]}-{day_key}-{number:03d}"
+            counters[f"{PREFIXES[kind]}-{day_key}"] = number
+            created_at = day + timedelta(seconds=rng.randint(6 * 3600, 20 * 3600))
+            creator = rng.choice(CREATORS)
+
+            # Older operations are settled; recent ones are still in flight
+            if age_days > 3:
+                status = 'canceled' if rng.random() < 0.03 else 'done'
+            else:
+                status = rng.choice(['draft', 'waiting', 'ready', 'done'])
+
+            products = {p['_id']: p for p in (_pick_product(rng) for _ in range(rng.randint(1, 5)))}
+            items = []
+            for product in products.values():
+                quantity = rng.randint(1, 40) if kind != 'receipt' else rng.randint(20, 120)
+                items.append({
+                    'product_id': str(product['_id']),
+                    'product_name': product['name'],
+                    'sku': product['sku'],
+                    'quantity': quantity,
+                    'unit_price': product['cost_price'] if kind == 'receipt' else product['selling_price']
+                })
+
+            doc = {
+                'status': status,
+                'notes': '',
+                'created_by': creator,
+                'created_at': created_at,
+                'updated_at': created_at + timedelta(hours=rng.randint(0, 48)) if status == 'done' else created_at
+            }
+            if kind == 'adjustment':
+                item = items[0]
+                quantity = rng.choice([-1, 1]) * rng.randint(1, 10)
+                location = products[ObjectId(item['product_id'])]['location']
+                doc.update({'adjustment_id': operation_id, 'product_id': item['product_id'],
+                            'product_name': item['product_name'], 'sku': item['sku'], 'quantity': quantity,
+                            'reason': rng.choice(ADJUSTMENT_REASONS), 'location': location})
+                items = [dict(item, quantity=quantity)]
+            else:
+                doc.update({f'{kind}_id': operation_id, 'items': items, 'total_items': len(items)})
+                if kind != 'transfer':
+                    doc['total_value'] = round(sum(i['quantity'] * i['unit_price'] for i in items), 2)
+                if kind == 'receipt':
+                    doc['supplier'] = f"Supplier {rng.randint(1, 200)}"
+                elif kind == 'delivery':
+                    doc['customer'] = f"Customer {rng.randint(1, 500)}"
+                    doc['delivery_address'] = f"{rng.randint(1, 999)} Business St"
+                else:
+                    doc['from_location'], doc['to_location'] = rng.sample(LOCATIONS, 2)
+            buffers[COLLECTIONS[kind]].append(doc)
+            flush(COLLECTIONS[kind])
+
+            if status != 'done':
+                continue
+
+            # Completed operations post to the ledger
+            for item in items:
+                product = products[ObjectId(item['product_id'])]
+                if kind == 'receipt':
+                    delta, source, target = item['quantity'], 'External', product['location']
+                elif kind == 'delivery':
+                    delta, source, target = -item['quantity'], product['location'], 'External'
+                elif kind == 'transfer':
+                    delta, source, target = 0, doc['from_location'], doc['to_location']
+                else:
+                    delta, source, target = item['quantity'], product['location'], product['location']
+                stock_deltas[product['_id']] = stock_deltas.get(product['_id'], 0) + delta
+                movement_number += 1
+                counters[f"MOV-{day_key}"] = movement_number
+
+                buffers['stock_movements'].append(to_document({
+                    'movement_id': f"MOV-{day_key}-{movement_number:03d}",
+                    'type': kind,
+                    'product_id': product['_id'],
+                    'product_name': product['name'],
+                    'sku': product['sku'],
+                    'quantity': item['quantity'],
+                    'from_location': source,
+                    'to_location': target,
+                    'reference_id': operation_id,
+                    'created_by': creator,
+                    'timestamp': doc['updated_at']
+                }))
+                flush('stock_movements')
+
+    for name in buffers:
+        flush(name, force=True)
+    client.close()
+    return {'stock_deltas': stock_deltas, 'counters': counters, 'totals': totals}
+
+def generate_dataset(uri, db_name='stockmaster', products=10000, days=90, operations_per_day=200,
+                     workers=4, seed=42, batch_size=5000, end_date=None):
+    """Generate a full dataset into `db_name` and return per-collection counts"""
+    rng = random.Random(seed)
+    today = (end_date or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+    start_date = today - timedelta(days=days - 1)
+
+    client = MongoClient(uri)
+    db = client[db_name]
+
+    catalog = generate_products(products, rng, start_date)
+    for start in range(0, len(catalog), batch_size):
+        db.products.insert_many(catalog[start:start + batch_size], ordered=False)
+    print(f"✅ Inserted {len(catalog):,} products")
+
+    # Popularity follows product rank in a shuffled order, not insertion order
+    ranked = catalog[:]
+    rng.shuffle(ranked)
+    lean_catalog = [{k: p[k] for k in ('_id', 'name', 'sku', 'location', 'cost_price', 'selling_price')}
+                    for p in ranked]
+    cum_weights = zipf_cum_weights(len(lean_catalog))
+
+    # Each day belongs to exactly one worker, which keeps its document numbering
+    # gap-free; striding spreads the busier recent days across workers
+    chunks = [list(range(days))[i::workers] for i in range(workers)]
+    tasks = [(seed * 1000 + i, start_date, chunk, operations_per_day, today)
+             for i, chunk in enumerate(chunks) if chunk]
+
+    stock = {}
+    counters = {}
+    totals = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(uri, db_name, lean_catalog, cum_weights, batch_size)) as pool:
+        for result in pool.map(_generate_days, tasks):
+            for product_id, delta in result['stock_deltas'].items():
+                stock[product_id] = stock.get(product_id, 0) + delta
+            counters.update(result['counters'])
+            for name, count in result['totals'].items():
+                totals[name] = totals.get(name, 0) + count
+            print(f"   ... {sum(totals.values()):,} documents written")
+
+    # Deliveries drawn in parallel can outrun receipts; an opening balance
+    # adjustment on the first day keeps every product's ledger non-negative
+    opening = []
+    opening_key = start_date.strftime('%Y%m%d')
+    for product in catalog:
+        balance = stock.get(product['_id'], 0)
+        if balance < 0:
+            opening.append(to_document({
+                'movement_id': f"MOV-{opening_key}-OB{len(opening) + 1:06d}", 'type': 'adjustment', 'product_id': product['_id'],
+                'product_name': product['name'], 'sku': product['sku'], 'quantity': -balance,
+                'from_location': product['location'], 'to_location': product['location'],
+                'reference_id': 'OPENING-BALANCE', 'created_by': 'admin-123', 'timestamp': start_date
+            }))
+            stock[product['_id']] = 0
+    for start in range(0, len(opening), batch_size):
+        db.stock_movements.insert_many(opening[start:start + batch_size], ordered=False)
+    totals['stock_movements'] = totals.get('stock_movements', 0) + len(opening)
+
+    updates = []
+    for product in catalog:
+        balance = stock.get(product['_id'], 0)
+        status = 'Out of Stock' if balance == 0 else 'Low Stock' if balance <= product['reorder_level'] else 'In Stock'
+        updates.append(UpdateOne({'_id': product['_id']}, {'$set': {'stock': balance, 'status': status}}))
+        if len(updates) >= batch_size:
+            db.products.bulk_write(updates, ordered=False)
+            updates = []
+    if updates:
+        db.products.bulk_write(updates, ordered=False)
+
+    # Keep the document number allocator ahead of the generated numbers
+    counter_updates = [UpdateOne({'_id': key}, {'$max': {'seq': value}}, upsert=True)
+                       for key, value in counters.items()]
+    for start in range(0, len(counter_updates), batch_size):
+        db.counters.bulk_write(counter_updates[start:start + batch_size], ordered=False)
+
+    client.close()
+    totals['products'] = len(catalog)
+    return totals
@@ -0,0 +1,60 @@
+from flask import Blueprint, request, jsonify
+from utils.auth import require_auth
+from utils.query_profiler import query_profiler
+
+bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+@bp.route('/query-stats', methods=['GET'])
+@require_auth
+def get_query_stats():
+    """Get the MongoDB query shapes with the highest total time"""
+    try:
+        limit = int(request.args.get('limit', 20))
+        sort_by = request.args.get('sort', 'total_ms')
+        
+        if sort_by not in ('total_ms', 'max_ms', 'avg_ms', 'count', 'slow_count'):
+            return jsonify({'error': 'Invalid sort field'}), 400
+        
+        return jsonify({
+            'summary': query_profiler.summary(),
+            'shapes': query_profiler.top(limit, sort_by)
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/query-stats', methods=['DELETE'])
+@require_auth
+def reset_query_stats():
+    """Reset the collected query statistics"""
+    try:
+        query_profiler.reset()
+        return jsonify({'message': 'Query statistics reset successfully'})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/catalog-replica', methods=['GET'])
+@require_auth
+def get_catalog_replica_stats():
+    """Get the state and staleness of this worker's product catalog replica"""
+    try:
+        from routes.products import product_catalog
+        from utils.catalog_replica import CATALOG_REPLICA
+        
+        return jsonify({'enabled': CATALOG_REPLICA, **product_catalog.stats()})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/admission', methods=['GET'])
+@require_auth
+def get_admission_stats():
+    """Get active and queued requests for this worker's admission limiters"""
+    try:
+        from utils.admission import ADMISSION_ENABLED, admission
+        
+        return jsonify({'enabled': ADMISSION_ENABLED, 'limiters': admission.stats()})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,14 +1,10 @@
 from flask import Blueprint, request, jsonify, current_app
-from pymongo import MongoClient
 from datetime import datetime
 import os
+from utils.db import get_db
 
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
-def get_db():
-    client = MongoClient(os.getenv('MONGO_URI'))
-    return client['stockmaster']
-
 @bp.route('/register', methods=['POST'])
 def register():
     """Register a new user after Firebase authentication"""
@@ -83,7 +79,6 @@ def update_profile():
     """Update user profile"""
     try:
         data = request.json
-        db = get_db()
         
         # In development mode, simulate update
         if os.getenv('FLASK_ENV') == 'development':
@@ -103,8 +98,6 @@ def update_profile():
 def get_users():
     """Get all users (admin only)"""
     try:
-        db = get_db()
-        
         # Mock data for development
         mock_users = [
             {
@@ -143,6 +136,7 @@ def get_users():
             return jsonify({'users': mock_users})
         
         # Production logic
+        db = get_db()
         users = list(db.users.find({}, {'firebase_uid': 0}))
         for user in users:
             user['_id'] = str(user['_id'])
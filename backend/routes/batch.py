@@ -0,0 +1,153 @@
+from flask import Blueprint, current_app, request, jsonify
+from werkzeug.test import EnvironBuilder
+from urllib.parse import urlsplit
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.admission import BATCH_ENVIRON
+from utils.auth import VERIFIED_USER_ENVIRON, get_bearer_token, token_verifier
+
+bp = Blueprint('batch', __name__, url_prefix='/api/batch')
+
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', 20))
+BATCH_POOL_SIZE = int(os.getenv('BATCH_POOL_SIZE', 8))
+
+READ_METHODS = ('GET', 'HEAD')
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+# Streams and nested batches cannot be answered inside a JSON payload
+EXCLUDED_PREFIXES = ('/api/batch', '/api/stream')
+
+# Separate from the query fan-out pool, which the sub-requests themselves use
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def get_batch_executor():
+    global _executor, _executor_pid
+    if _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=BATCH_POOL_SIZE, thread_name_prefix='batch')
+                _executor_pid = os.getpid()
+    return _executor
+
+def validate_sub_request(index, sub):
+    if not isinstance(sub, dict):
+        return f'requests[{index}] must be an object'
+    method = str(sub.get('method', 'GET')).upper()
+    path = sub.get('path')
+    if method not in READ_METHODS + WRITE_METHODS:
+        return f'requests[{index}]: unsupported method {method}'
+    if not isinstance(path, str) or not path.startswith('/'):
+        return f'requests[{index}]: path must be an absolute path like /api/products'
+    if urlsplit(path).path.startswith(EXCLUDED_PREFIXES):
+        return f'requests[{index}]: {urlsplit(path).path} cannot be batched'
+    if 'headers' in sub and not isinstance(sub['headers'], dict):
+        return f'requests[{index}]: headers must be an object'
+    return None
+
+def stages(subs):
+    """Group sub-requests: consecutive reads run together, each write runs alone, in order"""
+    groups = []
+    for index, sub in enumerate(subs):
+        is_read = str(sub.get('method', 'GET')).upper() in READ_METHODS
+        if is_read and groups and groups[-1][0]:
+            groups[-1][1].append(index)
+        else:
+            groups.append((is_read, [index]))
+    return [indexes for _, indexes in groups]
+
+def build_environ(sub, user):
+    url = urlsplit(sub['path'])
+    headers = {key: str(value) for key, value in (sub.get('headers') or {}).items()}
+    if request.headers.get('Authorization'):
+        headers.setdefault('Authorization', request.headers['Authorization'])
+    builder = EnvironBuilder(
+        path=url.path,
+        query_string=url.query,
+        method=str(sub.get('method', 'GET')).upper(),
+        base_url=request.host_url,
+        headers=headers,
+        json=sub['body'] if 'body' in sub else None,
+        environ_base={
+            'REMOTE_ADDR': request.remote_addr,
+            BATCH_ENVIRON: True,
+            VERIFIED_USER_ENVIRON: user
+        }
+    )
+    try:
+        return builder.get_environ()
+    finally:
+        builder.close()
+
+def dispatch(app, sub, environ):
+    """Run one sub-request through the app's full request handling"""
+    result = {'id': sub.get('id'), 'status': 500, 'body': None}
+    try:
+        with app.request_context(environ):
+            response = app.full_dispatch_request()
+            try:
+                result['status'] = response.status_code
+                if 300 <= response.status_code < 400:
+                    pass
+                elif response.is_streamed:
+                    result['body'] = {'error': 'Streamed responses cannot be batched; request this path directly'}
+                elif response.is_json:
+                    result['body'] = response.get_json()
+                else:
+                    result['body'] = response.get_data(as_text=True)
+                if 'Location' in response.headers:
+                    result['location'] = response.headers['Location']
+            finally:
+                response.close()
+    except Exception as e:
+        result['body'] = {'error': str(e)}
+    return result
+
+@bp.route('', methods=['POST'])
+def batch():
+    """Run several API requests in one call; reads run concurrently, writes in order"""
+    try:
+        data = request.json or {}
+        subs = data.get('requests')
+        if not isinstance(subs, list) or not subs:
+            return jsonify({'error': 'requests must be a non-empty array'}), 400
+        if len(subs) > BATCH_MAX_REQUESTS:
+            return jsonify({'error': f'At most {BATCH_MAX_REQUESTS} requests per batch'}), 400
+        for index, sub in enumerate(subs):
+            error = validate_sub_request(index, sub)
+            if error:
+                return jsonify({'error': error}), 400
+
+        # The token is verified once here and trusted by every sub-request
+        user = None
+        if request.headers.get('Authorization') and os.getenv('FLASK_ENV') != 'development':
+            token, error = get_bearer_token(request)
+            if error:
+                return jsonify({'error': f'Authentication required: {error}'}), 401
+            try:
+                user = token_verifier.verify(token)
+            except Exception as e:
+                return jsonify({'error': f'Authentication required: Token verification failed: {str(e)}'}), 401
+
+        app = current_app._get_current_object()
+        environs = [build_environ(sub, user) for sub in subs]
+        results = [None] * len(subs)
+        executor = get_batch_executor()
+        for indexes in stages(subs):
+            # A fresh context per sub-request, so each gets its own app context and g
+            if len(indexes) == 1:
+                results[indexes[0]] = contextvars.Context().run(dispatch, app, subs[indexes[0]], environs[indexes[0]])
+                continue
+            futures = {
+                index: executor.submit(contextvars.Context().run, dispatch, app, subs[index], environs[index])
+                for index in indexes
+            }
+            for index, future in futures.items():
+                results[index] = future.result()
+
+        return jsonify({'responses': results})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,14 +1,50 @@
 from flask import Blueprint, request, jsonify
-from pymongo import MongoClient
 from bson import ObjectId
 from datetime import datetime, timedelta
 import os
+from utils.concurrency import run_parallel
+from utils.db import get_db
 
 bp = Blueprint('dashboard', __name__, url_prefix='/api/dashboard')
 
-def get_db():
-    client = MongoClient(os.getenv('MONGO_URI'))
-    return client['stockmaster']
+def compute_stats(db):
+    """Product and pending-operation counts behind /stats and the /api/stream deltas"""
+    # Product and operation counts are independent, so run them concurrently
+    pending = {'status': {'$in': ['draft', 'waiting']}}
+    counts = run_parallel(
+        total_products=lambda: db.products.count_documents({}),
+        low_stock_products=lambda: db.products.count_documents({'status': 'Low Stock'}),
+        out_of_stock_products=lambda: db.products.count_documents({'status': 'Out of Stock'}),
+        pending_receipts=lambda: db.receipts.count_documents(pending),
+        pending_deliveries=lambda: db.deliveries.count_documents(pending),
+        internal_transfers=lambda: db.transfers.count_documents(pending)
+    )
+    
+    # Get product statistics
+    total_products = counts['total_products']
+    low_stock_products = counts['low_stock_products']
+    out_of_stock_products = counts['out_of_stock_products']
+    in_stock_products = total_products - low_stock_products - out_of_stock_products
+    
+    # Get operations statistics
+    pending_receipts = counts['pending_receipts']
+    pending_deliveries = counts['pending_deliveries']
+    internal_transfers = counts['internal_transfers']
+    
+    stats = {
+        'products': {
+            'total': total_products,
+            'in_stock': in_stock_products,
+            'low_stock': low_stock_products,
+            'out_of_stock': out_of_stock_products
+        },
+        'operations': {
+            'pending_receipts': pending_receipts,
+            'pending_deliveries': pending_deliveries,
+            'internal_transfers': internal_transfers
+        }
+    }
+    return stats
 
 @bp.route('/stats', methods=['GET'])
 def get_dashboard_stats():
@@ -99,32 +135,7 @@ def get_dashboard_stats():
             return jsonify(stats)
         
         # Production logic would aggregate data from MongoDB
-        db = get_db()
-        
-        # Get product statistics
-        total_products = db.products.count_documents({})
-        low_stock_products = db.products.count_documents({'status': 'Low Stock'})
-        out_of_stock_products = db.products.count_documents({'status': 'Out of Stock'})
-        in_stock_products = total_products - low_stock_products - out_of_stock_products
-        
-        # Get operations statistics
-        pending_receipts = db.receipts.count_documents({'status': {'$in': ['draft', 'waiting']}})
-        pending_deliveries = db.deliveries.count_documents({'status': {'$in': ['draft', 'waiting']}})
-        internal_transfers = db.transfers.count_documents({'status': {'$in': ['draft', 'waiting']}})
-        
-        stats = {
-            'products': {
-                'total': total_products,
-                'in_stock': in_stock_products,
-                'low_stock': low_stock_products,
-                'out_of_stock': out_of_stock_products
-            },
-            'operations': {
-                'pending_receipts': pending_receipts,
-                'pending_deliveries': pending_deliveries,
-                'internal_transfers': internal_transfers
-            }
-        }
+        stats = compute_stats(get_db())
         
         return jsonify(stats)
         
@@ -306,15 +317,41 @@ def get_recent_operations():
             ]
             return jsonify({'operations': mock_operations[:limit]})
         
-        # In production, you'd union results from multiple collections
+        # In production, union the latest operations of every type
         # and sort by timestamp
         db = get_db()
         
-        # This is a simplified version - you might want to use aggregation
-        # to properly combine and sort operations from different collections
+        def latest(collection):
+            return list(collection.find().sort('created_at', -1).limit(limit))
+        
+        # Each collection is queried concurrently; the slowest one bounds the request
+        results = run_parallel(
+            receipt=lambda: latest(db.receipts),
+            delivery=lambda: latest(db.deliveries),
+            transfer=lambda: latest(db.transfers),
+            adjustment=lambda: latest(db.adjustments)
+        )
+        
         operations = []
+        for operation_type, docs in results.items():
+            for doc in docs:
+                reference = doc.get(f'{operation_type}_id', '')
+                operations.append({
+                    'id': str(doc['_id']),
+                    'type': operation_type,
+                    'title': f'{operation_type.title()} {reference}'.strip(),
+                    'description': doc.get('notes', ''),
+                    'status': doc.get('status'),
+                    'timestamp': doc.get('created_at')
+                })
+        
+        def sort_key(operation):
+            timestamp = operation['timestamp']
+            return timestamp.isoformat() if isinstance(timestamp, datetime) else str(timestamp or '')
+        
+        operations.sort(key=sort_key, reverse=True)
         
-        return jsonify({'operations': operations})
+        return jsonify({'operations': operations[:limit]})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,15 +1,11 @@
 from flask import Blueprint, request, jsonify
-from pymongo import MongoClient
 from bson import ObjectId
 from datetime import datetime, timedelta
 import os
+from utils.db import get_db
 
 bp = Blueprint('dashboard', __name__, url_prefix='/api/dashboard')
 
-def get_db():
-    client = MongoClient(os.getenv('MONGO_URI'))
-    return client['stockmaster']
-
 @bp.route('/stats', methods=['GET'])
 def get_dashboard_stats():
     """Get dashboard statistics and KPIs"""
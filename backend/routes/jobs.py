@@ -0,0 +1,149 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context, url_for
+from bson import ObjectId
+from bson.errors import InvalidId
+import os
+from utils.auth import require_auth
+from utils.db import get_db
+from utils.jobs import JOB_RUNNER, artifact_bucket, job_runner, public_job_types, submit_job
+from routes.operations import serialize_doc
+
+bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+JOBS_LIST_MAX_LIMIT = 200
+ARTIFACT_CHUNK_BYTES = 256 * 1024
+
+def jobs_unavailable():
+    if os.getenv('FLASK_ENV') == 'development':
+        return jsonify({'error': 'Background jobs need MongoDB (FLASK_ENV=production)'}), 503
+    return None
+
+def ensure_runner():
+    """Start this process's job runner when jobs run inside the web process"""
+    if JOB_RUNNER == 'embedded':
+        job_runner.start()
+        job_runner.notify()
+
+def job_response(job):
+    data = serialize_doc(job)
+    data.pop('owner', None)
+    if job.get('artifact'):
+        data['artifact'].pop('file_id', None)
+        data['artifact_url'] = url_for('jobs.download_artifact', job_id=str(job['_id']))
+    return data
+
+def find_job(job_id):
+    try:
+        return get_db().jobs.find_one({'_id': ObjectId(job_id)})
+    except InvalidId:
+        return None
+
+@bp.route('', methods=['POST'])
+@require_auth
+def create_job():
+    """Queue a background job: {"type": "...", "params": {...}}"""
+    try:
+        unavailable = jobs_unavailable()
+        if unavailable:
+            return unavailable
+
+        data = request.json or {}
+        job_type = data.get('type')
+        if not job_type:
+            return jsonify({'error': f"type is required; one of {', '.join(public_job_types())}"}), 400
+
+        try:
+            job = submit_job(get_db(), job_type, data.get('params'),
+                             getattr(request, 'user', {}).get('uid', 'system'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        ensure_runner()
+        response = jsonify({'message': 'Job queued', 'job': job_response(job)})
+        response.status_code = 202
+        response.headers['Location'] = url_for('jobs.get_job', job_id=str(job['_id']))
+        return response
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('', methods=['GET'])
+@require_auth
+def get_jobs():
+    """List the current user's recent jobs"""
+    try:
+        unavailable = jobs_unavailable()
+        if unavailable:
+            return unavailable
+
+        query = {'created_by': getattr(request, 'user', {}).get('uid', 'system')}
+        if request.args.get('status'):
+            query['status'] = request.args['status']
+        if request.args.get('type'):
+            query['type'] = request.args['type']
+        try:
+            limit = int(request.args.get('limit', 50))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        limit = max(1, min(limit, JOBS_LIST_MAX_LIMIT))
+
+        jobs = list(get_db().jobs.find(query).sort('created_at', -1).limit(limit))
+        return jsonify({'jobs': [job_response(job) for job in jobs], 'total': len(jobs)})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/<job_id>', methods=['GET'])
+@require_auth
+def get_job(job_id):
+    """Get a job's status, progress and result"""
+    try:
+        unavailable = jobs_unavailable()
+        if unavailable:
+            return unavailable
+
+        job = find_job(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+
+        if job['status'] == 'queued':
+            ensure_runner()
+        return jsonify(job_response(job))
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/<job_id>/artifact', methods=['GET'])
+@require_auth
+def download_artifact(job_id):
+    """Download a finished job's output"""
+    try:
+        unavailable = jobs_unavailable()
+        if unavailable:
+            return unavailable
+
+        job = find_job(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        if job['status'] != 'done' or not job.get('artifact'):
+            return jsonify({'error': 'Job has no artifact', 'status': job['status']}), 409
+
+        artifact = job['artifact']
+        download = artifact_bucket(get_db()).open_download_stream(artifact['file_id'])
+
+        def chunks():
+            try:
+                while True:
+                    chunk = download.read(ARTIFACT_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                download.close()
+
+        return Response(stream_with_context(chunks()), mimetype=artifact['media_type'], headers={
+            'Content-Disposition': f'attachment; filename="{artifact["filename"]}"',
+            'Content-Length': str(download.length)
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
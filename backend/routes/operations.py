@@ -1,15 +1,20 @@
-from flask import Blueprint, request, jsonify
-from pymongo import MongoClient
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from bson import ObjectId
+from bson.errors import InvalidId
 from datetime import datetime
 import os
+from utils.archive import find_operations
+from utils.auth import require_auth
+from utils.idempotency import idempotent
+from utils.db import get_db
+from utils.movements import flatten
+from utils.sequences import SequenceAllocator
+from utils.ledger_export import (
+    ARROW_MEDIA_TYPE, PARQUET_MEDIA_TYPE, find_movements, movement_query, stream_arrow, stream_parquet
+)
 
 bp = Blueprint('operations', __name__, url_prefix='/api/operations')
 
-def get_db():
-    client = MongoClient(os.getenv('MONGO_URI'))
-    return client['stockmaster']
-
 def serialize_doc(doc):
     """Convert ObjectId to string in documents"""
     if doc is None:
@@ -28,10 +33,18 @@ def serialize_doc(doc):
         return result
     return doc
 
+sequences = SequenceAllocator(lambda: get_db().counters)
+dev_sequences = SequenceAllocator()
+
 def generate_id(prefix):
-    """Generate a unique ID with prefix"""
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    return f"{prefix}{timestamp}"
+    """Generate a daily-scoped document number like RCP-YYYYMMDD-001"""
+    if os.getenv('FLASK_ENV') == 'development':
+        return dev_sequences.next_id(prefix)
+    return sequences.next_id(prefix)
+
+def include_archived():
+    """Whether a listing should also return archived operations (?include_archived=1)"""
+    return request.args.get('include_archived') in ('1', 'true')
 
 # RECEIPTS ROUTES
 @bp.route('/receipts', methods=['GET'])
@@ -93,20 +106,22 @@ def get_receipts():
             return jsonify({'receipts': mock_receipts, 'total': len(mock_receipts)})
         
         db = get_db()
-        receipts = list(db.receipts.find())
+        receipts = find_operations(db, 'receipts', include_archived())
         return jsonify({'receipts': serialize_doc(receipts), 'total': len(receipts)})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/receipts', methods=['POST'])
+@require_auth
+@idempotent
 def create_receipt():
     """Create a new receipt"""
     try:
         data = request.json
         
         receipt_doc = {
-            'receipt_id': generate_id('RCP-'),
+            'receipt_id': generate_id('RCP'),
             'supplier': data['supplier'],
             'items': data['items'],
             'total_items': len(data['items']),
@@ -192,20 +207,22 @@ def get_deliveries():
             return jsonify({'deliveries': mock_deliveries, 'total': len(mock_deliveries)})
         
         db = get_db()
-        deliveries = list(db.deliveries.find())
+        deliveries = find_operations(db, 'deliveries', include_archived())
         return jsonify({'deliveries': serialize_doc(deliveries), 'total': len(deliveries)})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/deliveries', methods=['POST'])
+@require_auth
+@idempotent
 def create_delivery():
     """Create a new delivery"""
     try:
         data = request.json
         
         delivery_doc = {
-            'delivery_id': generate_id('DEL-'),
+            'delivery_id': generate_id('DEL'),
             'customer': data['customer'],
             'items': data['items'],
             'total_items': len(data['items']),
@@ -288,20 +305,22 @@ def get_transfers():
             return jsonify({'transfers': mock_transfers, 'total': len(mock_transfers)})
         
         db = get_db()
-        transfers = list(db.transfers.find())
+        transfers = find_operations(db, 'transfers', include_archived())
         return jsonify({'transfers': serialize_doc(transfers), 'total': len(transfers)})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/transfers', methods=['POST'])
+@require_auth
+@idempotent
 def create_transfer():
     """Create a new transfer"""
     try:
         data = request.json
         
         transfer_doc = {
-            'transfer_id': generate_id('TRF-'),
+            'transfer_id': generate_id('TRF'),
             'from_location': data['from_location'],
             'to_location': data['to_location'],
             'items': data['items'],
@@ -373,20 +392,22 @@ def get_adjustments():
             return jsonify({'adjustments': mock_adjustments, 'total': len(mock_adjustments)})
         
         db = get_db()
-        adjustments = list(db.adjustments.find())
+        adjustments = find_operations(db, 'adjustments', include_archived())
         return jsonify({'adjustments': serialize_doc(adjustments), 'total': len(adjustments)})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/adjustments', methods=['POST'])
+@require_auth
+@idempotent
 def create_adjustment():
     """Create a new inventory adjustment"""
     try:
         data = request.json
         
         adjustment_doc = {
-            'adjustment_id': generate_id('ADJ-'),
+            'adjustment_id': generate_id('ADJ'),
             'product_id': data['product_id'],
             'product_name': data['product_name'],
             'sku': data['sku'],
@@ -464,18 +485,52 @@ def get_movements():
         db = get_db()
         query = {}
         if product_id:
-            query['product_id'] = ObjectId(product_id)
+            query['meta.product_id'] = ObjectId(product_id)
         if movement_type:
-            query['type'] = movement_type
+            query['meta.type'] = movement_type
             
-        movements = list(db.stock_movements.find(query).sort('timestamp', -1).limit(limit))
+        movements = [flatten(doc) for doc in db.stock_movements.find(query).sort('timestamp', -1).limit(limit)]
         return jsonify({'movements': serialize_doc(movements), 'total': len(movements)})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def export_movements(stream, media_type, extension):
+    """Stream the filtered ledger, oldest first, in a columnar format"""
+    try:
+        query = movement_query(request.args)
+    except (ValueError, InvalidId) as e:
+        return jsonify({'error': f'Invalid filter: {str(e)}'}), 400
+    
+    if os.getenv('FLASK_ENV') == 'development':
+        movements = []
+    else:
+        movements = find_movements(get_db(), query)
+    
+    filename = f"stock_movements-{datetime.utcnow():%Y%m%d%H%M%S}.{extension}"
+    return Response(stream_with_context(stream(movements)), mimetype=media_type, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    })
+
+@bp.route('/movements/export.parquet', methods=['GET'])
+def export_movements_parquet():
+    """Export stock movements as Parquet"""
+    try:
+        return export_movements(stream_parquet, PARQUET_MEDIA_TYPE, 'parquet')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/movements/export.arrow', methods=['GET'])
+def export_movements_arrow():
+    """Export stock movements as an Arrow IPC stream"""
+    try:
+        return export_movements(stream_arrow, ARROW_MEDIA_TYPE, 'arrow')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # STATUS UPDATE ROUTES
 @bp.route('/<operation_type>/<operation_id>/status', methods=['PUT'])
+@require_auth
 def update_operation_status(operation_type, operation_id):
     """Update operation status"""
     try:
@@ -1,14 +1,46 @@
 from flask import Blueprint, request, jsonify
-from pymongo import MongoClient
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta
+import heapq
+import math
 import os
+import time
+from utils.auth import require_auth
+from utils.idempotency import idempotent
+from utils.db import get_db
+from utils.catalog_replica import CATALOG_REPLICA, mongo_catalog_replica
+from utils.sequences import SequenceAllocator
+from models.schemas import PRODUCT_TOMBSTONE_TTL_SECONDS
 
 bp = Blueprint('products', __name__, url_prefix='/api/products')
 
-def get_db():
-    client = MongoClient(os.getenv('MONGO_URI'))
-    return client['stockmaster']
+# Every product write takes the next number of one global, strictly increasing
+# sequence (no leased blocks), so /changes can page through writes in order
+PRODUCT_CHANGES_KEY = 'product-changes'
+change_sequence = SequenceAllocator(lambda: get_db().counters, block_size=1, daily=False)
+
+# Writes younger than this may still be in flight with a lower sequence number
+SYNC_SETTLE_SECONDS = float(os.getenv('SYNC_SETTLE_SECONDS', 2))
+SYNC_MAX_LIMIT = 5000
+
+# Opt-in (CATALOG_REPLICA=1) in-memory copy of the products collection
+product_catalog = mongo_catalog_replica(get_db)
+
+def catalog_replica():
+    """Return the catalog replica when it is enabled and current, else None"""
+    if not CATALOG_REPLICA:
+        return None
+    product_catalog.start()
+    return product_catalog if product_catalog.is_ready() else None
+
+def replicate(product_id, doc=None):
+    """Apply this worker's own write to the replica so it reads its writes"""
+    if CATALOG_REPLICA:
+        product_catalog.apply({
+            'operationType': 'replace' if doc else 'delete',
+            'documentKey': {'_id': ObjectId(product_id)},
+            'fullDocument': doc
+        })
 
 def serialize_doc(doc):
     """Convert ObjectId to string in documents"""
@@ -32,8 +64,6 @@ def serialize_doc(doc):
 def get_products():
     """Get all products with optional filtering"""
     try:
-        db = get_db()
-        
         # Mock data for development
         mock_products = [
             {
@@ -148,6 +178,21 @@ def get_products():
             })
         
         # Production logic
+        replica = catalog_replica()
+        if replica:
+            products = replica.find(
+                search=request.args.get('search'),
+                category=request.args.get('category'),
+                status=request.args.get('status'),
+                location=request.args.get('location')
+            )
+            products = serialize_doc(products)
+            return jsonify({
+                'products': products,
+                'total': len(products)
+            })
+        
+        db = get_db()
         query = {}
         search = request.args.get('search')
         if search:
@@ -181,6 +226,8 @@ def get_products():
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/', methods=['POST'])
+@require_auth
+@idempotent
 def create_product():
     """Create a new product"""
     try:
@@ -233,7 +280,9 @@ def create_product():
                 'product': product_doc
             }), 201
         
+        product_doc['sync_seq'] = change_sequence.next_value(PRODUCT_CHANGES_KEY)
         result = db.products.insert_one(product_doc)
+        replicate(result.inserted_id, dict(product_doc))
         product_doc['_id'] = str(result.inserted_id)
         
         return jsonify({
@@ -269,8 +318,12 @@ def get_product(product_id):
             }
             return jsonify({'product': mock_product})
         
-        db = get_db()
-        product = db.products.find_one({'_id': ObjectId(product_id)})
+        replica = catalog_replica()
+        if replica:
+            product = replica.get(product_id)
+        else:
+            db = get_db()
+            product = db.products.find_one({'_id': ObjectId(product_id)})
         
         if not product:
             return jsonify({'error': 'Product not found'}), 404
@@ -281,6 +334,7 @@ def get_product(product_id):
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/<product_id>', methods=['PUT'])
+@require_auth
 def update_product(product_id):
     """Update a product"""
     try:
@@ -313,6 +367,7 @@ def update_product(product_id):
         
         data['updated_at'] = datetime.utcnow()
         data['updated_by'] = getattr(request, 'user', {}).get('uid', 'system')
+        data['sync_seq'] = change_sequence.next_value(PRODUCT_CHANGES_KEY)
         
         db.products.update_one(
             {'_id': ObjectId(product_id)},
@@ -320,6 +375,7 @@ def update_product(product_id):
         )
         
         updated_product = db.products.find_one({'_id': ObjectId(product_id)})
+        replicate(product_id, updated_product)
         
         return jsonify({
             'message': 'Product updated successfully',
@@ -330,6 +386,7 @@ def update_product(product_id):
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/<product_id>', methods=['DELETE'])
+@require_auth
 def delete_product(product_id):
     """Delete a product"""
     try:
@@ -338,16 +395,119 @@ def delete_product(product_id):
         
         db = get_db()
         
-        result = db.products.delete_one({'_id': ObjectId(product_id)})
+        deleted = db.products.find_one_and_delete({'_id': ObjectId(product_id)}, projection={'sku': 1})
         
-        if result.deleted_count == 0:
+        if not deleted:
             return jsonify({'error': 'Product not found'}), 404
         
+        # Tombstones let /changes report the delete to syncing clients
+        db.product_tombstones.insert_one({
+            'product_id': deleted['_id'],
+            'sku': deleted.get('sku'),
+            'sync_seq': change_sequence.next_value(PRODUCT_CHANGES_KEY),
+            'deleted_at': datetime.utcnow()
+        })
+        
+        replicate(product_id)
         return jsonify({'message': 'Product deleted successfully'})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def encode_sync_token(seq):
+    """Opaque sync token: change sequence number and issue time"""
+    return f"{seq}.{int(time.time())}"
+
+def decode_sync_token(token):
+    seq, issued_at = token.split('.')
+    return int(seq), int(issued_at)
+
+@bp.route('/changes', methods=['GET'])
+def get_product_changes():
+    """Get products created, updated or deleted since a sync token
+    
+    Without `since`, returns the whole catalog and a token to sync from. With
+    it, returns changed products and deleted ids in write order, up to `limit`;
+    call again with `next` while `has_more` is true. `retry_after` (seconds)
+    is set when newer writes exist but have not settled yet: poll again after it.
+    """
+    try:
+        since = request.args.get('since')
+        try:
+            limit = int(request.args.get('limit', 500))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        limit = max(1, min(limit, SYNC_MAX_LIMIT))
+        
+        if os.getenv('FLASK_ENV') == 'development':
+            return jsonify({'changes': [], 'deleted': [], 'next': encode_sync_token(0),
+                            'has_more': False, 'retry_after': None, 'full': since is None})
+        
+        db = get_db()
+        
+        if not since:
+            # A write can take its sequence number before a lower one still in flight
+            # commits, so the token is the highest sequence the scan saw on a settled
+            # write; newer ones it saw are sent again by the next delta
+            cutoff = datetime.utcnow() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+            products = list(db.products.find())
+            settled = [doc['sync_seq'] for doc in products
+                       if doc.get('sync_seq') and isinstance(doc.get('updated_at'), datetime)
+                       and doc['updated_at'] <= cutoff]
+            seq = max(settled, default=0)
+            return jsonify({'changes': serialize_doc(products), 'deleted': [], 'next': encode_sync_token(seq),
+                            'has_more': False, 'retry_after': None, 'full': True})
+        
+        try:
+            since_seq, issued_at = decode_sync_token(since)
+        except ValueError:
+            return jsonify({'error': 'Invalid sync token'}), 400
+        
+        # Deletes older than the tombstone TTL are no longer known
+        if time.time() - issued_at > PRODUCT_TOMBSTONE_TTL_SECONDS:
+            return jsonify({'error': 'Sync token expired; resync without since', 'reset': True}), 410
+        
+        query = {'sync_seq': {'$gt': since_seq}}
+        products = db.products.find(query).sort('sync_seq', 1).limit(limit + 1)
+        tombstones = db.product_tombstones.find(query).sort('sync_seq', 1).limit(limit + 1)
+        
+        cutoff = datetime.utcnow() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+        changes, deleted = [], []
+        next_seq = since_seq
+        has_more = False
+        retry_after = None
+        
+        merged = heapq.merge(
+            ((doc['sync_seq'], doc.get('updated_at'), 'changed', doc) for doc in products),
+            ((doc['sync_seq'], doc.get('deleted_at'), 'deleted', doc) for doc in tombstones),
+            key=lambda entry: entry[0]
+        )
+        for seq, written_at, kind, doc in merged:
+            if len(changes) + len(deleted) >= limit:
+                has_more = True
+                break
+            # Stop at the first unsettled write so a lower sequence still in flight is not skipped
+            if written_at and written_at > cutoff:
+                retry_after = math.ceil((written_at - cutoff).total_seconds() * 10) / 10
+                break
+            if kind == 'changed':
+                changes.append(doc)
+            else:
+                deleted.append(str(doc['product_id']))
+            next_seq = seq
+        
+        return jsonify({
+            'changes': serialize_doc(changes),
+            'deleted': deleted,
+            'next': encode_sync_token(next_seq),
+            'has_more': has_more,
+            'retry_after': retry_after,
+            'full': False
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bp.route('/categories', methods=['GET'])
 def get_categories():
     """Get all product categories"""
@@ -364,6 +524,10 @@ def get_categories():
                 ]
             })
         
+        replica = catalog_replica()
+        if replica:
+            return jsonify({'categories': replica.distinct('category')})
+        
         db = get_db()
         categories = db.products.distinct('category')
         
@@ -387,10 +551,36 @@ def get_locations():
                 ]
             })
         
+        replica = catalog_replica()
+        if replica:
+            return jsonify({'locations': replica.distinct('location')})
+        
         db = get_db()
         locations = db.products.distinct('location')
         
         return jsonify({'locations': locations})
         
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/sku/<sku>', methods=['GET'])
+def get_product_by_sku(sku):
+    """Get a specific product by SKU"""
+    try:
+        if os.getenv('FLASK_ENV') == 'development':
+            return jsonify({'error': 'Product not found'}), 404
+        
+        replica = catalog_replica()
+        if replica:
+            product = replica.get_by_sku(sku)
+        else:
+            db = get_db()
+            product = db.products.find_one({'sku': sku})
+        
+        if not product:
+            return jsonify({'error': 'Product not found'}), 404
+        
+        return jsonify({'product': serialize_doc(product)})
+        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,48 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context, url_for
+import os
+from utils.auth import require_auth
+from utils.db import get_db
+from utils.jobs import submit_job
+from utils.reports import (
+    REPORT_FORMATS, REPORT_INLINE_MAX_ROWS, count_rows, iter_rows, report_filename, report_query, stream_report
+)
+from routes.jobs import ensure_runner, job_response
+
+bp = Blueprint('reports', __name__, url_prefix='/api/reports')
+
+@bp.route('/<name>.<any(csv, pdf):format>', methods=['GET'])
+@require_auth
+def get_report(name, format):
+    """Stream a stock, low_stock or ledger report, or queue it as a job when large"""
+    try:
+        params = {key: value for key, value in request.args.items() if key != 'async'}
+        try:
+            query = report_query(name, params)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if os.getenv('FLASK_ENV') == 'development':
+            rows = iter([])
+        else:
+            db = get_db()
+            total = count_rows(db, name, query)
+            if total > REPORT_INLINE_MAX_ROWS or request.args.get('async') == '1':
+                job = submit_job(db, 'report', dict(params, name=name, format=format),
+                                 getattr(request, 'user', {}).get('uid', 'system'))
+                ensure_runner()
+                response = jsonify({
+                    'message': f'Report has {total} rows and is being generated as a background job',
+                    'job': job_response(job)
+                })
+                response.status_code = 202
+                response.headers['Location'] = url_for('jobs.get_job', job_id=str(job['_id']))
+                return response
+            rows = iter_rows(db, name, query)
+        
+        return Response(stream_with_context(stream_report(name, format, rows, params)),
+                        mimetype=REPORT_FORMATS[format], headers={
+            'Content-Disposition': f'attachment; filename="{report_filename(name, format)}"'
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
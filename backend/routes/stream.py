@@ -0,0 +1,59 @@
+from flask import Blueprint, Response, stream_with_context
+import itertools
+import json
+import os
+from utils.auth import require_auth
+from utils.change_feed import RESET, mongo_change_feed
+from utils.db import get_db
+from routes.dashboard import compute_stats
+
+bp = Blueprint('stream', __name__, url_prefix='/api/stream')
+
+STREAM_KEEPALIVE_SECONDS = float(os.getenv('STREAM_KEEPALIVE_SECONDS', 15))
+
+# One watcher per worker, shared by every open stream
+change_feed = mongo_change_feed(get_db, compute_stats)
+
+def sse_message(event, data, message_id=None):
+    """Format one Server-Sent Events message"""
+    lines = []
+    if message_id is not None:
+        lines.append(f'id: {message_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, default=str)}')
+    return '\n'.join(lines) + '\n\n'
+
+@bp.route('', methods=['GET'])
+@require_auth
+def stream_events():
+    """Push dashboard counter deltas, low-stock alerts and operation changes"""
+    subscription = change_feed.subscribe()
+    
+    def events():
+        ids = itertools.count(1)
+        try:
+            # Tell the browser how long to wait before reconnecting
+            yield 'retry: 3000\n\n'
+            stats = change_feed.current_stats()
+            if stats is not None:
+                yield sse_message('stats', {'deltas': {}, 'stats': stats}, next(ids))
+            
+            while True:
+                message = subscription.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                if message is RESET:
+                    # Dropped for falling behind; the client reconnects and gets fresh stats
+                    yield sse_message(*RESET)
+                    return
+                if message is None:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ': keepalive\n\n'
+                    continue
+                event, data = message
+                yield sse_message(event, data, next(ids))
+        finally:
+            change_feed.unsubscribe(subscription)
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -1,15 +1,12 @@
 from flask import Blueprint, request, jsonify
-from pymongo import MongoClient
 from bson import ObjectId
 from datetime import datetime
 import os
+from utils.auth import require_auth
+from utils.db import get_db
 
 bp = Blueprint('users', __name__, url_prefix='/api/users')
 
-def get_db():
-    client = MongoClient(os.getenv('MONGO_URI'))
-    return client['stockmaster']
-
 def serialize_doc(doc):
     """Convert ObjectId to string in documents"""
     if doc is None:
@@ -176,6 +173,7 @@ def get_user(user_id):
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/', methods=['POST'])
+@require_auth
 def create_user():
     """Create a new user (admin only)"""
     try:
@@ -241,6 +239,7 @@ def create_user():
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/<user_id>', methods=['PUT'])
+@require_auth
 def update_user(user_id):
     """Update a user (admin only)"""
     try:
@@ -289,6 +288,7 @@ def update_user(user_id):
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/<user_id>', methods=['DELETE'])
+@require_auth
 def delete_user(user_id):
     """Delete/deactivate a user (admin only)"""
     try:
@@ -0,0 +1,17 @@
+"""
+Standalone background job runner
+
+    python run_jobs.py
+
+Runs queued jobs from the `jobs` collection on JOB_WORKERS processes (see
+utils/jobs.py). gunicorn.conf.py starts one of these next to the web workers.
+"""
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.jobs import run_forever
+
+if __name__ == '__main__':
+    run_forever()
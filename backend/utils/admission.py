@@ -0,0 +1,207 @@
+"""
+Admission control and load shedding
+
+Every request has to take a slot from the worker-wide limiter, and requests
+to expensive routes (see ROUTE_LIMITS) also from that route's own limiter.
+When all slots are taken a request waits in a bounded queue, ordered by
+priority class and then arrival; if the queue is full, or no slot frees up
+within the class's queue deadline, it gets 503 with Retry-After instead of
+adding to the pile-up.
+
+Priority classes:
+- critical: /health, /metrics and stock-posting writes. Always queued first and
+  may use ADMISSION_CRITICAL_RESERVE slots beyond the normal limit.
+- normal: everything else.
+- low: dashboards, exports and reports. Shorter queue deadline.
+- exempt: long-lived streams (/api/stream), which would otherwise hold a slot
+  for as long as the client stays connected.
+
+Keep ADMISSION_MAX_CONCURRENCY below gunicorn's thread count, so that threads
+are left over for queued and critical requests.
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from flask import g, jsonify, request
+from prometheus_client import Counter, Gauge, Histogram
+
+ADMISSION_ENABLED = os.getenv('ADMISSION_CONTROL', '1') == '1'
+ADMISSION_MAX_CONCURRENCY = int(os.getenv('ADMISSION_MAX_CONCURRENCY', 24))
+ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', 64))
+ADMISSION_CRITICAL_RESERVE = int(os.getenv('ADMISSION_CRITICAL_RESERVE', 4))
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv('ADMISSION_RETRY_AFTER_SECONDS', 2))
+
+PRIORITIES = {'critical': 0, 'normal': 1, 'low': 2}
+
+# Seconds a request of each class may wait for a slot
+QUEUE_DEADLINES = {'critical': 5.0, 'normal': 2.0, 'low': 0.5}
+
+# Per-route limits: (rule prefix, max concurrent, max queued)
+ROUTE_LIMITS = [
+    ('/api/operations/movements/export', 2, 4),
+    ('/api/dashboard/', 8, 16),
+    ('/api/reports/', 4, 8)
+]
+
+CRITICAL_ROUTES = ('/health', '/metrics')
+STOCK_POSTING_PREFIX = '/api/operations/'
+LOW_PRIORITY_PREFIXES = ('/api/dashboard/', '/api/operations/movements/export', '/api/reports/')
+EXEMPT_PREFIXES = ('/api/stream',)
+
+# Set on the WSGI environ of in-process /api/batch sub-requests
+BATCH_ENVIRON = 'stockmaster.batch'
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    'stockmaster_admission_queue_depth', 'Requests waiting for a slot', ['limiter'], multiprocess_mode='livesum'
+)
+ADMISSION_ACTIVE = Gauge(
+    'stockmaster_admission_active', 'Requests holding a slot', ['limiter'], multiprocess_mode='livesum'
+)
+ADMISSION_SHED = Counter(
+    'stockmaster_admission_shed_total', 'Requests rejected with 503', ['limiter', 'priority', 'reason']
+)
+ADMISSION_WAIT = Histogram(
+    'stockmaster_admission_wait_seconds', 'Time spent waiting for a slot', ['limiter', 'priority'],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5)
+)
+
+class Rejected(Exception):
+    def __init__(self, limiter, reason):
+        super().__init__(f'{limiter}: {reason}')
+        self.limiter = limiter
+        self.reason = reason
+
+class Limiter:
+    """Concurrency limit with a bounded, priority-ordered wait queue"""
+
+    def __init__(self, name, max_concurrency, max_queue, critical_reserve=0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.critical_reserve = critical_reserve
+        self._active = 0
+        self._waiters = []  # heap of [priority, arrival, granted event]
+        self._arrivals = itertools.count()
+        self._lock = threading.Lock()
+
+    def _capacity(self, priority):
+        return self.max_concurrency + (self.critical_reserve if priority == PRIORITIES['critical'] else 0)
+
+    def acquire(self, priority, timeout):
+        """Take a slot, waiting up to `timeout` seconds; raises Rejected"""
+        with self._lock:
+            if self._active < self._capacity(priority) and not self._has_waiter_before(priority):
+                self._active += 1
+                ADMISSION_ACTIVE.labels(self.name).inc()
+                return
+            if len(self._waiters) >= self.max_queue and priority != PRIORITIES['critical']:
+                raise Rejected(self.name, 'queue_full')
+            waiter = [priority, next(self._arrivals), threading.Event()]
+            heapq.heappush(self._waiters, waiter)
+            ADMISSION_QUEUE_DEPTH.labels(self.name).inc()
+
+        if waiter[2].wait(timeout):
+            return
+
+        with self._lock:
+            # The slot may have been handed over just as the wait timed out
+            if waiter[2].is_set():
+                return
+            self._waiters.remove(waiter)
+            heapq.heapify(self._waiters)
+            ADMISSION_QUEUE_DEPTH.labels(self.name).dec()
+        raise Rejected(self.name, 'timeout')
+
+    def release(self):
+        with self._lock:
+            # Hand the slot straight to the highest-priority waiter that fits
+            if self._waiters and self._active <= self._capacity(self._waiters[0][0]):
+                waiter = heapq.heappop(self._waiters)
+                ADMISSION_QUEUE_DEPTH.labels(self.name).dec()
+                waiter[2].set()
+                return
+            self._active -= 1
+            ADMISSION_ACTIVE.labels(self.name).dec()
+
+    def _has_waiter_before(self, priority):
+        return bool(self._waiters) and self._waiters[0][0] <= priority
+
+    def stats(self):
+        with self._lock:
+            return {'active': self._active, 'queued': len(self._waiters),
+                    'max_concurrency': self.max_concurrency, 'max_queue': self.max_queue}
+
+def priority_class(method, rule):
+    if rule.startswith(EXEMPT_PREFIXES):
+        return 'exempt'
+    if rule in CRITICAL_ROUTES:
+        return 'critical'
+    if rule.startswith(LOW_PRIORITY_PREFIXES):
+        return 'low'
+    if method in ('POST', 'PUT') and rule.startswith(STOCK_POSTING_PREFIX):
+        return 'critical'
+    return 'normal'
+
+class AdmissionController:
+    def __init__(self, max_concurrency=ADMISSION_MAX_CONCURRENCY, max_queue=ADMISSION_MAX_QUEUE,
+                 critical_reserve=ADMISSION_CRITICAL_RESERVE, route_limits=ROUTE_LIMITS):
+        self.worker = Limiter('worker', max_concurrency, max_queue, critical_reserve)
+        self.routes = [(prefix, Limiter(prefix, concurrency, queue)) for prefix, concurrency, queue in route_limits]
+
+    def limiters_for(self, rule, worker=True):
+        limiters = [limiter for prefix, limiter in self.routes if rule.startswith(prefix)]
+        # Route limiters first so a request queued for a busy route holds no worker slot
+        return limiters + [self.worker] if worker else limiters
+
+    def admit(self, priority_name, rule, worker=True):
+        """Acquire every limiter for a route; returns those held, raises Rejected"""
+        priority = PRIORITIES[priority_name]
+        deadline = time.monotonic() + QUEUE_DEADLINES[priority_name]
+        held = []
+        try:
+            for limiter in self.limiters_for(rule, worker):
+                started = time.monotonic()
+                limiter.acquire(priority, max(deadline - started, 0))
+                ADMISSION_WAIT.labels(limiter.name, priority_name).observe(time.monotonic() - started)
+                held.append(limiter)
+        except Rejected as e:
+            ADMISSION_SHED.labels(e.limiter, priority_name, e.reason).inc()
+            for limiter in reversed(held):
+                limiter.release()
+            raise
+        return held
+
+    def stats(self):
+        return {limiter.name: limiter.stats() for limiter in [self.worker] + [l for _, l in self.routes]}
+
+admission = AdmissionController()
+
+def init_admission(app, controller=None):
+    """Install admission control on an app (register after init_metrics so 503s are counted)"""
+    controller = controller or admission
+    if not ADMISSION_ENABLED:
+        return
+
+    @app.before_request
+    def admit_request():
+        rule = request.url_rule.rule if request.url_rule else request.path
+        priority_name = priority_class(request.method, rule)
+        if priority_name == 'exempt':
+            return None
+        try:
+            # /api/batch sub-requests run inside a request that already holds a worker slot
+            g.admission_slots = controller.admit(priority_name, rule, worker=not request.environ.get(BATCH_ENVIRON))
+        except Rejected:
+            response = jsonify({'error': 'Server is busy, please retry shortly'})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(ADMISSION_RETRY_AFTER_SECONDS)
+            return response
+        return None
+
+    @app.teardown_request
+    def release_request(exc):
+        for limiter in reversed(g.pop('admission_slots', [])):
+            limiter.release()
@@ -0,0 +1,79 @@
+"""
+Hot/cold archival of finished operations
+
+Receipts, deliveries, transfers and adjustments that are `done` or `canceled`
+and have not changed for ARCHIVE_RETENTION_DAYS are moved to
+`<collection>_archive` in batches: each batch is upserted into the archive and
+then deleted from the hot collection, so an interrupted run leaves at most a
+batch present in both and the next run finishes it. The hot collections and
+their indexes therefore only hold recent and open work; listing endpoints read
+the archive only when asked (`?include_archived=1`).
+
+Archival runs as the `archive_operations` background job, queued by the job
+runner every ARCHIVE_INTERVAL_HOURS, or by hand with `python init_db.py archive`.
+"""
+
+import os
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne
+
+ARCHIVE_RETENTION_DAYS = int(os.getenv('ARCHIVE_RETENTION_DAYS', 90))
+# Floor for any retention passed in, so a run cannot sweep up recently finished work
+ARCHIVE_MIN_RETENTION_DAYS = int(os.getenv('ARCHIVE_MIN_RETENTION_DAYS', 30))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 1000))
+
+ARCHIVED_COLLECTIONS = ('receipts', 'deliveries', 'transfers', 'adjustments')
+ARCHIVED_STATUSES = ['done', 'canceled']
+
+def archive_name(collection_name):
+    return f'{collection_name}_archive'
+
+def archivable_query(retention_days=ARCHIVE_RETENTION_DAYS):
+    if retention_days < ARCHIVE_MIN_RETENTION_DAYS:
+        raise ValueError(f'retention_days must be at least {ARCHIVE_MIN_RETENTION_DAYS} (ARCHIVE_MIN_RETENTION_DAYS)')
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    return {'status': {'$in': ARCHIVED_STATUSES}, 'updated_at': {'$lt': cutoff}}
+
+def count_archivable(db, retention_days=ARCHIVE_RETENTION_DAYS):
+    query = archivable_query(retention_days)
+    return {name: db[name].count_documents(query) for name in ARCHIVED_COLLECTIONS}
+
+def archive_collection(db, collection_name, retention_days=ARCHIVE_RETENTION_DAYS,
+                       batch_size=ARCHIVE_BATCH_SIZE, on_batch=None):
+    """Move archivable documents of one collection to its archive; returns how many moved"""
+    hot = db[collection_name]
+    archive = db[archive_name(collection_name)]
+    query = archivable_query(retention_days)
+    moved = 0
+    while True:
+        batch = list(hot.find(query).sort('updated_at', 1).limit(batch_size))
+        if not batch:
+            return moved
+        archived_at = datetime.utcnow()
+        ids = [doc['_id'] for doc in batch]
+        archive.bulk_write([ReplaceOne({'_id': doc['_id']}, dict(doc, archived_at=archived_at), upsert=True)
+                            for doc in batch], ordered=False)
+        deleted = hot.delete_many({**query, '_id': {'$in': ids}}).deleted_count
+        if deleted < len(ids):
+            # Reopened between the copy and the delete: the hot copy stays authoritative
+            reopened = [doc['_id'] for doc in hot.find({'_id': {'$in': ids}}, {'_id': 1})]
+            archive.delete_many({'_id': {'$in': reopened}})
+        moved += deleted
+        if on_batch:
+            on_batch(collection_name, moved)
+        if len(batch) < batch_size:
+            return moved
+
+def archive_operations(db, retention_days=ARCHIVE_RETENTION_DAYS, batch_size=ARCHIVE_BATCH_SIZE, on_batch=None):
+    """Archive every operation collection; returns {collection: moved}"""
+    return {
+        name: archive_collection(db, name, retention_days, batch_size, on_batch)
+        for name in ARCHIVED_COLLECTIONS
+    }
+
+def find_operations(db, collection_name, include_archived=False):
+    """Documents of an operation collection, optionally followed by its archived ones"""
+    documents = list(db[collection_name].find())
+    if include_archived:
+        documents += list(db[archive_name(collection_name)].find())
+    return documents
@@ -0,0 +1,245 @@
+"""
+Firebase ID token verification with a bounded cache of decoded tokens
+
+Signatures are checked with google-auth against Google's published
+certificates, fetched through this module's own HTTP cache so a background
+thread can revalidate them before they expire and requests never wait for the
+fetch. The claim checks mirror firebase_admin.auth.verify_id_token.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, jsonify
+
+# Cache and refresh settings
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+CERT_REFRESH_SECONDS = int(os.getenv('TOKEN_CERT_REFRESH_SECONDS', 1800))
+REVOCATION_CHECK_SECONDS = int(os.getenv('TOKEN_REVOCATION_CHECK_SECONDS', 0))  # 0 disables the check
+
+# Google publishes the signing certificates for Firebase ID tokens here
+ID_TOKEN_CERT_URI = ('https://www.googleapis.com/robot/v1/metadata/x509/'
+                     'securetoken@system.gserviceaccount.com')
+ID_TOKEN_ISSUER_PREFIX = 'https://securetoken.google.com/'
+
+class TokenVerifier:
+    """Verify Firebase ID tokens, caching decoded claims until the token expires"""
+
+    def __init__(self, max_size=TOKEN_CACHE_SIZE, cert_refresh_seconds=CERT_REFRESH_SECONDS,
+                 revocation_check_seconds=REVOCATION_CHECK_SECONDS):
+        self.max_size = max_size
+        self.cert_refresh_seconds = cert_refresh_seconds
+        self.revocation_check_seconds = revocation_check_seconds
+        self._cache = OrderedDict()  # token hash -> [decoded_token, exp, last_revocation_check]
+        self._lock = threading.Lock()
+        self._cert_request = None
+        self._cert_request_pid = None
+        self._refresher = None
+        self._refresher_pid = None
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'failures': 0,
+            'revocation_checks': 0,
+            'verifications': 0,
+            'verify_time_total_ms': 0.0,
+            'verify_time_max_ms': 0.0
+        }
+
+    def verify(self, token):
+        """Return the decoded token, raising if it is invalid, expired or revoked"""
+        self._ensure_cert_refresher()
+        key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        now = time.time()
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and entry[1] > now:
+                self._cache.move_to_end(key)
+                self._stats['hits'] += 1
+            else:
+                if entry:
+                    del self._cache[key]
+                entry = None
+                self._stats['misses'] += 1
+
+        if entry:
+            if self.revocation_check_seconds and now - entry[2] >= self.revocation_check_seconds:
+                self._check_revoked(entry[0])
+                entry[2] = now
+            return entry[0]
+
+        started = time.perf_counter()
+        try:
+            decoded_token = self._verify_token(token)
+            if self.revocation_check_seconds:
+                self._check_revoked(decoded_token)
+        except Exception:
+            with self._lock:
+                self._stats['failures'] += 1
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            self._stats['verifications'] += 1
+            self._stats['verify_time_total_ms'] += elapsed_ms
+            self._stats['verify_time_max_ms'] = max(self._stats['verify_time_max_ms'], elapsed_ms)
+            self._cache[key] = [decoded_token, decoded_token.get('exp', 0), now]
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+        return decoded_token
+
+    def _verify_token(self, token):
+        """Check a token's signature and claims, returning its claims with `uid` set"""
+        from firebase_admin import auth as firebase_auth
+        from google.oauth2 import id_token
+        from utils.firebase import get_firebase_app
+
+        # Make sure the default Firebase app exists (it is initialized lazily)
+        app = get_firebase_app()
+        if os.getenv('FIREBASE_AUTH_EMULATOR_HOST'):
+            # Emulator tokens are unsigned; the SDK knows how to accept them
+            return firebase_auth.verify_id_token(token, app=app)
+
+        project_id = app.project_id
+        if not project_id:
+            raise ValueError('Firebase project id is not configured; cannot verify ID tokens')
+        claims = id_token.verify_firebase_token(token, self._get_cert_request(), audience=project_id)
+        if claims.get('iss') != ID_TOKEN_ISSUER_PREFIX + project_id:
+            raise firebase_auth.InvalidIdTokenError('Firebase ID token has an incorrect "iss" (issuer) claim')
+        subject = claims.get('sub')
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise firebase_auth.InvalidIdTokenError('Firebase ID token has an invalid "sub" (subject) claim')
+        claims['uid'] = subject
+        return claims
+
+    def _get_cert_request(self):
+        """google-auth transport whose session caches certificates per their Cache-Control headers"""
+        if self._cert_request_pid != os.getpid():
+            with self._lock:
+                if self._cert_request_pid != os.getpid():
+                    import cachecontrol
+                    import requests
+                    from google.auth.transport.requests import Request
+                    self._cert_request = Request(session=cachecontrol.CacheControl(requests.Session()))
+                    self._cert_request_pid = os.getpid()
+        return self._cert_request
+
+    def _ensure_cert_refresher(self):
+        """Start the certificate refresh thread once per process (after any fork)"""
+        if not self.cert_refresh_seconds or self._refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+            self._refresher = threading.Thread(target=self._refresh_certs_loop,
+                                               name='token-cert-refresh', daemon=True)
+            self._refresher.start()
+
+    def _refresh_certs_loop(self):
+        while True:
+            time.sleep(self.cert_refresh_seconds)
+            self.refresh_certs()
+
+    def refresh_certs(self):
+        """Re-fetch the public certificates into the verifier's HTTP cache, off the request path"""
+        try:
+            # no-cache skips the cached copy; the fresh response replaces it
+            response = self._get_cert_request()(ID_TOKEN_CERT_URI, method='GET',
+                                                headers={'Cache-Control': 'no-cache'})
+            if response.status != 200:
+                raise RuntimeError(f'HTTP {response.status}')
+            return True
+        except Exception as e:
+            print(f"⚠️  Failed to refresh Firebase public certificates: {str(e)}")
+            return False
+
+    def _check_revoked(self, decoded_token):
+        """Re-check a cached token against the user record"""
+        from firebase_admin import auth as firebase_auth
+
+        with self._lock:
+            self._stats['revocation_checks'] += 1
+        user = firebase_auth.get_user(decoded_token['uid'])
+        if user.disabled:
+            self.invalidate_user(decoded_token['uid'])
+            raise firebase_auth.UserDisabledError('The user record is disabled.')
+        if decoded_token.get('iat', 0) * 1000 < (user.tokens_valid_after_timestamp or 0):
+            self.invalidate_user(decoded_token['uid'])
+            raise firebase_auth.RevokedIdTokenError('The Firebase ID token has been revoked.')
+
+    def invalidate_user(self, uid):
+        """Drop every cached token belonging to a user"""
+        with self._lock:
+            for key in [k for k, entry in self._cache.items() if entry[0].get('uid') == uid]:
+                del self._cache[key]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        """Return hit-rate and verification-latency metrics"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached_tokens'] = len(self._cache)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['verify_time_avg_ms'] = (
+            round(stats['verify_time_total_ms'] / stats['verifications'], 3)
+            if stats['verifications'] else 0.0
+        )
+        return stats
+
+token_verifier = TokenVerifier()
+
+def get_bearer_token(req):
+    """Extract the token from an "Authorization: Bearer <token>" header"""
+    auth_header = req.headers.get('Authorization')
+    if not auth_header:
+        return None, 'No authorization header'
+
+    if not auth_header.startswith('Bearer '):
+        return None, 'Invalid authorization header format'
+
+    return auth_header.split(' ')[1], None
+
+# Claims of a token the enclosing /api/batch request already verified. Only
+# set on in-process sub-requests; clients cannot put keys in the WSGI environ.
+VERIFIED_USER_ENVIRON = 'stockmaster.verified_user'
+
+def verify_request(req):
+    """Verify the Firebase ID token on a request, returning (decoded_token, error)"""
+    try:
+        if req.environ.get(VERIFIED_USER_ENVIRON):
+            return req.environ[VERIFIED_USER_ENVIRON], None
+
+        token, error = get_bearer_token(req)
+        if error:
+            return None, error
+
+        return token_verifier.verify(token), None
+
+    except Exception as e:
+        return None, f'Token verification failed: {str(e)}'
+
+def require_auth(f):
+    """Require a valid Firebase ID token and expose its claims as request.user"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        # Authentication is bypassed in development mode
+        if os.getenv('FLASK_ENV') == 'development':
+            return f(*args, **kwargs)
+
+        decoded_token, error = verify_request(request)
+        if error:
+            return jsonify({'error': f'Authentication required: {error}'}), 401
+
+        request.user = decoded_token
+        return f(*args, **kwargs)
+    return decorated
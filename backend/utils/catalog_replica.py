@@ -0,0 +1,316 @@
+"""
+In-process replica of the product catalog
+
+With CATALOG_REPLICA=1 each worker keeps every product in memory and serves
+list, filter, get-by-id and SKU lookups from it. The replica loads the
+collection once and then follows a change source:
+
+- MongoDB: a change stream on `products` (full documents, resumed from the
+  last resume token after errors; reloaded if the token has expired)
+- Firestore: an on_snapshot listener on `products` (see app_firebase.py)
+
+A change source is any object with try_next() -> event or None (None meaning
+"caught up with every change so far"), a resume_token attribute and close();
+events look like change stream events ({'operationType', 'documentKey',
+'fullDocument'}), so tests and benchmarks can inject their own. Until the first load completes, or when the
+replica is further behind than CATALOG_REPLICA_MAX_STALENESS_SECONDS, callers
+fall back to the database.
+"""
+
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+from prometheus_client import Counter, Gauge
+
+CATALOG_REPLICA = os.getenv('CATALOG_REPLICA', '0') == '1'
+CATALOG_REPLICA_MAX_STALENESS_SECONDS = float(os.getenv('CATALOG_REPLICA_MAX_STALENESS_SECONDS', 30))
+
+REPLICA_STALENESS = Gauge(
+    'stockmaster_catalog_replica_staleness_seconds', 'Seconds since the catalog replica was last known current',
+    multiprocess_mode='max'
+)
+REPLICA_PRODUCTS = Gauge(
+    'stockmaster_catalog_replica_products', 'Products held by the catalog replica',
+    multiprocess_mode='max'
+)
+REPLICA_EVENTS = Counter(
+    'stockmaster_catalog_replica_events_total', 'Change events applied to the catalog replica', ['operation']
+)
+REPLICA_RELOADS = Counter(
+    'stockmaster_catalog_replica_reloads_total', 'Full reloads of the catalog replica'
+)
+
+INDEXED_FIELDS = ('category', 'status', 'location')
+
+class CatalogReplica:
+    """Products kept in memory and current through a change source"""
+
+    def __init__(self, load, open_source, key='_id', max_staleness=CATALOG_REPLICA_MAX_STALENESS_SECONDS,
+                 retry_seconds=1.0):
+        # load() -> iterable of documents; open_source(resume_token) -> change source
+        self._load = load
+        self._open_source = open_source
+        self.key = key
+        self.max_staleness = max_staleness
+        self.retry_seconds = retry_seconds
+        self._products = {}
+        self._by_sku = {}
+        self._by_field = {field: {} for field in INDEXED_FIELDS}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+        self._stopped = threading.Event()
+        self._synced_at = None
+        self._stats = {'events': 0, 'reloads': 0, 'resumes': 0, 'errors': 0, 'last_error': None}
+
+    # Lifecycle
+
+    def start(self):
+        """Start following changes once per process (after any fork)"""
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._follow, name='catalog-replica', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def wait_ready(self, timeout=None):
+        deadline = time.monotonic() + timeout if timeout else None
+        while not self.is_ready():
+            if deadline and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def is_ready(self):
+        """True when the replica is loaded and within the staleness bound"""
+        staleness = self.staleness()
+        return staleness is not None and staleness <= self.max_staleness
+
+    def staleness(self):
+        if self._synced_at is None:
+            return None
+        return max(time.monotonic() - self._synced_at, 0.0)
+
+    def _follow(self):
+        resume_token = None
+        delay = self.retry_seconds
+        while not self._stopped.is_set():
+            source = None
+            try:
+                # Open the source before loading so no change falls between the two
+                source = self._open_source(resume_token)
+                if resume_token is None:
+                    self._reload()
+                else:
+                    self._stats['resumes'] += 1
+
+                delay = self.retry_seconds
+                # After a reload the first events may still be filling the catalog
+                # (Firestore's initial snapshot), so only an idle source counts at first
+                caught_up = resume_token is not None
+                while not self._stopped.is_set():
+                    event = source.try_next()
+                    if event is None:
+                        caught_up = True
+                        self._mark_synced()
+                    else:
+                        self.apply(event)
+                        if caught_up:
+                            self._mark_synced(event.get('wallTime'))
+                    resume_token = source.resume_token or resume_token
+            except Exception as e:
+                self._stats['errors'] += 1
+                self._stats['last_error'] = str(e)
+                if _is_history_lost(e):
+                    # The resume token fell off the oplog; start over from a full load
+                    resume_token = None
+                REPLICA_STALENESS.set(self.staleness() or 0)
+                print(f"⚠️  Catalog replica lost its change source, retrying in {delay:.0f}s: {str(e)}")
+                self._stopped.wait(delay)
+                delay = min(delay * 2, 60)
+            finally:
+                if source is not None:
+                    try:
+                        source.close()
+                    except Exception:
+                        pass
+
+    def _reload(self):
+        products = {}
+        for doc in self._load():
+            products[str(doc[self.key])] = doc
+        with self._lock:
+            # Not ready again until the change source has caught up with the reload
+            self._synced_at = None
+            self._products = {}
+            self._by_sku = {}
+            self._by_field = {field: {} for field in INDEXED_FIELDS}
+            for key, doc in products.items():
+                self._put(key, doc)
+        self._stats['reloads'] += 1
+        REPLICA_RELOADS.inc()
+
+    def _mark_synced(self, wall_time=None):
+        """Record that the replica is current, or as current as an applied event's wallTime"""
+        lag = 0.0
+        if wall_time is not None:
+            lag = max((datetime.utcnow() - wall_time.replace(tzinfo=None)).total_seconds(), 0.0)
+        self._synced_at = time.monotonic() - lag
+        REPLICA_STALENESS.set(lag)
+        REPLICA_PRODUCTS.set(len(self._products))
+
+    # Applying changes
+
+    def apply(self, event):
+        """Apply one change event"""
+        operation = event.get('operationType')
+        key = str(event['documentKey'][self.key])
+        with self._lock:
+            previous = self._products.get(key)
+            if previous is not None:
+                self._unindex(key, previous)
+            if operation != 'delete' and event.get('fullDocument') is not None:
+                # Replacing in place keeps the product's position in listings
+                self._put(key, event['fullDocument'])
+            elif previous is not None:
+                del self._products[key]
+        self._stats['events'] += 1
+        REPLICA_EVENTS.labels(operation or 'unknown').inc()
+
+    def _put(self, key, doc):
+        self._products[key] = doc
+        if doc.get('sku'):
+            self._by_sku[doc['sku']] = key
+        for field in INDEXED_FIELDS:
+            self._by_field[field].setdefault(doc.get(field), set()).add(key)
+
+    def _unindex(self, key, doc):
+        if self._by_sku.get(doc.get('sku')) == key:
+            del self._by_sku[doc['sku']]
+        for field in INDEXED_FIELDS:
+            keys = self._by_field[field].get(doc.get(field))
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._by_field[field][doc.get(field)]
+
+    # Reads
+
+    def find(self, search=None, **filters):
+        """Products matching equality filters on category/status/location and an
+        optional case-insensitive search over name, SKU and category"""
+        with self._lock:
+            keys = None
+            for field, value in filters.items():
+                if not value:
+                    continue
+                matching = self._by_field[field].get(value, set())
+                keys = matching if keys is None else keys & matching
+            if keys is None:
+                docs = list(self._products.values())
+            else:
+                # Keep collection order, as the database query would
+                docs = [doc for key, doc in self._products.items() if key in keys]
+
+        if search:
+            pattern = re.compile(search, re.IGNORECASE)
+            docs = [doc for doc in docs if any(pattern.search(str(doc.get(field) or ''))
+                                               for field in ('name', 'sku', 'category'))]
+        return docs
+
+    def get(self, key):
+        with self._lock:
+            return self._products.get(str(key))
+
+    def get_by_sku(self, sku):
+        with self._lock:
+            key = self._by_sku.get(sku)
+            return self._products.get(key) if key else None
+
+    def distinct(self, field):
+        with self._lock:
+            return [value for value in self._by_field[field] if value is not None]
+
+    def stats(self):
+        staleness = self.staleness()
+        REPLICA_STALENESS.set(staleness or 0)
+        return dict(self._stats, products=len(self._products), ready=self.is_ready(),
+                    staleness_seconds=round(staleness, 3) if staleness is not None else None,
+                    max_staleness_seconds=self.max_staleness)
+
+def _is_history_lost(error):
+    try:
+        from pymongo.errors import OperationFailure
+    except ImportError:
+        return False
+    # ChangeStreamHistoryLost / ChangeStreamFatalError
+    return isinstance(error, OperationFailure) and error.code in (280, 286)
+
+def mongo_catalog_replica(get_db, **kwargs):
+    """Catalog replica following the `products` collection through a change stream"""
+    def load():
+        return get_db().products.find()
+
+    def open_source(resume_token):
+        return get_db().products.watch(full_document='updateLookup', resume_after=resume_token,
+                                       max_await_time_ms=1000)
+
+    return CatalogReplica(load, open_source, **kwargs)
+
+class FirestoreSnapshotSource:
+    """Change source backed by a Firestore on_snapshot listener
+
+    The listener's first snapshot delivers every document as ADDED, so the
+    replica built on it needs no separate load; try_next() waits for that
+    snapshot before it ever reports being caught up. Firestore listeners
+    resume by themselves, so resume_token stays None.
+    """
+
+    CHANGE_TYPES = {'ADDED': 'insert', 'MODIFIED': 'replace', 'REMOVED': 'delete'}
+
+    def __init__(self, collection_ref, to_dict, poll_seconds=1.0, first_snapshot_timeout=30):
+        self.resume_token = None
+        self.poll_seconds = poll_seconds
+        self.first_snapshot_timeout = first_snapshot_timeout
+        self._to_dict = to_dict
+        self._events = queue.Queue()
+        self._first_snapshot = threading.Event()
+        self._watch = collection_ref.on_snapshot(self._on_snapshot)
+
+    def _on_snapshot(self, docs, changes, read_time):
+        for change in changes:
+            operation = self.CHANGE_TYPES.get(change.type.name, 'replace')
+            self._events.put({
+                'operationType': operation,
+                'documentKey': {'id': change.document.id},
+                'fullDocument': None if operation == 'delete' else self._to_dict(change.document)
+            })
+        self._first_snapshot.set()
+
+    def try_next(self):
+        if not self._first_snapshot.wait(self.first_snapshot_timeout):
+            raise TimeoutError('No snapshot received from the Firestore products listener')
+        try:
+            return self._events.get(timeout=self.poll_seconds)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._watch.unsubscribe()
+
+def firestore_catalog_replica(get_firestore, to_dict, **kwargs):
+    """Catalog replica following the Firestore `products` collection"""
+    def open_source(resume_token):
+        return FirestoreSnapshotSource(get_firestore().collection('products'), to_dict)
+
+    return CatalogReplica(lambda: [], open_source, key='id', **kwargs)
@@ -0,0 +1,250 @@
+"""
+Shared change feed behind the /api/stream Server-Sent Events endpoint
+
+Each worker runs at most one database watcher, however many clients are
+connected; it starts with the first subscriber and stops when the last one
+leaves. Changes to products and operations are turned into messages and
+fanned out to every subscriber's bounded queue:
+
+- stats: dashboard counters that changed, as deltas plus the new values
+  (recomputed at most once per STREAM_STATS_INTERVAL_SECONDS)
+- low_stock: a product was created or changed while Low Stock / Out of Stock
+- operation: a receipt, delivery, transfer or adjustment was created, deleted
+  or changed status
+
+A subscriber that falls STREAM_QUEUE_SIZE messages behind is dropped and gets
+a reset message, so one slow client cannot hold memory for the others. The
+change source follows the same try_next()/resume_token/close() protocol as the
+catalog replica, so it can be replaced in tests and benchmarks.
+"""
+
+import os
+import queue
+import threading
+import time
+from prometheus_client import Counter, Gauge
+
+STREAM_QUEUE_SIZE = int(os.getenv('STREAM_QUEUE_SIZE', 256))
+STREAM_STATS_INTERVAL_SECONDS = float(os.getenv('STREAM_STATS_INTERVAL_SECONDS', 1))
+
+OPERATION_COLLECTIONS = {'receipts': 'receipt', 'deliveries': 'delivery',
+                         'transfers': 'transfer', 'adjustments': 'adjustment'}
+WATCHED_COLLECTIONS = ['products'] + list(OPERATION_COLLECTIONS)
+LOW_STOCK_STATUSES = ('Low Stock', 'Out of Stock')
+
+STREAM_SUBSCRIBERS = Gauge(
+    'stockmaster_stream_subscribers', 'Open /api/stream connections', multiprocess_mode='livesum'
+)
+STREAM_MESSAGES = Counter(
+    'stockmaster_stream_messages_total', 'Messages published to /api/stream subscribers', ['event']
+)
+STREAM_DROPPED = Counter(
+    'stockmaster_stream_dropped_subscribers_total', 'Subscribers dropped for falling behind'
+)
+
+# Last message a dropped subscriber gets; the stream ends after it
+RESET = ('reset', {'reason': 'client fell behind'})
+
+class Subscription:
+    def __init__(self, size):
+        self.queue = queue.Queue(maxsize=size)
+        self.overflowed = False
+
+    def reset(self):
+        """Discard the backlog and queue RESET so the reader stops straight away"""
+        self.overflowed = True
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        # The feed thread is the only writer, so the emptied queue has room
+        self.queue.put_nowait(RESET)
+
+    def get(self, timeout):
+        """Next (event, data) message, or None after `timeout` seconds"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class ChangeFeed:
+    """One change source per process, fanned out to many subscribers"""
+
+    def __init__(self, open_source, compute_stats, queue_size=STREAM_QUEUE_SIZE,
+                 stats_interval=STREAM_STATS_INTERVAL_SECONDS, retry_seconds=1.0):
+        # open_source(resume_token) -> change source; compute_stats() -> nested dict of counters
+        self._open_source = open_source
+        self._compute_stats = compute_stats
+        self.queue_size = queue_size
+        self.stats_interval = stats_interval
+        self.retry_seconds = retry_seconds
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread_pid = None
+        self._stopped = threading.Event()
+        self._stats = None
+        self._stats_dirty = True
+        self._stats_computed_at = 0.0
+
+    def subscribe(self):
+        subscription = Subscription(self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+            self._start()
+        STREAM_SUBSCRIBERS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription not in self._subscribers:
+                return
+            self._subscribers.discard(subscription)
+            if not self._subscribers:
+                # Nobody is listening: close the change stream until the next subscriber
+                self._stop()
+        STREAM_SUBSCRIBERS.dec()
+
+    def current_stats(self):
+        return self._stats
+
+    def publish(self, event, data):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait((event, data))
+            except queue.Full:
+                self.unsubscribe(subscription)
+                subscription.reset()
+                STREAM_DROPPED.inc()
+        STREAM_MESSAGES.labels(event).inc()
+
+    def stop(self):
+        """Stop the watcher; the next subscriber starts a new one"""
+        with self._lock:
+            self._stop()
+
+    def _stop(self):
+        self._stopped.set()
+        self._thread_pid = None
+
+    def _start(self):
+        """Start the watcher once per process (after any fork); called with the lock held"""
+        if self._thread_pid == os.getpid():
+            return
+        self._thread_pid = os.getpid()
+        # Each watcher gets its own event so a stopping one cannot be revived by a restart
+        self._stopped = threading.Event()
+        threading.Thread(target=self._follow, args=(self._stopped,), name='change-feed', daemon=True).start()
+
+    def _follow(self, stopped):
+        resume_token = None
+        delay = self.retry_seconds
+        while not stopped.is_set():
+            source = None
+            try:
+                source = self._open_source(resume_token)
+                # Counters may have moved while we were not watching
+                self._stats_dirty = True
+                delay = self.retry_seconds
+                while not stopped.is_set():
+                    event = source.try_next()
+                    if event is not None and not stopped.is_set():
+                        self.handle(event)
+                    resume_token = source.resume_token or resume_token
+                    self._refresh_stats()
+            except Exception as e:
+                if _is_history_lost(e):
+                    resume_token = None
+                print(f"⚠️  Change feed lost its change source, retrying in {delay:.0f}s: {str(e)}")
+                stopped.wait(delay)
+                delay = min(delay * 2, 60)
+            finally:
+                if source is not None:
+                    try:
+                        source.close()
+                    except Exception:
+                        pass
+
+    def handle(self, change):
+        """Turn one change event into stream messages"""
+        collection = change.get('ns', {}).get('coll')
+        operation = change.get('operationType')
+        doc = change.get('fullDocument') or {}
+        updated = (change.get('updateDescription') or {}).get('updatedFields', {})
+        key = str(change.get('documentKey', {}).get('_id'))
+
+        if collection not in WATCHED_COLLECTIONS:
+            return
+        self._stats_dirty = True
+
+        if collection == 'products':
+            touched = operation in ('insert', 'replace') or 'stock' in updated or 'status' in updated
+            if touched and doc.get('status') in LOW_STOCK_STATUSES:
+                self.publish('low_stock', {
+                    'product_id': key,
+                    'name': doc.get('name'),
+                    'sku': doc.get('sku'),
+                    'stock': doc.get('stock'),
+                    'reorder_level': doc.get('reorder_level'),
+                    'status': doc.get('status'),
+                    'location': doc.get('location')
+                })
+            return
+
+        kind = OPERATION_COLLECTIONS[collection]
+        if operation in ('insert', 'replace', 'delete') or 'status' in updated:
+            self.publish('operation', {
+                'id': key,
+                'type': kind,
+                'reference': doc.get(f'{kind}_id'),
+                'status': doc.get('status'),
+                'change': operation
+            })
+
+    def _refresh_stats(self):
+        now = time.monotonic()
+        if not self._stats_dirty or now - self._stats_computed_at < self.stats_interval:
+            return
+        self._stats_computed_at = now
+        try:
+            stats = self._compute_stats()
+        except Exception as e:
+            print(f"⚠️  Change feed could not compute dashboard stats: {str(e)}")
+            return
+        self._stats_dirty = False
+
+        first = self._stats is None
+        deltas = {} if first else stats_deltas(self._stats, stats)
+        self._stats = stats
+        if first or deltas:
+            self.publish('stats', {'deltas': deltas, 'stats': stats})
+
+def stats_deltas(old, new, prefix=''):
+    """Changed numeric counters as {'products.low_stock': +2, ...}"""
+    deltas = {}
+    for key, value in new.items():
+        path = f'{prefix}{key}'
+        previous = old.get(key) if isinstance(old, dict) else None
+        if isinstance(value, dict):
+            deltas.update(stats_deltas(previous or {}, value, f'{path}.'))
+        elif isinstance(value, (int, float)) and value != (previous or 0):
+            deltas[path] = value - (previous or 0)
+    return deltas
+
+def _is_history_lost(error):
+    try:
+        from pymongo.errors import OperationFailure
+    except ImportError:
+        return False
+    return isinstance(error, OperationFailure) and error.code in (280, 286)
+
+def mongo_change_feed(get_db, compute_stats):
+    """Change feed over one database-level change stream on the watched collections"""
+    def open_source(resume_token):
+        pipeline = [{'$match': {'ns.coll': {'$in': WATCHED_COLLECTIONS}}}]
+        return get_db().watch(pipeline, full_document='updateLookup', resume_after=resume_token,
+                              max_await_time_ms=1000)
+
+    return ChangeFeed(open_source, lambda: compute_stats(get_db()))
@@ -0,0 +1,94 @@
+"""
+Run independent database calls in parallel within one request
+"""
+
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+QUERY_POOL_SIZE = int(os.getenv('QUERY_POOL_SIZE', 16))
+REQUEST_DEADLINE_SECONDS = float(os.getenv('REQUEST_DEADLINE_SECONDS', 10))
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when parallel calls do not finish before the request deadline"""
+
+def get_executor():
+    """Return the shared bounded thread pool, creating it once per process"""
+    global _executor, _executor_pid
+    if _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=QUERY_POOL_SIZE,
+                                               thread_name_prefix='query-fan-out')
+                _executor_pid = os.getpid()
+    return _executor
+
+def init_deadline(app):
+    """Start each request's deadline when the request starts, before any other hook"""
+    from flask import g
+
+    @app.before_request
+    def start_request_deadline():
+        g.deadline = time.monotonic() + REQUEST_DEADLINE_SECONDS
+
+def request_deadline():
+    """Return the monotonic deadline of the current request (set by init_deadline)"""
+    from flask import g, has_request_context
+
+    if has_request_context() and 'deadline' in g:
+        return g.deadline
+    # Outside a request, or an app without init_deadline: the budget starts now
+    return time.monotonic() + REQUEST_DEADLINE_SECONDS
+
+def _call_with_deadline(fn, deadline):
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded('Request deadline exceeded before the query started')
+
+    try:
+        import pymongo
+    except ImportError:
+        return fn()
+
+    # Client-side operation timeout: pymongo aborts Mongo calls past the deadline
+    with pymongo.timeout(remaining):
+        return fn()
+
+def run_parallel(deadline=None, **calls):
+    """Run independent callables concurrently and return their results by name
+
+        counts = run_parallel(
+            total=lambda: db.products.count_documents({}),
+            low=lambda: db.products.count_documents({'status': 'Low Stock'})
+        )
+
+    Every call shares the request deadline; the first exception is re-raised.
+    """
+    deadline = deadline or request_deadline()
+    executor = get_executor()
+
+    # Each call gets its own copy of the context so Flask's request and g stay visible
+    futures = {
+        name: executor.submit(contextvars.copy_context().run, _call_with_deadline, fn, deadline)
+        for name, fn in calls.items()
+    }
+
+    done, pending = wait(futures.values(), timeout=max(deadline - time.monotonic(), 0),
+                         return_when=FIRST_EXCEPTION)
+    for future in done:
+        if future.exception():
+            for other in pending:
+                other.cancel()
+            raise future.exception()
+    if pending:
+        for future in pending:
+            future.cancel()
+        raise DeadlineExceeded(f'{len(pending)} of {len(futures)} queries did not finish before the deadline')
+
+    return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,110 @@
+"""
+Shared, lazily created MongoDB client
+
+The client is only created on first use and is recreated in each process, so
+it is never shared across gunicorn forks.
+
+Reads are routed by request: GETs of the analytics routes in
+SECONDARY_READ_PREFIXES (dashboard aggregates, chart data, exports, reports)
+read secondaryPreferred, at most MONGO_MAX_STALENESS_SECONDS behind the
+primary, so they do not compete with stock postings. Every other request,
+including all writes and the read-your-writes paths (listings, product pages,
+recent operations), uses the primary. Code outside a request gets the primary
+unless it asks for analytics_read_preference().
+"""
+
+import os
+import threading
+from contextlib import nullcontext
+from flask import has_request_context, request
+
+# Secondaries further behind than this are not read from (MongoDB's minimum is 90)
+MONGO_MAX_STALENESS_SECONDS = int(os.getenv('MONGO_MAX_STALENESS_SECONDS', 90))
+READ_PREFERENCE_ROUTING = os.getenv('READ_PREFERENCE_ROUTING', '1') != '0'
+
+# GET routes whose reads may come from a slightly stale secondary
+SECONDARY_READ_PREFIXES = (
+    '/api/dashboard/stats',
+    '/api/dashboard/chart-data',
+    '/api/dashboard/low-stock',
+    '/api/dashboard/performance',
+    '/api/operations/movements/export.',
+    '/api/reports/'
+)
+
+_settings = {}
+_event_listeners = []
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+def configure(uri=None, db_name=None):
+    """Override the connection settings taken from MONGO_URI / MONGO_DB_NAME"""
+    global _client_pid
+    if uri:
+        _settings['uri'] = uri
+    if db_name:
+        _settings['db_name'] = db_name
+    # Force a new client on next use
+    _client_pid = None
+
+def add_event_listener(listener):
+    """Register a pymongo monitoring listener for clients created from now on"""
+    global _client_pid
+    if listener not in _event_listeners:
+        _event_listeners.append(listener)
+        _client_pid = None
+
+def get_uri():
+    return _settings.get('uri') or os.getenv('MONGO_URI')
+
+def get_db_name():
+    return _settings.get('db_name') or os.getenv('MONGO_DB_NAME', 'stockmaster')
+
+def get_client():
+    """Return this process's MongoClient, creating it on first use"""
+    global _client, _client_pid
+    if _client_pid != os.getpid():
+        with _client_lock:
+            if _client_pid != os.getpid():
+                from pymongo import MongoClient
+                _client = MongoClient(get_uri(), connect=False,
+                                      event_listeners=list(_event_listeners))
+                _client_pid = os.getpid()
+    return _client
+
+def analytics_read_preference():
+    from pymongo.read_preferences import SecondaryPreferred
+    return SecondaryPreferred(max_staleness=MONGO_MAX_STALENESS_SECONDS)
+
+def route_read_preference(method, path):
+    """Read preference for a request; None keeps the client's default"""
+    if not READ_PREFERENCE_ROUTING:
+        return None
+    if method in ('GET', 'HEAD') and path.startswith(SECONDARY_READ_PREFIXES):
+        return analytics_read_preference()
+    from pymongo.read_preferences import Primary
+    return Primary()
+
+def get_db(read_preference=None):
+    """The application database, read with the current route's read preference"""
+    if read_preference is None and has_request_context():
+        read_preference = route_read_preference(request.method, request.path)
+    if read_preference is None:
+        return get_client()[get_db_name()]
+    return get_client().get_database(get_db_name(), read_preference=read_preference)
+
+def causal_session(client=None):
+    """Context manager for a causally consistent session (None where sessions are unsupported)
+
+    Reads in the session, on any member, see every write whose operation time
+    was passed to session.advance_operation_time().
+    """
+    try:
+        return (client or get_client()).start_session(causal_consistency=True)
+    except NotImplementedError:
+        # mongomock
+        return nullcontext()
+
+def is_initialized():
+    return _client is not None and _client_pid == os.getpid()
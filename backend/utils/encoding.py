@@ -0,0 +1,115 @@
+"""
+Negotiated response encodings
+
+Every jsonify() response can be sent in a more compact form when the client
+asks for it with the Accept header (or ?format=):
+
+    application/json                                  default
+    application/msgpack                               ?format=msgpack
+    application/vnd.stockmaster.columnar+json         ?format=columnar
+    application/vnd.stockmaster.columnar+msgpack      ?format=columnar-msgpack
+
+The columnar layouts replace each list of objects in the payload with
+{"columns": {field: [values...]}, "count": n}, so keys are sent once per page
+instead of once per row. Independently, bodies of at least COMPRESS_MIN_BYTES
+are compressed with brotli or gzip according to Accept-Encoding.
+"""
+
+import gzip
+import os
+import brotli
+import msgpack
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1400))
+COMPRESS_LEVEL = {'br': 5, 'gzip': 6}
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+COLUMNAR_JSON = 'application/vnd.stockmaster.columnar+json'
+COLUMNAR_MSGPACK = 'application/vnd.stockmaster.columnar+msgpack'
+
+MEDIA_TYPES = [JSON, MSGPACK, COLUMNAR_JSON, COLUMNAR_MSGPACK]
+FORMATS = {'json': JSON, 'msgpack': MSGPACK, 'columnar': COLUMNAR_JSON, 'columnar-msgpack': COLUMNAR_MSGPACK}
+
+def to_columnar(value):
+    """Turn every list of objects in a payload into a column-per-field table"""
+    if isinstance(value, dict):
+        return {key: to_columnar(v) for key, v in value.items()}
+    if isinstance(value, list) and value and all(isinstance(row, dict) for row in value):
+        fields = []
+        for row in value:
+            for key in row:
+                if key not in fields:
+                    fields.append(key)
+        return {
+            'columns': {field: [to_columnar(row.get(field)) for row in value] for field in fields},
+            'count': len(value)
+        }
+    if isinstance(value, list):
+        return [to_columnar(v) for v in value]
+    return value
+
+def negotiated_media_type():
+    requested = request.args.get('format')
+    if requested in FORMATS:
+        return FORMATS[requested]
+    return request.accept_mimetypes.best_match(MEDIA_TYPES, default=JSON) or JSON
+
+class NegotiatingJSONProvider(DefaultJSONProvider):
+    """jsonify() that honours the negotiated media type"""
+
+    def response(self, *args, **kwargs):
+        media_type = negotiated_media_type() if request else JSON
+        if media_type == JSON:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        if media_type in (COLUMNAR_JSON, COLUMNAR_MSGPACK):
+            obj = to_columnar(obj)
+
+        if media_type == COLUMNAR_JSON:
+            body = f"{self.dumps(obj, separators=(',', ':'))}\n"
+        else:
+            # Same value conversions as JSON (dates, UUIDs, decimals) so both decode alike
+            body = msgpack.packb(obj, default=self.default, use_bin_type=True)
+
+        return self._app.response_class(body, mimetype=media_type)
+
+def choose_encoding():
+    """Best supported content coding the client accepts, preferring brotli"""
+    accepted = request.accept_encodings
+    quality = {coding: accepted.quality(coding) for coding in COMPRESS_LEVEL}
+    best = max(quality, key=lambda coding: (quality[coding], coding == 'br'))
+    return best if quality[best] > 0 else None
+
+def compress(body, coding):
+    if coding == 'br':
+        return brotli.compress(body, quality=COMPRESS_LEVEL['br'])
+    return gzip.compress(body, compresslevel=COMPRESS_LEVEL['gzip'])
+
+def init_encoding(app):
+    """Install negotiated encodings and response compression on an app"""
+    app.json = NegotiatingJSONProvider(app)
+
+    @app.after_request
+    def compress_response(response):
+        if response.direct_passthrough or response.is_streamed:
+            return response
+        if response.mimetype in MEDIA_TYPES:
+            # The same URL can come back as JSON or MessagePack
+            response.vary.add('Accept')
+        if response.status_code < 200 or response.status_code >= 300 or 'Content-Encoding' in response.headers:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_BYTES:
+            return response
+
+        coding = choose_encoding()
+        if coding:
+            response.set_data(compress(body, coding))
+            response.headers['Content-Encoding'] = coding
+        return response
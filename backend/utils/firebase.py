@@ -0,0 +1,66 @@
+"""
+Lazy Firebase Admin, Firestore and Storage initialization
+
+Nothing is imported or connected until first use, so importing the app stays
+fast and every gunicorn worker creates its own clients after the fork.
+"""
+
+import os
+import threading
+
+_clients = {}
+_clients_pid = None
+_clients_lock = threading.Lock()
+
+def _init():
+    """Initialize Firebase Admin and its clients once per process"""
+    global _clients, _clients_pid
+    if _clients_pid == os.getpid():
+        return _clients
+
+    with _clients_lock:
+        if _clients_pid == os.getpid():
+            return _clients
+
+        clients = {'app': None, 'firestore': None, 'bucket': None}
+        try:
+            import firebase_admin
+            from firebase_admin import firestore, storage
+
+            # Check if Firebase is already initialized
+            if not firebase_admin._apps:
+                # For development, we'll use the default project
+                # In production, use service account key
+                firebase_admin.initialize_app()
+            clients['app'] = firebase_admin.get_app()
+
+            # Get Firestore client
+            clients['firestore'] = firestore.client()
+
+            # Get Storage bucket
+            clients['bucket'] = storage.bucket()
+
+            print("✅ Successfully connected to Firebase:")
+            print("   🔥 Firestore Database")
+            print("   🔐 Firebase Authentication")
+            print("   💾 Firebase Storage")
+
+        except Exception as e:
+            print(f"❌ Failed to initialize Firebase: {str(e)}")
+            print("📝 Make sure Firebase project is configured and credentials are available")
+
+        _clients = clients
+        _clients_pid = os.getpid()
+        return _clients
+
+def get_firebase_app():
+    return _init()['app']
+
+def get_firestore():
+    return _init()['firestore']
+
+def get_bucket():
+    return _init()['bucket']
+
+def is_initialized():
+    return _clients_pid == os.getpid()
@@ -0,0 +1,84 @@
+"""
+Batched Firestore writes for seeding and bulk creation
+
+Documents are written in WriteBatch commits of up to 500 writes (Firestore's
+per-commit limit). Batches are committed concurrently on a small thread pool,
+and a batch rejected for quota or contention is retried with exponential
+backoff, so throughput is bounded by Firestore rather than by round trips.
+"""
+
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+FIRESTORE_BATCH_LIMIT = 500
+BULK_WRITE_CONCURRENCY = int(os.getenv('BULK_WRITE_CONCURRENCY', 4))
+BULK_WRITE_MAX_RETRIES = int(os.getenv('BULK_WRITE_MAX_RETRIES', 5))
+
+def _is_retryable(error):
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return False
+    return isinstance(error, (exceptions.ResourceExhausted, exceptions.Aborted, exceptions.DeadlineExceeded,
+                              exceptions.ServiceUnavailable, exceptions.InternalServerError))
+
+def _commit_with_backoff(db, writes, max_retries):
+    """Commit one batch of (document ref, data) writes, retrying transient failures
+
+    Returns (written, retries).
+    """
+    for attempt in range(max_retries + 1):
+        batch = db.batch()
+        for doc_ref, data in writes:
+            batch.set(doc_ref, data)
+        try:
+            batch.commit()
+            return len(writes), attempt
+        except Exception as e:
+            if attempt == max_retries or not _is_retryable(e):
+                raise
+            # Full jitter keeps concurrent batches from retrying in lockstep
+            time.sleep(random.uniform(0, min(0.5 * 2 ** attempt, 30)))
+
+def bulk_create(db, collection_name, docs, chunk_size=FIRESTORE_BATCH_LIMIT, concurrency=BULK_WRITE_CONCURRENCY,
+                max_retries=BULK_WRITE_MAX_RETRIES, progress=None):
+    """Create `docs` in `collection_name` with auto-generated ids
+
+    Returns (ids, stats); ids follow the order of `docs`. `progress` is called
+    as progress(written, total) after each committed batch.
+    """
+    chunk_size = min(chunk_size, FIRESTORE_BATCH_LIMIT)
+    collection = db.collection(collection_name)
+    # Ids are assigned client-side so a retried batch overwrites rather than duplicates
+    writes = [(collection.document(), doc) for doc in docs]
+    chunks = [writes[i:i + chunk_size] for i in range(0, len(writes), chunk_size)]
+
+    stats = {'written': 0, 'batches': len(chunks), 'retries': 0}
+    started = time.perf_counter()
+
+    if chunks:
+        with ThreadPoolExecutor(max_workers=max(min(concurrency, len(chunks)), 1),
+                                thread_name_prefix='firestore-bulk') as pool:
+            futures = [pool.submit(_commit_with_backoff, db, chunk, max_retries) for chunk in chunks]
+            try:
+                for future in as_completed(futures):
+                    written, retries = future.result()
+                    stats['written'] += written
+                    stats['retries'] += retries
+                    if progress:
+                        progress(stats['written'], len(writes))
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    stats['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return [doc_ref.id for doc_ref, _ in writes], stats
+
+def print_progress(label):
+    """Progress callback that logs every batch, e.g. "📦 products: 1500/10000" """
+    def report(written, total):
+        print(f"📦 {label}: {written}/{total}")
+    return report
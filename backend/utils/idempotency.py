@@ -0,0 +1,199 @@
+"""
+Idempotency-Key support for create endpoints
+
+A client that may retry a POST sends the same `Idempotency-Key` header on
+every attempt. The first attempt claims the key in the `idempotency`
+collection, runs the write and stores its response; retries get that stored
+response back (with `Idempotent-Replayed: true`) instead of writing again.
+Keys are scoped to the user and the endpoint and expire with a TTL index
+after IDEMPOTENCY_TTL_SECONDS.
+
+Concurrent duplicates collapse to one execution: within a worker they wait
+on the first request, and across workers the unique `_id` of the claim lets
+only one insert win while the others poll until its response is stored.
+Completed responses are also kept in a small in-memory cache, so most
+retries do not reach the database. Responses with 5xx status are not stored,
+so the write can be retried.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import Response, jsonify, make_response, request
+from prometheus_client import Counter
+from pymongo.errors import DuplicateKeyError
+from models.schemas import IDEMPOTENCY_TTL_SECONDS
+from utils.db import get_db
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv('IDEMPOTENCY_CACHE_SIZE', 10000))
+# How long a duplicate waits for the first request to finish
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', 10))
+# A claim older than this without a response belongs to a request that died
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv('IDEMPOTENCY_LOCK_SECONDS', 60))
+POLL_SECONDS = 0.05
+
+IDEMPOTENCY_REQUESTS = Counter(
+    'stockmaster_idempotency_requests_total', 'Requests carrying an Idempotency-Key', ['outcome']
+)
+
+def request_fingerprint():
+    return hashlib.sha256(request.get_data()).hexdigest()
+
+def _error(message, status):
+    response = jsonify({'error': message})
+    response.status_code = status
+    return response
+
+class IdempotencyStore:
+    def __init__(self, get_collection, ttl_seconds=IDEMPOTENCY_TTL_SECONDS, cache_size=IDEMPOTENCY_CACHE_SIZE,
+                 wait_seconds=IDEMPOTENCY_WAIT_SECONDS, lock_seconds=IDEMPOTENCY_LOCK_SECONDS):
+        self.get_collection = get_collection
+        self.ttl_seconds = ttl_seconds
+        self.cache_size = cache_size
+        self.wait_seconds = wait_seconds
+        self.lock_seconds = lock_seconds
+        self._cache = OrderedDict()  # scoped key -> (expires at, fingerprint, stored response)
+        self._in_flight = {}  # scoped key -> Event set when the first request finishes
+        self._lock = threading.Lock()
+
+    def _cache_get(self, scoped_key):
+        with self._lock:
+            entry = self._cache.get(scoped_key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._cache[scoped_key]
+                return None
+            self._cache.move_to_end(scoped_key)
+            return entry[1], entry[2]
+
+    def _cache_put(self, scoped_key, fingerprint, stored, created_at):
+        remaining = self.ttl_seconds - (datetime.utcnow() - created_at).total_seconds()
+        with self._lock:
+            self._cache[scoped_key] = (time.monotonic() + remaining, fingerprint, stored)
+            self._cache.move_to_end(scoped_key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def run(self, scoped_key, fingerprint, execute):
+        """Return the stored response for a key, or run `execute` once and store its response"""
+        cached = self._cache_get(scoped_key)
+        if cached:
+            return self._replay(fingerprint, *cached)
+
+        with self._lock:
+            first = self._in_flight.get(scoped_key)
+            if first is None:
+                self._in_flight[scoped_key] = threading.Event()
+        if first is not None:
+            # Same key already running in this worker: wait for it instead of the database
+            first.wait(self.wait_seconds)
+            cached = self._cache_get(scoped_key)
+            if cached:
+                return self._replay(fingerprint, *cached)
+            return self._run_claimed(scoped_key, fingerprint, execute)
+
+        try:
+            return self._run_claimed(scoped_key, fingerprint, execute)
+        finally:
+            with self._lock:
+                self._in_flight.pop(scoped_key).set()
+
+    def _run_claimed(self, scoped_key, fingerprint, execute):
+        collection = self.get_collection()
+        now = datetime.utcnow()
+        while True:
+            try:
+                collection.insert_one({'_id': scoped_key, 'fingerprint': fingerprint, 'status': 'in_progress',
+                                       'locked_at': now, 'created_at': now})
+                break
+            except DuplicateKeyError:
+                doc = self._wait_for_response(collection, scoped_key)
+            if doc is None:
+                IDEMPOTENCY_REQUESTS.labels('in_progress').inc()
+                return _error('A request with this Idempotency-Key is still in progress', 409)
+            if doc['status'] == 'released':
+                # The other attempt failed and gave the key back: claim it ourselves
+                continue
+            if doc['status'] == 'completed':
+                self._cache_put(scoped_key, doc['fingerprint'], doc['response'], doc['created_at'])
+                return self._replay(fingerprint, doc['fingerprint'], doc['response'])
+            # The request holding the claim died; take it over
+            taken = collection.find_one_and_update(
+                {'_id': scoped_key, 'status': 'in_progress', 'locked_at': doc['locked_at']},
+                {'$set': {'fingerprint': fingerprint, 'locked_at': datetime.utcnow()}}
+            )
+            if taken is None:
+                IDEMPOTENCY_REQUESTS.labels('in_progress').inc()
+                return _error('A request with this Idempotency-Key is still in progress', 409)
+            break
+
+        try:
+            response = make_response(execute())
+        except Exception:
+            collection.delete_one({'_id': scoped_key, 'status': 'in_progress'})
+            raise
+
+        if response.status_code >= 500 or response.is_streamed:
+            # Not a result the client should be stuck with; let the retry run again
+            collection.delete_one({'_id': scoped_key, 'status': 'in_progress'})
+            IDEMPOTENCY_REQUESTS.labels('failed').inc()
+            return response
+
+        stored = {'status': response.status_code, 'body': response.get_data(), 'mimetype': response.mimetype}
+        if 'Location' in response.headers:
+            stored['location'] = response.headers['Location']
+        collection.update_one({'_id': scoped_key}, {'$set': {'status': 'completed', 'response': stored}})
+        self._cache_put(scoped_key, fingerprint, stored, now)
+        IDEMPOTENCY_REQUESTS.labels('executed').inc()
+        return response
+
+    def _wait_for_response(self, collection, scoped_key):
+        """Poll a claim until it has a response, is released or its holder is presumed dead; None on timeout"""
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            doc = collection.find_one({'_id': scoped_key})
+            if doc is None:
+                return {'status': 'released'}
+            if doc['status'] == 'completed':
+                return doc
+            if doc['locked_at'] < datetime.utcnow() - timedelta(seconds=self.lock_seconds):
+                return doc
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(POLL_SECONDS)
+
+    def _replay(self, fingerprint, stored_fingerprint, stored):
+        if fingerprint != stored_fingerprint:
+            IDEMPOTENCY_REQUESTS.labels('mismatch').inc()
+            return _error('Idempotency-Key was already used with a different request body', 422)
+        IDEMPOTENCY_REQUESTS.labels('replayed').inc()
+        response = Response(stored['body'], status=stored['status'], mimetype=stored['mimetype'])
+        response.headers['Idempotent-Replayed'] = 'true'
+        if stored.get('location'):
+            response.headers['Location'] = stored['location']
+        return response
+
+idempotency_store = IdempotencyStore(lambda: get_db().idempotency)
+
+def idempotent(f):
+    """Honour an Idempotency-Key header on a create endpoint (use below @require_auth)"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        # Development mode has no database to keep keys in
+        if not key or os.getenv('FLASK_ENV') == 'development':
+            return f(*args, **kwargs)
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return _error(f'{IDEMPOTENCY_HEADER} must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters', 400)
+
+        user = getattr(request, 'user', {}).get('uid', 'system')
+        scoped_key = f'{user}:{request.endpoint}:{key}'
+        return idempotency_store.run(scoped_key, request_fingerprint(), lambda: f(*args, **kwargs))
+    return decorated
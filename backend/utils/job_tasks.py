@@ -0,0 +1,171 @@
+"""
+Background job tasks (see JOB_TYPES in utils/jobs.py)
+
+Each task takes a JobContext plus the job's params, reports progress through
+context.progress(), writes any downloadable output to context.open_artifact()
+and returns a small result dict stored on the job. Read-only tasks read from
+context.read_db with session=context.session.
+"""
+
+import csv
+import io
+from utils.archive import (
+    ARCHIVE_BATCH_SIZE, ARCHIVE_RETENTION_DAYS, ARCHIVED_COLLECTIONS, archive_collection, count_archivable
+)
+from utils.ledger_export import (
+    ARROW_MEDIA_TYPE, PARQUET_MEDIA_TYPE, find_movements, movement_query, stream_arrow, stream_parquet
+)
+from utils.reports import REPORT_FORMATS, count_rows, iter_rows, report_filename, report_query, stream_report
+
+CSV_MEDIA_TYPE = 'text/csv'
+CSV_FLUSH_ROWS = 1000
+
+EXPORT_FORMATS = {
+    'parquet': (stream_parquet, PARQUET_MEDIA_TYPE),
+    'arrow': (stream_arrow, ARROW_MEDIA_TYPE)
+}
+
+# Signed stock change of one ledger row, by movement type
+LEDGER_DELTA = {
+    '$switch': {
+        'branches': [
+            {'case': {'$eq': ['$meta.type', 'receipt']}, 'then': '$quantity'},
+            {'case': {'$eq': ['$meta.type', 'delivery']}, 'then': {'$multiply': ['$quantity', -1]}},
+            {'case': {'$eq': ['$meta.type', 'adjustment']}, 'then': '$quantity'}
+        ],
+        'default': 0
+    }
+}
+
+class CSVArtifact:
+    """Writes CSV rows to a binary artifact stream in encoded chunks"""
+
+    def __init__(self, stream, header):
+        self._stream = stream
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._pending = 0
+        self.rows = 0
+        self._writer.writerow(header)
+
+    def writerow(self, row):
+        self._writer.writerow(row)
+        self._pending += 1
+        self.rows += 1
+        if self._pending >= CSV_FLUSH_ROWS:
+            self.flush()
+
+    def flush(self):
+        self._stream.write(self._buffer.getvalue().encode('utf-8'))
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._pending = 0
+
+def _counted(rows, context, total, message):
+    done = 0
+    for row in rows:
+        yield row
+        done += 1
+        context.progress(done, total, message)
+    context.progress(done, total, message, force=True)
+
+def ledger_export(context, format='parquet', **filters):
+    """The filtered stock_movements ledger as Parquet or Arrow IPC"""
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    stream, media_type = EXPORT_FORMATS[format]
+
+    query = movement_query(filters)
+    total = context.read_db.stock_movements.count_documents(query, session=context.session)
+    artifact = context.open_artifact(f'stock_movements.{format}', media_type)
+    movements = _counted(find_movements(context.read_db, query, context.session), context, total, 'Exporting movements')
+    for chunk in stream(movements):
+        artifact.write(chunk)
+    return {'rows': total}
+
+def stock_valuation(context, category=None, location=None):
+    """Stock value at cost per product (CSV) with totals per category"""
+    query = {}
+    if category:
+        query['category'] = category
+    if location:
+        query['location'] = location
+
+    total = context.read_db.products.count_documents(query, session=context.session)
+    projection = {'sku': 1, 'name': 1, 'category': 1, 'location': 1, 'stock': 1, 'unit': 1, 'cost_price': 1}
+    products = context.read_db.products.find(query, projection, session=context.session).sort('sku', 1).batch_size(5000)
+
+    output = CSVArtifact(context.open_artifact('stock_valuation.csv', CSV_MEDIA_TYPE),
+                         ['sku', 'name', 'category', 'location', 'stock', 'unit', 'cost_price', 'value'])
+    by_category = {}
+    for product in _counted(products, context, total, 'Valuing stock'):
+        stock = product.get('stock', 0)
+        cost_price = product.get('cost_price', 0)
+        value = round(stock * cost_price, 2)
+        output.writerow([product.get('sku'), product.get('name'), product.get('category'),
+                         product.get('location'), stock, product.get('unit'), cost_price, value])
+        by_category[product.get('category')] = by_category.get(product.get('category'), 0) + value
+    output.flush()
+
+    return {
+        'products': output.rows,
+        'total_value': round(sum(by_category.values()), 2),
+        'by_category': {str(name): round(value, 2) for name, value in sorted(by_category.items(), key=lambda kv: str(kv[0]))}
+    }
+
+def stock_reconciliation(context):
+    """Compare each product's stock with the sum of its ledger movements"""
+    context.progress(0, None, 'Summing the ledger', force=True)
+    ledger = {
+        row['_id']: row['balance']
+        for row in context.read_db.stock_movements.aggregate(
+            [{'$group': {'_id': '$meta.product_id', 'balance': {'$sum': LEDGER_DELTA}}}],
+            allowDiskUse=True, session=context.session
+        )
+    }
+
+    total = context.read_db.products.count_documents({}, session=context.session)
+    products = context.read_db.products.find({}, {'sku': 1, 'name': 1, 'stock': 1},
+                                             session=context.session).batch_size(5000)
+    output = CSVArtifact(context.open_artifact('stock_reconciliation.csv', CSV_MEDIA_TYPE),
+                         ['product_id', 'sku', 'name', 'stock', 'ledger_balance', 'difference'])
+    for product in _counted(products, context, total, 'Comparing stock'):
+        balance = ledger.pop(product['_id'], 0)
+        stock = product.get('stock', 0)
+        if stock != balance:
+            output.writerow([str(product['_id']), product.get('sku'), product.get('name'),
+                             stock, balance, stock - balance])
+    mismatches = output.rows
+    # Movements of products that no longer exist
+    for product_id, balance in ledger.items():
+        output.writerow([str(product_id), None, None, None, balance, None])
+    output.flush()
+
+    return {'products': total, 'mismatches': mismatches, 'orphaned_products': len(ledger)}
+
+def report(context, name, format='csv', **params):
+    """A stock list, low-stock or ledger report as CSV or PDF (see utils/reports.py)"""
+    if format not in REPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(REPORT_FORMATS)}")
+    query = report_query(name, params)
+    total = count_rows(context.read_db, name, query, context.session)
+
+    artifact = context.open_artifact(report_filename(name, format), REPORT_FORMATS[format])
+    rows = _counted(iter_rows(context.read_db, name, query, context.session), context, total, 'Writing report')
+    for chunk in stream_report(name, format, rows, params):
+        artifact.write(chunk)
+    return {'rows': total}
+
+def archive_operations(context, retention_days=ARCHIVE_RETENTION_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move old done/canceled operations to their archive collections (see utils/archive.py)"""
+    retention_days = int(retention_days)
+    total = sum(count_archivable(context.db, retention_days).values())
+    moved = {}
+
+    def on_batch(collection_name, count):
+        context.progress(sum(moved.values()) + count, total, f'Archiving {collection_name}')
+
+    for name in ARCHIVED_COLLECTIONS:
+        moved[name] = archive_collection(context.db, name, retention_days, int(batch_size), on_batch)
+    context.progress(sum(moved.values()), total, 'Archived', force=True)
+    return {'retention_days': retention_days, 'moved': moved}
@@ -0,0 +1,391 @@
+"""
+Background jobs for heavy work (exports, reports, valuations, reconciliations, archival)
+
+Jobs are documents in the `jobs` collection. A runner claims queued jobs one
+at a time with find_one_and_update and runs them on its own
+ProcessPoolExecutor of JOB_WORKERS processes, so heavy work never blocks web
+threads and is sized independently of them. Tasks report progress onto the
+job document and write their output as artifacts to the `job_artifacts`
+GridFS bucket, where GET /api/jobs/<id>/artifact streams them from.
+
+The runner heartbeats the jobs it holds. At startup it re-queues jobs left
+running by a dead runner on the same host, and at any time it re-queues jobs
+whose heartbeat is older than JOB_LEASE_SECONDS (a runner on another host that
+went away), up to JOB_MAX_ATTEMPTS attempts, so unfinished jobs survive
+restarts.
+
+JOB_RUNNER selects where the runner lives:
+- embedded: started once per web process on first use (python app.py)
+- external: in a separate process, `python run_jobs.py` (gunicorn.conf.py
+  starts one alongside the web workers)
+- off: jobs are only queued
+"""
+
+import importlib
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from prometheus_client import Counter, Histogram
+from utils import db as mongo
+
+JOB_RUNNER = os.getenv('JOB_RUNNER', 'embedded')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 60))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', 2))
+JOB_RETENTION_DAYS = int(os.getenv('JOB_RETENTION_DAYS', 7))
+# How often runners queue an archive_operations job (0 = never; see utils/archive.py)
+ARCHIVE_INTERVAL_HOURS = float(os.getenv('ARCHIVE_INTERVAL_HOURS', 24))
+
+# Job type -> 'module:function' taking (context, **params), imported in the worker process
+JOB_TYPES = {
+    'ledger_export': 'utils.job_tasks:ledger_export',
+    'stock_valuation': 'utils.job_tasks:stock_valuation',
+    'stock_reconciliation': 'utils.job_tasks:stock_reconciliation',
+    'report': 'utils.job_tasks:report',
+    'archive_operations': 'utils.job_tasks:archive_operations'
+}
+
+# Queued only by the runners (schedule_archival), never through POST /api/jobs
+INTERNAL_JOB_TYPES = {'archive_operations'}
+
+# Read-only job types whose reads go to secondaries (context.read_db, context.session)
+SECONDARY_READ_JOB_TYPES = {'ledger_export', 'stock_valuation', 'stock_reconciliation', 'report'}
+
+ARTIFACT_BUCKET = 'job_artifacts'
+PROGRESS_INTERVAL_SECONDS = 0.5
+HOSTNAME = socket.gethostname()
+
+JOBS_FINISHED = Counter(
+    'stockmaster_jobs_finished_total', 'Background jobs finished', ['type', 'status']
+)
+JOB_DURATION = Histogram(
+    'stockmaster_job_duration_seconds', 'Background job run time', ['type'],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+)
+
+def artifact_bucket(db):
+    from gridfs import GridFSBucket
+    return GridFSBucket(db, bucket_name=ARTIFACT_BUCKET)
+
+def public_job_types():
+    return [job_type for job_type in JOB_TYPES if job_type not in INTERNAL_JOB_TYPES]
+
+def submit_job(db, job_type, params=None, created_by='system', internal=False):
+    """Queue a job and return its document; internal=True also allows INTERNAL_JOB_TYPES"""
+    if job_type not in JOB_TYPES or (job_type in INTERNAL_JOB_TYPES and not internal):
+        raise ValueError(f"Unknown job type '{job_type}'; expected one of {', '.join(public_job_types())}")
+    if params is not None and not isinstance(params, dict):
+        raise ValueError('params must be an object')
+
+    job = {
+        'type': job_type,
+        'params': params or {},
+        'status': 'queued',
+        'progress': {'done': 0, 'total': None, 'message': None},
+        'attempts': 0,
+        'created_by': created_by,
+        'created_at': datetime.utcnow()
+    }
+    job['_id'] = db.jobs.insert_one(job).inserted_id
+    return job
+
+def claim_next(db, owner, session=None):
+    """Atomically take the oldest queued job, or None"""
+    from pymongo import ReturnDocument
+    now = datetime.utcnow()
+    return db.jobs.find_one_and_update(
+        {'status': 'queued'},
+        {'$set': {'status': 'running', 'owner': owner, 'started_at': now, 'heartbeat_at': now},
+         '$inc': {'attempts': 1}},
+        sort=[('created_at', 1)],
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+
+def requeue(db, query):
+    """Put running jobs matching `query` back in the queue, failing those out of attempts"""
+    query = dict(query, status='running')
+    failed = db.jobs.update_many(
+        dict(query, attempts={'$gte': JOB_MAX_ATTEMPTS}),
+        {'$set': {'status': 'failed', 'finished_at': datetime.utcnow(),
+                  'error': f'Runner stopped during the job {JOB_MAX_ATTEMPTS} times'},
+         '$unset': {'owner': ''}}
+    ).modified_count
+    requeued = db.jobs.update_many(
+        query,
+        {'$set': {'status': 'queued', 'progress': {'done': 0, 'total': None, 'message': None}},
+         '$unset': {'owner': '', 'heartbeat_at': ''}}
+    ).modified_count
+    return requeued, failed
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def recover_orphans(db):
+    """Re-queue jobs left running by dead runners on this host"""
+    requeued = failed = 0
+    for owner in db.jobs.distinct('owner', {'status': 'running'}):
+        host, _, pid = (owner or '').rpartition(':')
+        if host == HOSTNAME and pid.isdigit() and not _pid_alive(int(pid)):
+            counts = requeue(db, {'owner': owner})
+            requeued, failed = requeued + counts[0], failed + counts[1]
+    return requeued, failed
+
+def requeue_expired(db):
+    """Re-queue running jobs whose runner stopped heartbeating"""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_LEASE_SECONDS)
+    return requeue(db, {'heartbeat_at': {'$lt': cutoff}})
+
+def purge_finished(db, retention_days=JOB_RETENTION_DAYS):
+    """Delete finished jobs older than the retention window, with their artifacts"""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    query = {'status': {'$in': ['done', 'failed']}, 'finished_at': {'$lt': cutoff}}
+    bucket = artifact_bucket(db)
+    for job in db.jobs.find(query, {'artifact.file_id': 1}):
+        file_id = (job.get('artifact') or {}).get('file_id')
+        if file_id is not None:
+            try:
+                bucket.delete(file_id)
+            except Exception:
+                pass
+    return db.jobs.delete_many(query).deleted_count
+
+def schedule_archival(db, interval_hours=ARCHIVE_INTERVAL_HOURS):
+    """Queue an archive_operations job unless one was queued within the interval"""
+    if interval_hours <= 0:
+        return None
+    since = datetime.utcnow() - timedelta(hours=interval_hours)
+    if db.jobs.find_one({'type': 'archive_operations', 'created_at': {'$gte': since}}, {'_id': 1}):
+        return None
+    return submit_job(db, 'archive_operations', internal=True)
+
+class JobContext:
+    """Handed to tasks: progress reporting, artifact output and the database to read from
+
+    `db` is the primary. Read-only tasks read from `read_db` within `session`,
+    which may be a secondary but is causally consistent with the job's claim,
+    so a job sees every write made before it was queued.
+    """
+
+    def __init__(self, db, job, read_db=None, session=None):
+        self.db = db
+        self.read_db = read_db if read_db is not None else db
+        self.session = session
+        self.job = job
+        self.artifact = None
+        self._upload = None
+        self._reported_at = 0.0
+
+    def progress(self, done, total=None, message=None, force=False):
+        now = time.monotonic()
+        if not force and now - self._reported_at < PROGRESS_INTERVAL_SECONDS:
+            return
+        self._reported_at = now
+        self.db.jobs.update_one(
+            {'_id': self.job['_id'], 'owner': self.job['owner']},
+            {'$set': {'progress': {'done': done, 'total': total, 'message': message},
+                      'heartbeat_at': datetime.utcnow()}}
+        )
+
+    def open_artifact(self, filename, media_type):
+        """Writable binary stream for the job's downloadable result"""
+        self._upload = artifact_bucket(self.db).open_upload_stream(
+            filename, metadata={'job_id': self.job['_id'], 'media_type': media_type}
+        )
+        self.artifact = {'file_id': self._upload._id, 'filename': filename, 'media_type': media_type}
+        return self._upload
+
+    def close(self):
+        if self._upload is not None and not self._upload.closed:
+            self._upload.close()
+        if self.artifact is not None:
+            self.artifact['length'] = self._upload.length
+
+    def discard(self):
+        if self._upload is not None:
+            self._upload.abort()
+            self.artifact = None
+
+def resolve_task(job_type):
+    module_name, _, function_name = JOB_TYPES[job_type].partition(':')
+    return getattr(importlib.import_module(module_name), function_name)
+
+def run_job(job_id, owner, read_after=None):
+    """Run one claimed job to completion (in a pool process); returns its final status
+
+    `read_after` is the operation time of the claim; reads of read-only jobs
+    wait until the member they go to has caught up with it.
+    """
+    db = mongo.get_db()
+    job = db.jobs.find_one({'_id': job_id, 'owner': owner})
+    if job is None:
+        return 'lost'
+
+    secondary = job['type'] in SECONDARY_READ_JOB_TYPES and mongo.READ_PREFERENCE_ROUTING
+    with (mongo.causal_session() if secondary else nullcontext()) as session:
+        if session is not None and read_after is not None:
+            session.advance_operation_time(read_after)
+        read_db = mongo.get_db(mongo.analytics_read_preference()) if secondary else db
+        context = JobContext(db, job, read_db, session)
+        try:
+            result = resolve_task(job['type'])(context, **job['params'])
+            context.close()
+            update = {'status': 'done', 'result': result or {}, 'artifact': context.artifact}
+        except Exception as e:
+            context.discard()
+            update = {'status': 'failed', 'error': f'{type(e).__name__}: {str(e)}'}
+
+    update['finished_at'] = datetime.utcnow()
+    # A job re-queued from under us (lease expired) belongs to someone else now
+    finished = db.jobs.update_one({'_id': job_id, 'owner': owner, 'status': 'running'},
+                                  {'$set': update, '$unset': {'owner': ''}})
+    if not finished.modified_count and context.artifact:
+        artifact_bucket(db).delete(context.artifact['file_id'])
+    return update['status'] if finished.modified_count else 'lost'
+
+def _init_worker(uri, db_name):
+    # Job processes use their own client and must not inherit the web process's signals
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    mongo.configure(uri, db_name)
+
+class JobRunner:
+    """Claims queued jobs and runs them on a process pool"""
+
+    def __init__(self, get_db=mongo.get_db, workers=JOB_WORKERS, poll_seconds=JOB_POLL_SECONDS,
+                 executor_factory=None):
+        self._get_db = get_db
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self._executor_factory = executor_factory or self._process_pool
+        self._executor = None
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread_pid = None
+        self.owner = None
+
+    def _process_pool(self):
+        # spawn: web processes run threads and hold Mongo clients, neither survive a fork
+        return ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker, initargs=(mongo.get_uri(), mongo.get_db_name())
+        )
+
+    def start(self):
+        """Start the dispatcher thread once per process"""
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            self.owner = f'{HOSTNAME}:{os.getpid()}'
+            self._stopped.clear()
+            threading.Thread(target=self._dispatch, name='job-runner', daemon=True).start()
+
+    def notify(self):
+        """Wake the dispatcher after a job was queued"""
+        self._wake.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def _dispatch(self):
+        delay = self.poll_seconds
+        recovered = False
+        last_purge = None
+        while not self._stopped.is_set():
+            try:
+                db = self._get_db()
+                if not recovered:
+                    requeued, failed = recover_orphans(db)
+                    recovered = True
+                    if requeued or failed:
+                        print(f"🔁 Re-queued {requeued} unfinished jobs ({failed} out of attempts)")
+                self._heartbeat(db)
+                requeue_expired(db)
+                if last_purge is None or time.monotonic() - last_purge > 3600:
+                    last_purge = time.monotonic()
+                    purge_finished(db)
+                    schedule_archival(db)
+                while len(self._in_flight) < self.workers and not self._stopped.is_set():
+                    with mongo.causal_session(db.client) as session:
+                        job = claim_next(db, self.owner, session)
+                        read_after = session.operation_time if session is not None else None
+                    if job is None:
+                        break
+                    self._submit(job, read_after)
+                delay = self.poll_seconds
+            except Exception as e:
+                print(f"⚠️  Job runner error, retrying in {delay:.0f}s: {str(e)}")
+                delay = min(delay * 2, 60)
+            self._wake.wait(delay)
+            self._wake.clear()
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, job, read_after=None):
+        if self._executor is None:
+            self._executor = self._executor_factory()
+        print(f"⚙️  Running job {job['_id']} ({job['type']}, attempt {job['attempts']})")
+        started = time.monotonic()
+        future = self._executor.submit(run_job, job['_id'], self.owner, read_after)
+        self._in_flight[job['_id']] = future
+        future.add_done_callback(lambda f: self._finished(job, f, started))
+
+    def _finished(self, job, future, started):
+        self._in_flight.pop(job['_id'], None)
+        try:
+            status = future.result()
+        except BrokenProcessPool:
+            # A job process died (OOM, kill); the pool is unusable and its jobs go back in the queue
+            print(f"⚠️  Job process died while running {job['_id']}, re-queueing")
+            self._executor = None
+            status = 'requeued'
+            requeue(self._get_db(), {'_id': job['_id'], 'owner': self.owner})
+        except Exception as e:
+            print(f"⚠️  Job {job['_id']} could not be run: {str(e)}")
+            status = 'requeued'
+            requeue(self._get_db(), {'_id': job['_id'], 'owner': self.owner})
+        JOBS_FINISHED.labels(job['type'], status).inc()
+        JOB_DURATION.labels(job['type']).observe(time.monotonic() - started)
+        print(f"{'✅' if status == 'done' else '⚠️ '} Job {job['_id']} {status}")
+        self._wake.set()
+
+    def _heartbeat(self, db):
+        if self._in_flight:
+            db.jobs.update_many({'_id': {'$in': list(self._in_flight)}, 'owner': self.owner},
+                                {'$set': {'heartbeat_at': datetime.utcnow()}})
+
+    def stats(self):
+        return {'owner': self.owner, 'workers': self.workers, 'running': [str(i) for i in self._in_flight]}
+
+job_runner = JobRunner()
+
+def run_forever():
+    """Run this process's job runner until SIGTERM/SIGINT"""
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    signal.signal(signal.SIGINT, lambda *_: stopped.set())
+    print(f"⚙️  Job runner started with {job_runner.workers} worker processes")
+    job_runner.start()
+    stopped.wait()
+    job_runner.stop()
+    print("👋 Job runner stopped")
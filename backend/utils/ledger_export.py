@@ -0,0 +1,169 @@
+"""
+Columnar export of the stock_movements ledger (Parquet and Arrow IPC)
+
+Movements are read from one cursor and converted into Arrow record batches of
+EXPORT_BATCH_ROWS rows, which are written to the response as they are built,
+so memory stays bounded by one batch whatever the date range. Low-cardinality
+columns (type, SKU, locations, creator) are dictionary encoded.
+
+pyarrow is only imported when an export runs, so it stays off the app's
+import path (see benchmarks/startup_time.py).
+"""
+
+import os
+from datetime import datetime, timezone
+from bson import ObjectId
+from utils.movements import flatten, movement_projection
+
+EXPORT_BATCH_ROWS = int(os.getenv('EXPORT_BATCH_ROWS', 50000))
+
+# Exported columns in order; 'dictionary' columns are dictionary-encoded strings
+MOVEMENT_COLUMNS = [
+    ('movement_id', 'string'),
+    ('type', 'dictionary'),
+    ('product_id', 'string'),
+    ('product_name', 'dictionary'),
+    ('sku', 'dictionary'),
+    ('quantity', 'int64'),
+    ('from_location', 'dictionary'),
+    ('to_location', 'dictionary'),
+    ('reference_id', 'string'),
+    ('created_by', 'dictionary'),
+    ('timestamp', 'timestamp')
+]
+MOVEMENT_FIELDS = [name for name, _ in MOVEMENT_COLUMNS]
+
+_schema = None
+
+def movement_schema():
+    """Arrow schema of the export, built on first use"""
+    global _schema
+    if _schema is None:
+        import pyarrow as pa
+        types = {
+            'string': pa.string(),
+            'dictionary': pa.dictionary(pa.int32(), pa.string()),
+            'int64': pa.int64(),
+            'timestamp': pa.timestamp('ms', tz='UTC')
+        }
+        _schema = pa.schema([(name, types[kind]) for name, kind in MOVEMENT_COLUMNS])
+    return _schema
+
+PARQUET_MEDIA_TYPE = 'application/vnd.apache.parquet'
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+def movement_query(args):
+    """Ledger filter from from/to (ISO dates, to is exclusive), product_id and type"""
+    query = {}
+    start = args.get('from')
+    end = args.get('to')
+    if start or end:
+        query['timestamp'] = {}
+        if start:
+            query['timestamp']['$gte'] = datetime.fromisoformat(start)
+        if end:
+            query['timestamp']['$lt'] = datetime.fromisoformat(end)
+    if args.get('product_id'):
+        query['meta.product_id'] = ObjectId(args['product_id'])
+    if args.get('type'):
+        query['meta.type'] = args['type']
+    return query
+
+def find_movements(db, query, session=None):
+    """Cursor over the filtered ledger, oldest first, with only the exported fields"""
+    projection = movement_projection(MOVEMENT_FIELDS)
+    projection['_id'] = 0
+    cursor = db.stock_movements.find(query, projection, session=session).sort('timestamp', 1).batch_size(10000)
+    return (flatten(doc) for doc in cursor)
+
+def _column_value(field, value):
+    if value is None:
+        return None
+    if field == 'timestamp':
+        # Stored as naive UTC datetimes
+        return value.replace(tzinfo=timezone.utc) if isinstance(value, datetime) and value.tzinfo is None else value
+    if field == 'quantity':
+        return int(value)
+    return str(value)
+
+def iter_record_batches(movements, batch_rows=EXPORT_BATCH_ROWS):
+    """Group movement documents into Arrow record batches"""
+    columns = {name: [] for name in MOVEMENT_FIELDS}
+    rows = 0
+    for movement in movements:
+        for name, values in columns.items():
+            values.append(_column_value(name, movement.get(name)))
+        rows += 1
+        if rows >= batch_rows:
+            yield _to_batch(columns)
+            columns = {name: [] for name in MOVEMENT_FIELDS}
+            rows = 0
+    if rows:
+        yield _to_batch(columns)
+
+def _to_batch(columns):
+    import pyarrow as pa
+
+    schema = movement_schema()
+    arrays = []
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(columns[field.name], type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(columns[field.name], type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+class _ChunkSink:
+    """Write-only file object whose written bytes are drained as they arrive"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_parquet(movements, batch_rows=EXPORT_BATCH_ROWS):
+    """Yield a Parquet file in pieces, one row group per record batch"""
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, movement_schema(), compression='zstd') as writer:
+        for batch in iter_record_batches(movements, batch_rows):
+            writer.write_batch(batch)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    yield sink.drain()
+
+def stream_arrow(movements, batch_rows=EXPORT_BATCH_ROWS):
+    """Yield an Arrow IPC stream in pieces, one message per record batch"""
+    import pyarrow as pa
+
+    sink = _ChunkSink()
+    # Each batch carries its own dictionaries, which the stream format allows
+    with pa.ipc.new_stream(sink, movement_schema()) as writer:
+        for batch in iter_record_batches(movements, batch_rows):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,122 @@
+"""
+Request metrics in Prometheus text format
+
+Per-route latency and response-size histograms, status-code counts, in-flight
+requests and database calls per request, exposed at /metrics. When
+PROMETHEUS_MULTIPROC_DIR is set (see gunicorn.conf.py), every gunicorn worker
+writes its samples there and /metrics aggregates all of them.
+"""
+
+import contextvars
+import os
+import time
+from flask import Response, request
+from pymongo import monitoring
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+DB_CALL_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+
+REQUEST_LATENCY = Histogram(
+    'stockmaster_http_request_duration_seconds', 'Request latency',
+    ['blueprint', 'route', 'method'], buckets=LATENCY_BUCKETS
+)
+REQUEST_COUNT = Counter(
+    'stockmaster_http_requests_total', 'Requests by status code',
+    ['blueprint', 'route', 'method', 'status']
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'stockmaster_http_requests_in_flight', 'Requests currently being handled',
+    multiprocess_mode='livesum'
+)
+RESPONSE_SIZE = Histogram(
+    'stockmaster_http_response_size_bytes', 'Response body size',
+    ['blueprint', 'route'], buckets=SIZE_BUCKETS
+)
+DB_CALLS = Histogram(
+    'stockmaster_db_calls_per_request', 'Database commands issued per request',
+    ['blueprint', 'route'], buckets=DB_CALL_BUCKETS
+)
+DB_TIME = Histogram(
+    'stockmaster_db_time_per_request_seconds', 'Time spent in database commands per request',
+    ['blueprint', 'route'], buckets=LATENCY_BUCKETS
+)
+
+# Per-request database counters; run_parallel copies the context into its
+# worker threads, so commands issued there are counted for the same request
+_db_stats = contextvars.ContextVar('db_stats', default=None)
+
+class DbCallListener(monitoring.CommandListener):
+    """Count MongoDB commands and their duration against the current request"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+    def _record(self, event):
+        stats = _db_stats.get()
+        if stats is not None:
+            stats['calls'] += 1
+            stats['seconds'] += event.duration_micros / 1e6
+
+# One listener per process: registering it again is a no-op, so building
+# several apps neither double-counts commands nor forces a new MongoClient
+db_call_listener = DbCallListener()
+
+def _labels():
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    return request.blueprint or 'app', route
+
+def init_metrics(app):
+    """Install the metrics middleware and the /metrics endpoint on an app"""
+    from utils import db
+    db.add_event_listener(db_call_listener)
+
+    @app.before_request
+    def start_request_metrics():
+        request.metrics_started = time.perf_counter()
+        request.metrics_db_token = _db_stats.set({'calls': 0, 'seconds': 0.0})
+        REQUESTS_IN_FLIGHT.inc()
+
+    @app.after_request
+    def record_request_metrics(response):
+        blueprint, route = _labels()
+        elapsed = time.perf_counter() - request.metrics_started
+        REQUEST_LATENCY.labels(blueprint, route, request.method).observe(elapsed)
+        REQUEST_COUNT.labels(blueprint, route, request.method, str(response.status_code)).inc()
+        # Computing the length of a streamed body would consume the stream
+        if not response.direct_passthrough and not response.is_streamed:
+            RESPONSE_SIZE.labels(blueprint, route).observe(response.calculate_content_length() or 0)
+
+        stats = _db_stats.get()
+        if stats is not None:
+            DB_CALLS.labels(blueprint, route).observe(stats['calls'])
+            DB_TIME.labels(blueprint, route).observe(stats['seconds'])
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        if hasattr(request, 'metrics_db_token'):
+            REQUESTS_IN_FLIGHT.dec()
+            _db_stats.reset(request.metrics_db_token)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(generate_metrics(), mimetype=CONTENT_TYPE_LATEST)
+
+def generate_metrics():
+    """Render metrics for this process, or for all workers in multiprocess mode"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -0,0 +1,136 @@
+"""
+The stock_movements ledger as a MongoDB time-series collection
+
+The ledger is append-only, written in time order and read by product, type
+and time range, so it is stored as a time-series collection with `timestamp`
+as the time field and `meta` = {product_id, location, type} as the meta
+field. MongoDB groups movements with the same meta into compressed buckets
+and prunes buckets by meta and time range before unpacking them, which keeps
+the collection and its indexes much smaller than one document per movement.
+
+Stored documents therefore keep product_id and type under `meta`. Writers
+build them with to_document(), readers filter on `meta.*` fields and turn
+documents back into the flat API shape with flatten(). A deployment with the
+old plain collection is converted with `python init_db.py migrate-movements`.
+"""
+
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+MOVEMENTS_COLLECTION = 'stock_movements'
+META_FIELD = 'meta'
+META_KEYS = ('product_id', 'location', 'type')
+# Few movements per product per hour: 'hours' gives buckets of up to 30 days
+GRANULARITY = 'hours'
+
+TIME_SERIES_OPTIONS = {'timeField': 'timestamp', 'metaField': META_FIELD, 'granularity': GRANULARITY}
+# Created by MongoDB 6.3+ itself on every time-series collection with a metaField
+AUTOMATIC_INDEX = f'{META_FIELD}_1_timestamp_1'
+
+def movement_location(movement):
+    """The stock location a movement is booked against: where stock leaves for deliveries, else where it lands"""
+    if movement.get('type') == 'delivery':
+        return movement.get('from_location')
+    return movement.get('to_location') or movement.get('from_location')
+
+def to_document(movement):
+    """Stored form of a flat movement, with product_id and type moved under meta"""
+    doc = {key: value for key, value in movement.items() if key not in ('product_id', 'type')}
+    doc[META_FIELD] = {
+        'product_id': movement.get('product_id'),
+        'location': movement_location(movement),
+        'type': movement.get('type')
+    }
+    return doc
+
+def flatten(doc):
+    """Flat API shape of a stored movement"""
+    meta = doc.pop(META_FIELD, None) or {}
+    doc['product_id'] = meta.get('product_id')
+    doc['type'] = meta.get('type')
+    return doc
+
+def movement_projection(fields):
+    """find() projection for flat field names"""
+    projection = {field: 1 for field in fields if field not in META_KEYS}
+    if any(field in META_KEYS for field in fields):
+        projection[META_FIELD] = 1
+    return projection
+
+def is_time_series(db, name=MOVEMENTS_COLLECTION):
+    for info in db.list_collections(filter={'name': name}):
+        return info.get('type') == 'timeseries'
+    return False
+
+def create_movements_collection(db, name=MOVEMENTS_COLLECTION):
+    """Create the ledger as a time-series collection if it does not exist yet
+
+    Returns True when the collection is time-series. Servers older than
+    MongoDB 5.0 (and mongomock) get a plain collection with the same document
+    shape instead.
+    """
+    if name in db.list_collection_names():
+        return is_time_series(db, name)
+    try:
+        db.create_collection(name, timeseries=TIME_SERIES_OPTIONS)
+        return True
+    except CollectionInvalid:
+        return True
+    except (OperationFailure, NotImplementedError) as e:
+        print(f"⚠️  {name} created as a plain collection (time-series not supported: {e})")
+        db.create_collection(name)
+        return False
+
+def migrate_movements(db, batch_size=10000, keep_legacy=True):
+    """Rewrite a plain stock_movements collection into a time-series one
+
+    The old collection is renamed to stock_movements_legacy first (time-series
+    collections cannot be renamed) and copied in batches, oldest first. Once
+    the counts match it is renamed to stock_movements_migrated (or dropped
+    with keep_legacy=False), which records that the migration finished.
+    A run that finds stock_movements_legacy next to a non-empty time-series
+    collection stops instead of touching either; the operator decides whether
+    to drop the partial copy and run again. Returns the number of movements
+    copied, or None if there was nothing to do.
+    """
+    if db.client.server_info().get('versionArray', [0]) < [5, 0]:
+        raise RuntimeError('Time-series collections need MongoDB 5.0 or later')
+
+    legacy_name = f'{MOVEMENTS_COLLECTION}_legacy'
+    migrated_name = f'{MOVEMENTS_COLLECTION}_migrated'
+    names = db.list_collection_names()
+    if legacy_name in names:
+        if MOVEMENTS_COLLECTION in names and db[MOVEMENTS_COLLECTION].estimated_document_count():
+            raise RuntimeError(
+                f'{legacy_name} exists next to a non-empty {MOVEMENTS_COLLECTION}: an earlier migration did not '
+                f'finish. Check both collections; to copy again, drop {MOVEMENTS_COLLECTION} and re-run'
+            )
+    elif MOVEMENTS_COLLECTION in names and not is_time_series(db):
+        if migrated_name in names:
+            raise RuntimeError(f'{migrated_name} already exists; drop or rename it before migrating again')
+        db[MOVEMENTS_COLLECTION].rename(legacy_name)
+    else:
+        return None
+
+    create_movements_collection(db)
+    legacy = db[legacy_name]
+    target = db[MOVEMENTS_COLLECTION]
+    copied = 0
+    batch = []
+    for movement in legacy.find({}, sort=[('timestamp', 1)], batch_size=batch_size):
+        # Movements migrated by hand may already be in the stored shape
+        batch.append(movement if META_FIELD in movement else to_document(movement))
+        if len(batch) >= batch_size:
+            target.insert_many(batch, ordered=False)
+            copied += len(batch)
+            batch = []
+    if batch:
+        target.insert_many(batch, ordered=False)
+        copied += len(batch)
+
+    if target.count_documents({}) != legacy.count_documents({}):
+        raise RuntimeError(f'Copied {copied} movements but counts differ; {legacy_name} was kept')
+    if keep_legacy:
+        legacy.rename(migrated_name)
+    else:
+        legacy.drop()
+    return copied
@@ -0,0 +1,165 @@
+"""
+Incremental PDF table writer
+
+Writes a paginated table as a PDF one page at a time: each page's content
+stream is built, compressed and yielded as soon as the page is full, and only
+the byte offsets of the objects written so far are kept for the final
+cross-reference table. Memory therefore stays at one page of rows however
+long the report is. Text uses the standard Helvetica fonts, which every PDF
+reader has, so nothing is embedded.
+"""
+
+import zlib
+
+PAGE_WIDTH = 842  # A4 landscape, in points
+PAGE_HEIGHT = 595
+MARGIN = 36
+FONT_SIZE = 8
+LEADING = 11
+TITLE_SIZE = 14
+
+# Objects with fixed numbers; pages follow from FIRST_PAGE_OBJECT
+CATALOG, PAGES, FONT_REGULAR, FONT_BOLD, INFO = 1, 2, 3, 4, 5
+FIRST_PAGE_OBJECT = 6
+
+def _escape(text):
+    data = str(text).encode('cp1252', errors='replace')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+def _char_width(char):
+    # Rough Helvetica advance widths, in units of the font size
+    if char == ' ' or char in 'il.,:;|!\'':
+        return 0.28
+    if char.isupper() or char in 'mwMW@%':
+        return 0.72
+    return 0.56
+
+CHAR_WIDTHS = {chr(code): _char_width(chr(code)) for code in range(32, 256)}
+MAX_CHAR_WIDTH = max(CHAR_WIDTHS.values())
+
+def text_width(text, size=FONT_SIZE):
+    return sum([CHAR_WIDTHS.get(c, 0.56) for c in text]) * size
+
+def fit(text, width, size=FONT_SIZE):
+    """Truncate text with an ellipsis so it fits in `width` points"""
+    if len(text) * MAX_CHAR_WIDTH * size <= width or text_width(text, size) <= width:
+        return text
+    room = width / size - 3 * CHAR_WIDTHS['.']
+    used = 0
+    for end, char in enumerate(text):
+        used += CHAR_WIDTHS.get(char, 0.56)
+        if used > room:
+            return text[:end] + '...'
+    return text
+
+class PDFTableWriter:
+    """Lays out rows into pages and serializes PDF objects as they are completed"""
+
+    def __init__(self, title, columns, subtitle=None):
+        # columns: [(title, width in points, 'left' | 'right'), ...]
+        self.title = title
+        self.subtitle = subtitle
+        self.columns = columns
+        self.rows_per_page = int((PAGE_HEIGHT - 2 * MARGIN - TITLE_SIZE - 3 * LEADING) // LEADING)
+        self._offsets = {}
+        self._position = 0
+        self._page_objects = []
+        self._rows = []
+
+    def _object(self, number, body):
+        self._offsets[number] = self._position
+        data = f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+        self._position += len(data)
+        return data
+
+    def _stream_object(self, number, content):
+        compressed = zlib.compress(content, 6)
+        header = f'<< /Length {len(compressed)} /Filter /FlateDecode >>\nstream\n'.encode()
+        return self._object(number, header + compressed + b'\nendstream')
+
+    def start(self):
+        header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        self._position = len(header)
+        return header + self._object(CATALOG, f'<< /Type /Catalog /Pages {PAGES} 0 R >>'.encode()) \
+            + self._object(FONT_REGULAR, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>') \
+            + self._object(FONT_BOLD, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>') \
+            + self._object(INFO, b'<< /Title (' + _escape(self.title) + b') /Producer (StockMaster) >>')
+
+    def add_row(self, cells):
+        """Queue one row; returns the finished page's bytes when the row filled it"""
+        self._rows.append(cells)
+        if len(self._rows) >= self.rows_per_page:
+            return self._flush_page()
+        return b''
+
+    def finish(self):
+        """Bytes for the last page, the page tree and the cross-reference table"""
+        data = b''
+        if self._rows or not self._page_objects:
+            data += self._flush_page()
+
+        kids = ' '.join(f'{number} 0 R' for number in self._page_objects)
+        data += self._object(PAGES, f'<< /Type /Pages /Kids [{kids}] /Count {len(self._page_objects)} >>'.encode())
+
+        size = max(self._offsets) + 1
+        xref_position = self._position
+        xref = [f'xref\n0 {size}\n0000000000 65535 f \n']
+        for number in range(1, size):
+            xref.append(f'{self._offsets[number]:010d} 00000 n \n')
+        xref.append(f'trailer\n<< /Size {size} /Root {CATALOG} 0 R /Info {INFO} 0 R >>\n')
+        xref.append(f'startxref\n{xref_position}\n%%EOF\n')
+        return data + ''.join(xref).encode()
+
+    def _flush_page(self):
+        page_number = len(self._page_objects) + 1
+        content_object = FIRST_PAGE_OBJECT + 2 * (page_number - 1)
+        page_object = content_object + 1
+        self._page_objects.append(page_object)
+
+        content = self._page_content(page_number, self._rows)
+        self._rows = []
+        resources = f'<< /Font << /F1 {FONT_REGULAR} 0 R /F2 {FONT_BOLD} 0 R >> >>'
+        return self._stream_object(content_object, content) + self._object(page_object, (
+            f'<< /Type /Page /Parent {PAGES} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources {resources} /Contents {content_object} 0 R >>'
+        ).encode())
+
+    def _text(self, font, size, x, y, text):
+        return b'BT /' + font + f' {size} Tf {x:.1f} {y:.1f} Td ('.encode() + _escape(text) + b') Tj ET\n'
+
+    def _cells(self, font, y, cells):
+        out = b''
+        x = MARGIN
+        for (_, width, align), cell in zip(self.columns, cells):
+            text = fit('' if cell is None else str(cell), width - 4)
+            offset = width - 4 - text_width(text) if align == 'right' else 0
+            out += self._text(font, FONT_SIZE, x + offset, y, text)
+            x += width
+        return out
+
+    def _page_content(self, page_number, rows):
+        top = PAGE_HEIGHT - MARGIN
+        out = self._text(b'F2', TITLE_SIZE, MARGIN, top - TITLE_SIZE, self.title)
+        page_label = f'Page {page_number}'
+        out += self._text(b'F1', FONT_SIZE, PAGE_WIDTH - MARGIN - text_width(page_label), top - TITLE_SIZE, page_label)
+        y = top - TITLE_SIZE - LEADING
+        if self.subtitle:
+            out += b'0.4 g\n' + self._text(b'F1', FONT_SIZE, MARGIN, y, self.subtitle) + b'0 g\n'
+        y -= LEADING * 1.5
+        out += self._cells(b'F2', y, [title for title, _, _ in self.columns])
+        table_width = sum(width for _, width, _ in self.columns)
+        out += f'0.5 w {MARGIN} {y - 3:.1f} m {MARGIN + table_width} {y - 3:.1f} l S\n'.encode()
+        for row in rows:
+            y -= LEADING
+            out += self._cells(b'F1', y, row)
+        return out
+
+def stream_pdf_table(title, columns, rows, subtitle=None):
+    """Yield a PDF table in pieces, one page at a time"""
+    writer = PDFTableWriter(title, columns, subtitle)
+    yield writer.start()
+    for row in rows:
+        page = writer.add_row(row)
+        if page:
+            yield page
+    yield writer.finish()
@@ -0,0 +1,186 @@
+"""
+Slow-query log and query-shape profiler for MongoDB
+
+A pymongo CommandListener records every CRUD command under a normalized query
+shape (field names and operators kept, values replaced by "?"), together with
+the route that issued it. Commands slower than SLOW_QUERY_MS are logged, and
+with QUERY_EXPLAIN_SLOW=1 the first slow command of each shape is explained in
+the background to show whether it scanned the collection. The top shapes by
+total time are served at /api/admin/query-stats and are the starting point for
+index work in get_collection_indexes().
+"""
+
+import json
+import os
+import threading
+from pymongo import monitoring
+
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 100))
+QUERY_EXPLAIN_SLOW = os.getenv('QUERY_EXPLAIN_SLOW', '0') == '1'
+MAX_QUERY_SHAPES = int(os.getenv('MAX_QUERY_SHAPES', 500))
+
+PROFILED_COMMANDS = {'find', 'aggregate', 'count', 'distinct', 'update', 'delete', 'insert', 'findAndModify'}
+EXPLAINABLE_COMMANDS = {'find', 'aggregate', 'count', 'distinct'}
+
+# Command fields that describe the query rather than its values
+SHAPE_FIELDS = {
+    'find': ('filter', 'sort', 'projection'),
+    'aggregate': ('pipeline',),
+    'count': ('query',),
+    'distinct': ('key', 'query'),
+    'update': ('updates',),
+    'delete': ('deletes',),
+    'insert': (),
+    'findAndModify': ('query', 'sort')
+}
+
+def normalize(value):
+    """Replace literal values with "?" while keeping field names and operators"""
+    if isinstance(value, dict):
+        return {key: normalize(v) for key, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        # Lists of stages/conditions keep their structure; lists of literals collapse
+        if value and all(isinstance(v, dict) for v in value):
+            return [normalize(v) for v in value]
+        return '?'
+    return '?'
+
+def query_shape(command_name, command):
+    collection = command.get(command_name)
+    parts = {}
+    for field in SHAPE_FIELDS.get(command_name, ()):
+        if field not in command:
+            continue
+        if field in ('updates', 'deletes'):
+            parts[field] = [normalize(statement.get('q', {})) for statement in command[field][:1]]
+        elif field == 'key':
+            parts[field] = command[field]
+        elif field in ('sort', 'projection'):
+            # Sort directions and projected fields are part of the shape
+            parts[field] = dict(command[field])
+        else:
+            parts[field] = normalize(command[field])
+    return f"{command_name} {collection} {json.dumps(parts, sort_keys=True, default=str)}"
+
+def _current_route():
+    try:
+        from flask import has_request_context, request
+        if has_request_context():
+            return f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+    except Exception:
+        pass
+    return 'background'
+
+class QueryProfiler(monitoring.CommandListener):
+    """Aggregate MongoDB command timings by query shape"""
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, explain_slow=QUERY_EXPLAIN_SLOW, max_shapes=MAX_QUERY_SHAPES):
+        self.slow_ms = slow_ms
+        self.explain_slow = explain_slow
+        self.max_shapes = max_shapes
+        self._pending = {}  # (connection, request id) -> (shape, route, command)
+        self._shapes = {}
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name not in PROFILED_COMMANDS:
+            return
+        shape = query_shape(event.command_name, event.command)
+        command = event.command if event.command_name in EXPLAINABLE_COMMANDS else None
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                shape, _current_route(), event.database_name, command)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if not pending:
+            return
+
+        shape, route, database_name, command = pending
+        duration_ms = event.duration_micros / 1000
+        slow = duration_ms >= self.slow_ms
+        explain_now = False
+
+        with self._lock:
+            stats = self._shapes.get(shape)
+            if stats is None:
+                if len(self._shapes) >= self.max_shapes:
+                    self._dropped += 1
+                    return
+                stats = self._shapes[shape] = {
+                    'shape': shape, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'slow_count': 0, 'routes': {}, 'explain': None
+                }
+            stats['count'] += 1
+            stats['total_ms'] += duration_ms
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+            stats['routes'][route] = stats['routes'].get(route, 0) + 1
+            if slow:
+                stats['slow_count'] += 1
+                if self.explain_slow and command and stats['explain'] is None:
+                    stats['explain'] = 'pending'
+                    explain_now = True
+
+        if slow:
+            print(f"🐢 Slow query {duration_ms:.1f}ms from {route}: {shape}")
+        if explain_now:
+            threading.Thread(target=self._explain, args=(shape, database_name, command), daemon=True).start()
+
+    def _explain(self, shape, database_name, command):
+        """Record whether a slow shape scans the collection and which indexes it uses"""
+        try:
+            from utils.db import get_client
+            explained = {k: v for k, v in command.items() if not k.startswith('$') and k not in ('lsid', 'txnNumber')}
+            plan = get_client()[database_name].command('explain', explained, verbosity='queryPlanner')
+            stages, indexes = set(), set()
+
+            def walk(node):
+                if isinstance(node, dict):
+                    if 'stage' in node:
+                        stages.add(node['stage'])
+                    if 'indexName' in node:
+                        indexes.add(node['indexName'])
+                    for value in node.values():
+                        walk(value)
+                elif isinstance(node, list):
+                    for value in node:
+                        walk(value)
+
+            walk(plan.get('queryPlanner', plan))
+            result = {'collection_scan': 'COLLSCAN' in stages, 'indexes': sorted(indexes), 'stages': sorted(stages)}
+        except Exception as e:
+            result = {'error': str(e)}
+
+        with self._lock:
+            if shape in self._shapes:
+                self._shapes[shape]['explain'] = result
+
+    def top(self, limit=20, sort_by='total_ms'):
+        """Return the shapes with the highest total (or max/avg) time"""
+        with self._lock:
+            shapes = [dict(stats, routes=dict(stats['routes'])) for stats in self._shapes.values()]
+        for stats in shapes:
+            stats['avg_ms'] = round(stats['total_ms'] / stats['count'], 3) if stats['count'] else 0.0
+            stats['total_ms'] = round(stats['total_ms'], 3)
+            stats['max_ms'] = round(stats['max_ms'], 3)
+        shapes.sort(key=lambda s: s.get(sort_by, 0), reverse=True)
+        return shapes[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+            self._dropped = 0
+
+    def summary(self):
+        with self._lock:
+            return {'shapes': len(self._shapes), 'dropped_shapes': self._dropped, 'slow_query_ms': self.slow_ms}
+
+query_profiler = QueryProfiler()
@@ -0,0 +1,156 @@
+"""
+Server-side inventory reports (stock list, low stock, ledger) as CSV or PDF
+
+Rows are read from one MongoDB cursor and written out as they arrive, CSV in
+chunks of CSV_CHUNK_ROWS rows and PDF one page at a time (utils/pdf_stream.py),
+so memory does not grow with the size of the report. Reports of more than
+REPORT_INLINE_MAX_ROWS rows are generated by the `report` background job
+instead of inside the request.
+"""
+
+import csv
+import io
+import os
+from datetime import datetime
+from utils.ledger_export import movement_query
+from utils.movements import flatten, movement_projection
+from utils.pdf_stream import stream_pdf_table
+
+REPORT_INLINE_MAX_ROWS = int(os.getenv('REPORT_INLINE_MAX_ROWS', 20000))
+CSV_CHUNK_ROWS = 1000
+
+REPORT_FORMATS = {'csv': 'text/csv', 'pdf': 'application/pdf'}
+
+LOW_STOCK_STATUSES = ['Low Stock', 'Out of Stock']
+
+def _product_query(params):
+    query = {}
+    for field in ('category', 'location', 'status'):
+        if params.get(field):
+            query[field] = params[field]
+    return query
+
+def _low_stock_query(params):
+    query = _product_query(params)
+    query['status'] = {'$in': [params['status']] if params.get('status') else LOW_STOCK_STATUSES}
+    return query
+
+PRODUCT_COLUMNS = [
+    # (field, title, width in points, alignment)
+    ('sku', 'SKU', 80, 'left'),
+    ('name', 'Name', 190, 'left'),
+    ('category', 'Category', 100, 'left'),
+    ('location', 'Location', 100, 'left'),
+    ('stock', 'Stock', 55, 'right'),
+    ('unit', 'Unit', 45, 'left'),
+    ('reorder_level', 'Reorder Level', 70, 'right'),
+    ('status', 'Status', 70, 'left'),
+    ('cost_price', 'Cost', 50, 'right')
+]
+
+LEDGER_COLUMNS = [
+    ('timestamp', 'Date', 80, 'left'),
+    ('movement_id', 'Movement', 95, 'left'),
+    ('type', 'Type', 60, 'left'),
+    ('sku', 'SKU', 70, 'left'),
+    ('product_name', 'Product', 150, 'left'),
+    ('quantity', 'Quantity', 50, 'right'),
+    ('from_location', 'From', 80, 'left'),
+    ('to_location', 'To', 80, 'left'),
+    ('reference_id', 'Reference', 105, 'left')
+]
+
+REPORTS = {
+    'stock': {
+        'title': 'Stock List',
+        'collection': 'products',
+        'columns': PRODUCT_COLUMNS,
+        'query': _product_query,
+        'sort': [('sku', 1)]
+    },
+    'low_stock': {
+        'title': 'Low Stock Report',
+        'collection': 'products',
+        'columns': PRODUCT_COLUMNS,
+        'query': _low_stock_query,
+        'sort': [('stock', 1), ('sku', 1)]
+    },
+    'ledger': {
+        'title': 'Stock Movement Ledger',
+        'collection': 'stock_movements',
+        'columns': LEDGER_COLUMNS,
+        'query': movement_query,
+        'sort': [('timestamp', 1)],
+        # Stored with product_id and type under meta (utils/movements.py)
+        'projection': movement_projection,
+        'document': flatten
+    }
+}
+
+def format_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M')
+    if isinstance(value, float):
+        return f'{value:.2f}'
+    return str(value)
+
+def report_query(name, params):
+    """Validated MongoDB filter for a report; raises ValueError on bad params"""
+    if name not in REPORTS:
+        raise ValueError(f"Unknown report '{name}'; expected one of {', '.join(REPORTS)}")
+    try:
+        return REPORTS[name]['query'](params)
+    except ValueError:
+        raise
+    except Exception as e:
+        # e.g. bson InvalidId for product_id
+        raise ValueError(str(e))
+
+def count_rows(db, name, query, session=None):
+    return db[REPORTS[name]['collection']].count_documents(query, session=session)
+
+def iter_rows(db, name, query, session=None):
+    """Formatted rows of a report, read from one cursor"""
+    report = REPORTS[name]
+    fields = [field for field, _, _, _ in report['columns']]
+    projection = report['projection'](fields) if 'projection' in report else {field: 1 for field in fields}
+    projection['_id'] = 0
+    cursor = db[report['collection']].find(query, projection, session=session).sort(report['sort']).batch_size(5000)
+    for doc in cursor:
+        if 'document' in report:
+            doc = report['document'](doc)
+        yield [format_cell(doc.get(field)) for field in fields]
+
+def report_filename(name, format):
+    return f"{name}-{datetime.utcnow():%Y%m%d%H%M%S}.{format}"
+
+def stream_csv(columns, rows):
+    """Yield CSV in chunks of CSV_CHUNK_ROWS rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([title for _, title, _, _ in columns])
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= CSV_CHUNK_ROWS:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode('utf-8')
+
+def describe_filters(params):
+    filters = ', '.join(f'{key}={value}' for key, value in sorted(params.items()) if value and key != 'format')
+    generated = f"Generated {datetime.utcnow():%Y-%m-%d %H:%M} UTC"
+    return f'{generated} | {filters}' if filters else generated
+
+def stream_report(name, format, rows, params):
+    """Yield a report's bytes from its formatted rows"""
+    report = REPORTS[name]
+    if format == 'csv':
+        return stream_csv(report['columns'], rows)
+    columns = [(title, width, align) for _, title, width, align in report['columns']]
+    return stream_pdf_table(report['title'], columns, rows, describe_filters(params))
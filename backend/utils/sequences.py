@@ -0,0 +1,111 @@
+"""
+Daily-scoped document number allocation (RCP-YYYYMMDD-001 style)
+
+Numbers come from a `counters` collection that is only touched once per
+leased block, so most allocations are served from memory. Numbers are unique
+but, with several workers, not strictly ordered by creation time, and a block
+left unused by a stopped worker leaves a gap in the sequence.
+"""
+
+import os
+import threading
+from datetime import datetime
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# Prefixes used for operation and ledger documents
+DOCUMENT_PREFIXES = ('RCP', 'DEL', 'TRF', 'ADJ', 'MOV')
+
+SEQUENCE_BLOCK_SIZE = int(os.getenv('SEQUENCE_BLOCK_SIZE', 20))
+
+class SequenceAllocator:
+    """Hand out unique per-prefix, per-day sequence numbers from leased blocks"""
+
+    def __init__(self, get_collection=None, block_size=SEQUENCE_BLOCK_SIZE, daily=True):
+        # Without a collection getter, numbers are only unique within this process
+        self.get_collection = get_collection
+        self.block_size = block_size
+        self.daily = daily
+        self._blocks = {}  # counter key -> [next value, last value of the leased block]
+        self._local_counters = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def next_value(self, prefix, day=None):
+        """Return the next sequence number for a prefix (on a given day, YYYYMMDD, if daily)"""
+        if self.daily:
+            key = f"{prefix}-{day or datetime.utcnow().strftime('%Y%m%d')}"
+        else:
+            key = prefix
+
+        with self._lock:
+            # Leased blocks must not be shared with forked worker processes
+            if self._pid != os.getpid():
+                self._blocks = {}
+                self._pid = os.getpid()
+
+            block = self._blocks.get(key)
+            if not block or block[0] > block[1]:
+                last = self._lease(key, self.block_size)
+                block = [last - self.block_size + 1, last]
+                self._blocks[key] = block
+
+                # Only today's blocks are worth keeping
+                stale_keys = self._blocks if self.daily else []
+                for stale_key in [k for k in stale_keys if k.rsplit('-', 1)[0] == prefix and k != key]:
+                    del self._blocks[stale_key]
+
+            value = block[0]
+            block[0] += 1
+            return value
+
+    def next_id(self, prefix, day=None):
+        """Return the next document number, e.g. RCP-20240120-001"""
+        day = day or datetime.utcnow().strftime('%Y%m%d')
+        return f"{prefix}-{day}-{self.next_value(prefix, day):03d}"
+
+    def _lease(self, key, size):
+        """Reserve `size` numbers for a counter key and return the last one"""
+        if self.get_collection is None:
+            self._local_counters[key] = self._local_counters.get(key, 0) + size
+            return self._local_counters[key]
+
+        try:
+            counter = self._increment(key, size)
+        except DuplicateKeyError:
+            # Two workers raced to create the day's counter; it exists now
+            counter = self._increment(key, size)
+        return counter['seq']
+
+    def _increment(self, key, size):
+        return self.get_collection().find_one_and_update(
+            {'_id': key},
+            {'$inc': {'seq': size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+class FirestoreSequenceAllocator(SequenceAllocator):
+    """Sequence allocator backed by transactional counter documents in Firestore"""
+
+    def __init__(self, get_db=None, collection_name='counters', **kwargs):
+        super().__init__(None, **kwargs)
+        self.get_db = get_db
+        self.collection_name = collection_name
+
+    def _lease(self, key, size):
+        if self.get_db is None:
+            return super()._lease(key, size)
+
+        from firebase_admin import firestore
+
+        @firestore.transactional
+        def lease_in_transaction(transaction, counter_ref):
+            snapshot = counter_ref.get(transaction=transaction)
+            last = (snapshot.get('seq') if snapshot.exists else 0) + size
+            transaction.set(counter_ref, {'seq': last, 'updated_at': firestore.SERVER_TIMESTAMP})
+            return last
+
+        db = self.get_db()
+        counter_ref = db.collection(self.collection_name).document(key)
+        return lease_in_transaction(db.transaction(), counter_ref)
@@ -288,6 +288,50 @@ export const dashboardApi = {
     api.get('/dashboard/performance', { params: { period } }),
 };
 
+// Reports API: CSV/PDF generated on the server. Large reports answer 202 with a
+// background job (JSON in the blob) to poll through jobsApi instead of the file.
+export const reportsApi = {
+  download: (name: 'stock' | 'low_stock' | 'ledger', format: 'csv' | 'pdf', params?: Record<string, string>) => 
+    api.get<Blob>(`/reports/${name}.${format}`, { params, responseType: 'blob', timeout: 0 }),
+};
+
+// Background jobs API
+export const jobsApi = {
+  create: (type: string, params?: Record<string, unknown>) => 
+    api.post('/jobs', { type, params }),
+  
+  getAll: (params?: { status?: string; type?: string; limit?: number }) => 
+    api.get('/jobs', { params }),
+  
+  getById: (id: string) => 
+    api.get(`/jobs/${id}`),
+  
+  downloadArtifact: (id: string) => 
+    api.get<Blob>(`/jobs/${id}/artifact`, { responseType: 'blob', timeout: 0 }),
+};
+
+// Batch API: several API calls in one round trip. Reads run concurrently,
+// writes run in order; responses come back in request order.
+export interface BatchRequest {
+  id?: string;
+  method?: 'GET' | 'POST' | 'PUT' | 'PATCH' | 'DELETE';
+  path: string;
+  body?: unknown;
+  headers?: Record<string, string>;
+}
+
+export interface BatchResponse {
+  id?: string;
+  status: number;
+  body: any;
+  location?: string;
+}
+
+export const batchApi = {
+  run: (requests: BatchRequest[]) => 
+    api.post<{ responses: BatchResponse[] }>('/batch', { requests }),
+};
+
 // Health check
 export const healthApi = {
   check: () => api.get('/health'),